@@ -0,0 +1,132 @@
+import os
+import hashlib
+import threading
+import subprocess
+from collections import defaultdict
+
+from agents.footage_cache import get_cache
+from agents.file_lock import blocking_file_lock
+
+# Every stock clip is transcoded once to this canonical format so jobs can
+# trim and concatenate scenes with stream copy instead of re-encoding frames.
+CANONICAL_WIDTH = 1920
+CANONICAL_HEIGHT = 1080
+CANONICAL_FPS = 24
+CANONICAL_ARGS = [
+    "-c:v", "libx264", "-preset", "veryfast", "-crf", "20",
+    "-pix_fmt", "yuv420p", "-profile:v", "high",
+    # One keyframe per second keeps stream-copy cuts close to scene boundaries
+    "-g", str(CANONICAL_FPS), "-keyint_min", str(CANONICAL_FPS), "-sc_threshold", "0",
+    "-video_track_timescale", "12288",
+    "-movflags", "+faststart",
+]
+
+_locks = defaultdict(threading.Lock)
+
+
+def ffmpeg_exe() -> str:
+    """ffmpeg binary - FFMPEG_BINARY if set (as moviepy honours), else imageio's bundled build."""
+    exe = os.getenv("FFMPEG_BINARY")
+    if exe:
+        return exe
+    import imageio_ffmpeg
+    return imageio_ffmpeg.get_ffmpeg_exe()
+
+
+def run_ffmpeg(args: list, on_progress=None):
+    """Run ffmpeg, raising with its stderr on failure.
+
+    ``on_progress(seconds)`` receives the output timestamp as encoding advances.
+    """
+    cmd = [ffmpeg_exe(), "-hide_banner", "-loglevel", "error", "-y"]
+    if on_progress is None:
+        result = subprocess.run([*cmd, *args], capture_output=True, text=True)
+        stderr = result.stderr
+    else:
+        proc = subprocess.Popen(
+            [*cmd, "-progress", "pipe:1", "-nostats", *args],
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True,
+        )
+        for line in proc.stdout:
+            key, _, value = line.strip().partition("=")
+            if key == "out_time_us" and value.isdigit():
+                on_progress(int(value) / 1e6)
+        stderr = proc.stderr.read()
+        result = proc
+        proc.wait()
+    if result.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed: {stderr.strip()[-500:]}")
+
+
+def _fingerprint(path: str) -> str:
+    """Cheap content key: size plus the first and last MiB of the file."""
+    size = os.path.getsize(path)
+    h = hashlib.sha1(str(size).encode())
+    with open(path, "rb") as f:
+        h.update(f.read(1024 * 1024))
+        if size > 2 * 1024 * 1024:
+            f.seek(-1024 * 1024, os.SEEK_END)
+            h.update(f.read())
+    return h.hexdigest()
+
+
+def normalize_clip(source_path: str) -> str:
+    """Return the canonical 1920x1080@24fps intermediate for a clip, transcoding it on first use."""
+    cache = get_cache()
+    output_path = os.path.join(cache.normalized_dir, _fingerprint(source_path) + ".mp4")
+
+    # Other worker processes may be normalizing the same clip; the file lock makes them wait
+    # for this transcode instead of writing a second copy
+    with _locks[output_path], blocking_file_lock(output_path + ".lock"):
+        if os.path.exists(output_path):
+            os.utime(output_path)
+            return output_path
+        # Not *.mp4, so cache eviction never sees a half-written file
+        tmp_path = f"{output_path}.{os.getpid()}.tmp"
+        try:
+            run_ffmpeg([
+                "-i", source_path,
+                "-an",
+                "-vf", f"scale={CANONICAL_WIDTH}:{CANONICAL_HEIGHT},setsar=1,fps={CANONICAL_FPS}",
+                *CANONICAL_ARGS,
+                "-f", "mp4",
+                tmp_path,
+            ])
+            os.replace(tmp_path, output_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+    cache.evict()
+    return output_path
+
+
+def trim_segment(normalized_path: str, duration: float, output_path: str) -> str:
+    """Cut (looping if needed) a canonical clip to ``duration`` seconds without re-encoding."""
+    run_ffmpeg([
+        "-stream_loop", "-1",
+        "-i", normalized_path,
+        "-t", f"{duration:.3f}",
+        "-c", "copy",
+        "-avoid_negative_ts", "make_zero",
+        output_path,
+    ])
+    return output_path
+
+
+def concat_segments(segment_paths: list, output_path: str) -> str:
+    """Join canonical segments with the concat demuxer and stream copy."""
+    list_path = output_path + ".txt"
+    with open(list_path, "w") as f:
+        for path in segment_paths:
+            f.write(f"file '{os.path.abspath(path)}'\n")
+    try:
+        run_ffmpeg([
+            "-f", "concat", "-safe", "0",
+            "-i", list_path,
+            "-c", "copy",
+            "-movflags", "+faststart",
+            output_path,
+        ])
+    finally:
+        os.remove(list_path)
+    return output_path
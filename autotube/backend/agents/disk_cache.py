@@ -0,0 +1,44 @@
+import os
+import time
+
+# Size budget for the small on-disk caches (TTS sentences, scripts, research results).
+# Last use is the file mtime, so LRU order survives restarts and is shared by workers.
+
+
+def evict_lru(root: str, max_bytes: int, max_age: float = None) -> int:
+    """Delete cache entries under ``root``, oldest first, until it fits in ``max_bytes``.
+
+    Files sharing a name stem (``key.mp3`` and ``key.json``) form one entry. Entries
+    older than ``max_age`` go regardless of size. Lock files and in-progress ``.tmp``
+    writes are left alone. Returns the bytes freed.
+    """
+    entries = {}
+    for dirpath, _, names in os.walk(root):
+        for name in names:
+            if name.endswith((".lock", ".tmp")):
+                continue
+            path = os.path.join(dirpath, name)
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entry = entries.setdefault((dirpath, name.split(".")[0]), [0, 0, []])
+            entry[0] = max(entry[0], st.st_mtime)
+            entry[1] += st.st_size
+            entry[2].append(path)
+
+    now = time.time()
+    total = sum(size for _, size, _ in entries.values())
+    freed = 0
+    for last_used, size, paths in sorted(entries.values()):
+        expired = max_age is not None and now - last_used > max_age
+        if total <= max_bytes and not expired:
+            continue
+        for path in paths:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        total -= size
+        freed += size
+    return freed
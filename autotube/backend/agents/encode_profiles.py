@@ -0,0 +1,66 @@
+import os
+
+# Named encode settings, selectable per job. Constant-quality x264 at a real preset
+# replaces the old fixed ultrafast/threads=4 encode, which produced needlessly large files
+# (slow uploads) while leaving cores idle on bigger machines.
+PROFILES = {
+    # Quick low-res cut for reviewing a script before committing to a full render
+    "draft": {"width": 854, "height": 480, "fps": 24, "preset": "veryfast", "crf": 30,
+              "maxrate": "1500k", "audio_bitrate": "96k"},
+    "final": {"width": 1920, "height": 1080, "fps": 24, "preset": "faster", "crf": 21,
+              "maxrate": "8M", "audio_bitrate": "192k"},
+    # Vertical Shorts: landscape footage is center-cropped to fill the frame
+    "shorts": {"width": 1080, "height": 1920, "fps": 24, "preset": "faster", "crf": 21,
+               "maxrate": "8M", "audio_bitrate": "192k"},
+}
+DEFAULT_PROFILE = os.getenv("ENCODE_PROFILE", "final")
+
+# Render backends (see agents.video_agent.RENDER_BACKENDS). Listed here too so the API
+# can validate requests without importing the media stack.
+RENDER_BACKEND_NAMES = ("moviepy", "ffmpeg", "segments")
+
+# Low-res rendition written alongside the master for the approval player
+PREVIEW = {"height": 360, "preset": "veryfast", "crf": 32, "maxrate": "600k", "audio_bitrate": "64k"}
+
+
+def get_profile(name: str = None) -> dict:
+    name = name or DEFAULT_PROFILE
+    if name not in PROFILES:
+        raise ValueError(f"Unknown encode profile: {name}")
+    return {"name": name, **PROFILES[name]}
+
+
+def draft_profile(profile: dict) -> dict:
+    """Draft settings framed like ``profile``, for the review pass before the full render."""
+    draft = get_profile("draft")
+    if profile["height"] > profile["width"]:
+        draft["width"], draft["height"] = draft["height"], draft["width"]
+    return draft
+
+
+def is_landscape(profile: dict) -> bool:
+    """Whether ``profile`` is 16:9 (the moviepy canvas), allowing for even-width rounding."""
+    return abs(profile["width"] / profile["height"] - 16 / 9) < 0.01
+
+
+def available_cpus() -> int:
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def encode_threads(concurrent_jobs: int = 1) -> int:
+    """Encoder threads for one render, sharing the machine's cores with the other running renders."""
+    return max(1, available_cpus() // max(1, concurrent_jobs))
+
+
+def x264_args(settings: dict, threads: int) -> list:
+    """ffmpeg output options for ``settings`` (a profile or PREVIEW)."""
+    maxrate = settings["maxrate"]
+    bufsize = f"{int(maxrate[:-1]) * 2}{maxrate[-1]}"
+    return [
+        "-c:v", "libx264", "-preset", settings["preset"], "-crf", str(settings["crf"]),
+        "-maxrate", maxrate, "-bufsize", bufsize, "-threads", str(threads), "-pix_fmt", "yuv420p",
+        "-c:a", "aac", "-b:a", settings["audio_bitrate"],
+    ]
@@ -0,0 +1,316 @@
+import os
+import re
+import math
+import textwrap
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image, ImageDraw, ImageFont
+
+from agents.clip_normalizer import run_ffmpeg, ffmpeg_exe
+from agents.encode_profiles import get_profile, encode_threads, x264_args, PREVIEW
+
+# ffmpeg renders: scenes, narration, title overlay and fades are compiled into
+# filter_complex graphs instead of pulling frames through moviepy.
+VIDEO_WIDTH = 1920
+VIDEO_HEIGHT = 1080
+PLACEHOLDER_COLOR = (20, 20, 40)
+TITLE_DURATION = 3
+TITLE_FADE = 0.5
+CAPTION_WRAP = 42
+CAPTION_FONTSIZE = 52
+CAPTION_MARGIN = 90
+# Segments encoded at once by render_segments (0: one per encoder thread of the render)
+SEGMENT_WORKERS = int(os.getenv("SEGMENT_WORKERS", "0"))
+# Scene inputs one render_ffmpeg graph decodes at once; each buffers decoded frames
+FFMPEG_MAX_INPUTS = max(1, int(os.getenv("FFMPEG_MAX_INPUTS", "2")))
+
+
+def render_ffmpeg(scenes: list, sources: list, audio_path: str, title: str, output_dir: str, output_path: str,
+                  captions: list = None, on_progress=None, profile: dict = None, preview_path: str = None,
+                  threads: int = None) -> str:
+    """Render the final video with ffmpeg filter graphs.
+
+    ``sources[i]`` is the footage file for ``scenes[i]`` (canonical segment or raw clip),
+    or None for a text placeholder. ``captions`` are ``[start, end, text]`` cues to burn in.
+    ``on_progress(frames_done, frames_total)`` reports encoding progress.
+
+    ``profile`` (see agents.encode_profiles) sets the frame size and x264 settings; with
+    ``preview_path`` a low-res preview is transcoded from the finished render.
+
+    Every open input holds its own queue of decoded frames, so one graph takes at most
+    ``FFMPEG_MAX_INPUTS`` scenes; longer videos are encoded group by group with all the
+    render's threads and joined by stream copy.
+    """
+    profile = profile or get_profile()
+    threads = threads or encode_threads()
+    groups = [list(range(i, min(i + FFMPEG_MAX_INPUTS, len(scenes))))
+              for i in range(0, len(scenes), FFMPEG_MAX_INPUTS)]
+    _render_groups(scenes, sources, audio_path, title, output_dir, output_path, captions, on_progress,
+                   profile, threads, groups, workers=1)
+    if preview_path:
+        # Its own pass, so the render doesn't also hold a second encoder's lookahead
+        transcode_preview(output_path, preview_path, profile["fps"], threads)
+    return output_path
+
+
+def render_segments(scenes: list, sources: list, audio_path: str, title: str, output_dir: str, output_path: str,
+                    captions: list = None, on_progress=None, profile: dict = None, preview_path: str = None,
+                    threads: int = None) -> str:
+    """Render like :func:`render_ffmpeg`, but encode each scene as its own ffmpeg process.
+
+    Segments run ``SEGMENT_WORKERS`` at a time (default: one per thread of the render's
+    share), each writing its slice of the preview alongside.
+    """
+    profile = profile or get_profile()
+    threads = threads or encode_threads()
+    workers = max(1, min(len(scenes), SEGMENT_WORKERS or threads))
+    _render_groups(scenes, sources, audio_path, title, output_dir, output_path, captions, on_progress,
+                   profile, threads, [[i] for i in range(len(scenes))], workers=workers, preview_path=preview_path)
+    return output_path
+
+
+def _render_groups(scenes: list, sources: list, audio_path: str, title: str, output_dir: str, output_path: str,
+                   captions: list, on_progress, profile: dict, threads: int, groups: list, workers: int,
+                   preview_path: str = None):
+    """Encode each group of consecutive scenes with one filter graph, then join them.
+
+    Groups run ``workers`` at a time and are joined by stream copy; each starts on a
+    keyframe, so the seams need no re-encode. Every scene is cut to the same frame count
+    whatever its group and overlays are shifted into group time, so the frames don't
+    depend on the grouping. The narration is encoded once while joining - per-group AAC
+    would add priming gaps at every seam and drift the audio.
+    """
+    width, height, fps = profile["width"], profile["height"], profile["fps"]
+    scales = _text_scales(width, height)
+    margin = round(CAPTION_MARGIN * height / VIDEO_HEIGHT)
+
+    durations = [scene.get("actual_duration", 5) for scene in scenes]
+    frames = [_trimmed_frames(d, fps) for d in durations]
+    offsets = [sum(frames[:i]) / fps for i in range(len(frames))]
+    title_duration = min(TITLE_DURATION, sum(durations))
+    title_card = _title_input(title, output_dir, fps, title_duration, scales)
+    cue_cards = [
+        (start, end, _caption_card(i, text, output_dir, scales))
+        for i, (start, end, text) in enumerate(captions or [])
+    ]
+    group_frames = [sum(frames[i] for i in group) for group in groups]
+
+    def group_args(k: int, group_threads: int) -> list:
+        group = groups[k]
+        start = offsets[group[0]]
+        end = start + group_frames[k] / fps
+        inputs, filters = [], []
+        for j, i in enumerate(group):
+            inputs += _scene_input(i, scenes[i], sources[i], output_dir, profile, scales)
+            filters.append(_scene_filter(j, durations[i], profile) + f"[s{j}]")
+        filters.append("".join(f"[s{j}]" for j in range(len(group))) + f"concat=n={len(group)}:v=1:a=0[v]")
+        label = "v"
+        if start < title_duration:
+            inputs += title_card
+            filters.append(_title_filter(len(group), title_duration) + f",trim=start={start:.6f},setpts=PTS-STARTPTS[title]")
+            filters.append("[v][title]overlay=x=(W-w)/2:y=H*0.15:eof_action=pass[t]")
+            label = "t"
+        for j, (cue_start, cue_end, card) in enumerate(cue_cards):
+            if cue_end <= start or cue_start >= end:
+                continue
+            inputs += ["-i", card]
+            filters.append(
+                f"[{label}][{_input_count(inputs) - 1}:v]overlay=x=(W-w)/2:y=H-h-{margin}:"
+                f"enable='between(t,{cue_start - start:.3f},{cue_end - start:.3f})'[c{j}]"
+            )
+            label = f"c{j}"
+        outputs = []
+        if preview_path:
+            filters.append(f"[{label}]split=2[master][preview_in]")
+            filters.append(f"[preview_in]scale=-2:{PREVIEW['height']}[preview]")
+            outputs = [
+                "-map", "[preview]", "-an", *x264_args(PREVIEW, group_threads), "-r", str(fps),
+                "-frames:v", str(group_frames[k]), _segment_path(output_dir, "preview", k),
+            ]
+            label = "master"
+        return [
+            *inputs,
+            "-filter_complex", ";".join(filters),
+            "-map", f"[{label}]", "-an", *x264_args(profile, group_threads), "-r", str(fps),
+            "-frames:v", str(group_frames[k]), _segment_path(output_dir, "segment", k),
+            *outputs,
+        ]
+
+    # Frames encoded so far in each group, summed for the job's progress
+    done = [0] * len(groups)
+    progress_lock = threading.Lock()
+
+    def encode(k: int, group_threads: int):
+        def report(seconds: float):
+            with progress_lock:
+                done[k] = min(int(seconds * fps), group_frames[k])
+                on_progress(sum(done), sum(frames))
+        run_ffmpeg(group_args(k, group_threads), on_progress=report if on_progress else None)
+
+    group_threads = max(1, threads // workers)
+    try:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="segment") as pool:
+            # list() re-raises the first failed group
+            list(pool.map(lambda k: encode(k, group_threads), range(len(groups))))
+        _join_segments([_segment_path(output_dir, "segment", k) for k in range(len(groups))],
+                       audio_path, profile, output_path)
+        if preview_path:
+            _join_segments([_segment_path(output_dir, "preview", k) for k in range(len(groups))],
+                           audio_path, PREVIEW, preview_path)
+    finally:
+        for kind in ("segment", "preview"):
+            for k in range(len(groups)):
+                path = _segment_path(output_dir, kind, k)
+                if os.path.exists(path):
+                    os.remove(path)
+
+
+def _join_segments(segment_paths: list, audio_path: str, settings: dict, output_path: str):
+    """Concatenate encoded segments by stream copy and mux in the narration, encoded once."""
+    list_path = output_path + ".txt"
+    with open(list_path, "w") as f:
+        for path in segment_paths:
+            f.write(f"file '{os.path.abspath(path)}'\n")
+    try:
+        run_ffmpeg([
+            "-f", "concat", "-safe", "0", "-i", list_path, "-i", audio_path,
+            "-map", "0:v", "-map", "1:a", "-c:v", "copy",
+            "-c:a", "aac", "-b:a", settings["audio_bitrate"],
+            "-shortest", "-movflags", "+faststart",
+            output_path,
+        ])
+    finally:
+        os.remove(list_path)
+
+
+def _segment_path(output_dir: str, kind: str, i: int) -> str:
+    # Not clips/segment_{i}.mp4: that's the scene's trimmed source footage
+    return f"{output_dir}/clips/encoded_{kind}_{i}.mp4"
+
+
+def _trimmed_frames(duration: float, fps: int) -> int:
+    """Frames ``trim=duration`` keeps from a stream starting at 0 (those with pts < duration)."""
+    return max(1, math.ceil(round(float(f"{duration:.3f}") * fps, 6)))
+
+
+def _text_scales(width: int, height: int) -> tuple:
+    # Text is sized for the short side and wrapped for the width, so it fits portrait frames too
+    text_scale = min(width, height) / VIDEO_HEIGHT
+    return text_scale, width / text_scale / VIDEO_WIDTH
+
+
+def _scene_input(i: int, scene: dict, source: str, output_dir: str, profile: dict, scales: tuple) -> list:
+    duration = scene.get("actual_duration", 5)
+    if source:
+        return ["-stream_loop", "-1", "-t", f"{duration:.3f}", "-i", source]
+    text_scale, wrap_scale = scales
+    card = render_text_image(
+        scene.get("text", ""), f"{output_dir}/clips/placeholder_{i}.png",
+        wrap=round(40 * wrap_scale), fontsize=round(48 * text_scale), background=PLACEHOLDER_COLOR,
+        size=(profile["width"], profile["height"]),
+    )
+    return ["-loop", "1", "-framerate", str(profile["fps"]), "-t", f"{duration:.3f}", "-i", card]
+
+
+def _scene_filter(index: int, duration: float, profile: dict) -> str:
+    width, height, fps = profile["width"], profile["height"], profile["fps"]
+    return (
+        f"[{index}:v]scale={width}:{height}:force_original_aspect_ratio=increase,crop={width}:{height},"
+        f"setsar=1,fps={fps},format=yuv420p,trim=duration={duration:.3f},setpts=PTS-STARTPTS"
+    )
+
+
+def _title_input(title: str, output_dir: str, fps: int, title_duration: float, scales: tuple) -> list:
+    text_scale, wrap_scale = scales
+    card = render_text_image(title, f"{output_dir}/title.png", wrap=round(35 * wrap_scale),
+                             fontsize=round(72 * text_scale), bold=True, stroke=max(1, round(3 * text_scale)))
+    return ["-loop", "1", "-framerate", str(fps), "-t", f"{title_duration:.3f}", "-i", card]
+
+
+def _title_filter(index: int, title_duration: float) -> str:
+    return (
+        f"[{index}:v]format=rgba,fade=in:st=0:d={TITLE_FADE}:alpha=1,"
+        f"fade=out:st={max(title_duration - TITLE_FADE, 0):.3f}:d={TITLE_FADE}:alpha=1"
+    )
+
+
+def _caption_card(i: int, text: str, output_dir: str, scales: tuple) -> str:
+    text_scale, wrap_scale = scales
+    return render_text_image(text, f"{output_dir}/clips/caption_{i}.png", wrap=round(CAPTION_WRAP * wrap_scale),
+                             fontsize=round(CAPTION_FONTSIZE * text_scale), stroke=max(1, round(3 * text_scale)))
+
+
+def transcode_preview(source: str, preview_path: str, fps: int, threads: int = None) -> str:
+    """Low-res preview from an existing render (for backends that can't fan out in one pass)."""
+    run_ffmpeg([
+        "-i", source, "-vf", f"scale=-2:{PREVIEW['height']}",
+        *x264_args(PREVIEW, threads or encode_threads()), "-r", str(fps),
+        "-movflags", "+faststart", preview_path,
+    ])
+    return preview_path
+
+
+def _input_count(args: list) -> int:
+    return args.count("-i")
+
+
+def _font(fontsize: int, bold: bool):
+    name = "DejaVuSans-Bold.ttf" if bold else "DejaVuSans.ttf"
+    try:
+        return ImageFont.truetype(name, fontsize)
+    except OSError:
+        return ImageFont.load_default(fontsize)
+
+
+def render_text_image(text: str, path: str, wrap: int, fontsize: int, bold: bool = False,
+                      stroke: int = 0, background=None, size: tuple = (VIDEO_WIDTH, VIDEO_HEIGHT)) -> str:
+    """Draw centered white text to a PNG - full-frame on ``background``, else a transparent card."""
+    font = _font(fontsize, bold)
+    wrapped = textwrap.fill(text, wrap)
+    probe = ImageDraw.Draw(Image.new("RGBA", (1, 1)))
+    left, top, right, bottom = probe.multiline_textbbox(
+        (0, 0), wrapped, font=font, stroke_width=stroke, align="center"
+    )
+    text_w, text_h = math.ceil(right - left), math.ceil(bottom - top)
+
+    if background is not None:
+        img = Image.new("RGB", size, background)
+        origin = ((size[0] - text_w) / 2 - left, (size[1] - text_h) / 2 - top)
+    else:
+        pad = stroke + 4
+        img = Image.new("RGBA", (text_w + pad * 2, text_h + pad * 2), (0, 0, 0, 0))
+        origin = (pad - left, pad - top)
+
+    if text:
+        ImageDraw.Draw(img).multiline_text(
+            origin, wrapped, font=font, fill="white", align="center",
+            stroke_width=stroke, stroke_fill="black",
+        )
+    img.save(path)
+    return path
+
+
+def probe_duration(path: str) -> float:
+    """Container duration in seconds, read from ffmpeg's input banner."""
+    result = subprocess.run([ffmpeg_exe(), "-hide_banner", "-i", path], capture_output=True, text=True)
+    match = re.search(r"Duration: (\d+):(\d+):([\d.]+)", result.stderr)
+    if not match:
+        raise RuntimeError(f"Could not read duration of {path}")
+    h, m, s = match.groups()
+    return int(h) * 3600 + int(m) * 60 + float(s)
+
+
+def compare_renders(reference_path: str, candidate_path: str) -> dict:
+    """Visual parity between two renders: mean PSNR over all frames plus duration drift."""
+    result = subprocess.run([
+        ffmpeg_exe(), "-hide_banner",
+        "-i", reference_path, "-i", candidate_path,
+        "-lavfi", f"[0:v]scale={VIDEO_WIDTH}:{VIDEO_HEIGHT}[a];[1:v]scale={VIDEO_WIDTH}:{VIDEO_HEIGHT}[b];[a][b]psnr",
+        "-f", "null", "-",
+    ], capture_output=True, text=True)
+    match = re.search(r"average:(\S+)", result.stderr)
+    return {
+        "psnr": float(match.group(1)) if match else None,
+        "duration_delta": abs(probe_duration(reference_path) - probe_duration(candidate_path)),
+    }
@@ -0,0 +1,48 @@
+import os
+import asyncio
+from contextlib import asynccontextmanager, contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: only the in-process locks apply
+    fcntl = None
+
+# Render workers are separate processes, so asyncio locks alone can't stop two of them
+# fetching the same search or clip at once. Lock files sit next to the cached artifact.
+LOCK_POLL_INTERVAL = 0.1
+
+
+@asynccontextmanager
+async def file_lock(path: str):
+    """Exclusive advisory lock on ``path``, awaited without blocking the event loop."""
+    if fcntl is None:
+        yield
+        return
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    fd = os.open(path, os.O_CREAT | os.O_RDWR, 0o644)
+    try:
+        while True:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except BlockingIOError:
+                await asyncio.sleep(LOCK_POLL_INTERVAL)
+        yield
+    finally:
+        # Closing the descriptor releases the lock; the file stays so waiters share one inode
+        os.close(fd)
+
+
+@contextmanager
+def blocking_file_lock(path: str):
+    """:func:`file_lock` for worker-pool threads, which can simply block until it's free."""
+    if fcntl is None:
+        yield
+        return
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    fd = os.open(path, os.O_CREAT | os.O_RDWR, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        yield
+    finally:
+        os.close(fd)
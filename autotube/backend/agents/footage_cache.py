@@ -0,0 +1,154 @@
+import os
+import re
+import json
+import time
+import shutil
+import asyncio
+import hashlib
+from collections import defaultdict
+
+import metrics
+from agents.file_lock import file_lock
+
+# Persistent on-disk cache of Pexels search results and downloaded clips, shared by all jobs
+FOOTAGE_CACHE_DIR = os.getenv("FOOTAGE_CACHE_DIR", "cache/footage")
+FOOTAGE_CACHE_MAX_BYTES = int(os.getenv("FOOTAGE_CACHE_MAX_BYTES", str(5 * 1024 ** 3)))
+SEARCH_TTL = int(os.getenv("FOOTAGE_SEARCH_TTL", str(7 * 24 * 3600)))
+
+
+def normalize_query(query: str) -> str:
+    return re.sub(r"\s+", " ", re.sub(r"[^\w\s]", " ", query.lower())).strip()
+
+
+class FootageCache:
+    """Search results keyed by normalized query; clips keyed by Pexels video id and rendition.
+
+    Last use is tracked through file mtimes, so LRU order survives restarts.
+    """
+
+    def __init__(self, root: str = FOOTAGE_CACHE_DIR, max_bytes: int = FOOTAGE_CACHE_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.searches_dir = os.path.join(root, "searches")
+        self.clips_dir = os.path.join(root, "clips")
+        self.normalized_dir = os.path.join(root, "normalized")
+        for d in (self.searches_dir, self.clips_dir, self.normalized_dir):
+            os.makedirs(d, exist_ok=True)
+        self._locks = defaultdict(asyncio.Lock)
+
+    # Searches
+
+    def _search_path(self, query: str, params: dict) -> str:
+        key = json.dumps([normalize_query(query), params], sort_keys=True)
+        return os.path.join(self.searches_dir, hashlib.sha1(key.encode()).hexdigest() + ".json")
+
+    def _read_search(self, path: str):
+        try:
+            if time.time() - os.path.getmtime(path) < SEARCH_TTL:
+                with open(path) as f:
+                    return json.load(f)
+        except (OSError, ValueError):
+            pass
+        return None
+
+    def get_search(self, query: str, params: dict):
+        data = self._read_search(self._search_path(query, params))
+        metrics.inc("autotube_footage_cache_lookups_total", kind="search", result="hit" if data is not None else "miss")
+        return data
+
+    async def search(self, query: str, params: dict, fetch):
+        """Cached search results; concurrent misses, including other workers', call ``fetch()`` once."""
+        data = self.get_search(query, params)
+        if data is not None:
+            return data
+        path = self._search_path(query, params)
+        async with self._locks[path], file_lock(path + ".lock"):
+            data = self._read_search(path)
+            if data is not None:
+                metrics.inc("autotube_footage_cache_lookups_total", kind="search", result="shared")
+                return data
+            data = await fetch()
+            self.put_search(query, params, data)
+        return data
+
+    def put_search(self, query: str, params: dict, data: dict):
+        path = self._search_path(query, params)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp, path)
+
+    # Clips
+
+    def clip_path(self, video_id, video_file: dict) -> str:
+        rendition = video_file.get("id") or f"{video_file.get('width', 0)}x{video_file.get('height', 0)}"
+        return os.path.join(self.clips_dir, f"{video_id}_{rendition}.mp4")
+
+    async def fetch_clip(self, cache_path: str, download) -> str:
+        """Return the cached clip, calling ``download(path)`` once on a miss."""
+        async with self._locks[cache_path], file_lock(cache_path + ".lock"):
+            if os.path.exists(cache_path):
+                os.utime(cache_path)
+                metrics.inc("autotube_footage_cache_lookups_total", kind="clip", result="hit")
+                metrics.inc("autotube_footage_bytes_total", os.path.getsize(cache_path), source="cache")
+                return cache_path
+            metrics.inc("autotube_footage_cache_lookups_total", kind="clip", result="miss")
+            await download(cache_path)
+            metrics.inc("autotube_footage_bytes_total", os.path.getsize(cache_path), source="download")
+        self.evict()
+        return cache_path
+
+    def link_into(self, cache_path: str, output_path: str) -> str:
+        """Expose a cached clip at ``output_path`` without copying when possible."""
+        if os.path.lexists(output_path):
+            os.remove(output_path)
+        try:
+            os.link(cache_path, output_path)
+        except OSError:
+            try:
+                os.symlink(os.path.abspath(cache_path), output_path)
+            except OSError:
+                shutil.copyfile(cache_path, output_path)
+        return output_path
+
+    def _entries(self):
+        for d in (self.clips_dir, self.normalized_dir):
+            for name in os.listdir(d):
+                if not name.endswith(".mp4"):
+                    continue
+                path = os.path.join(d, name)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                yield st.st_mtime, st.st_size, path
+
+    def evict(self):
+        """Drop least recently used clips until the cache fits its byte budget."""
+        entries = list(self._entries())
+        total = sum(size for _, size, _ in entries)
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            if self._locks.get(path) is not None and self._locks[path].locked():
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            metrics.inc("autotube_footage_evictions_total")
+
+    def size(self) -> int:
+        return sum(size for _, size, _ in self._entries())
+
+
+_cache = None
+
+
+def get_cache() -> FootageCache:
+    global _cache
+    if _cache is None:
+        _cache = FootageCache()
+    return _cache
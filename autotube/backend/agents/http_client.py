@@ -0,0 +1,218 @@
+import os
+import time
+import asyncio
+import random
+from contextlib import asynccontextmanager
+from collections import defaultdict
+from urllib.parse import urlparse
+import httpx
+
+import metrics
+
+# Shared, pooled HTTP client for all agents - created once in the FastAPI lifespan
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "30"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "10"))
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "50"))
+HTTP_MAX_PER_HOST = int(os.getenv("HTTP_MAX_PER_HOST", "8"))
+HTTP_KEEPALIVE = int(os.getenv("HTTP_KEEPALIVE", "20"))
+HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", "3"))
+HTTP_BACKOFF = float(os.getenv("HTTP_BACKOFF", "0.5"))
+
+DOWNLOAD_CHUNK_SIZE = int(os.getenv("DOWNLOAD_CHUNK_SIZE", str(1024 * 1024)))
+DOWNLOAD_MAX_BYTES = int(os.getenv("DOWNLOAD_MAX_BYTES", str(300 * 1024 * 1024)))
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+UPSTREAMS = {
+    "api.pexels.com": "pexels",
+    "videos.pexels.com": "pexels",
+    "player.vimeo.com": "pexels",
+    "api.groq.com": "groq",
+}
+
+try:
+    import h2  # noqa: F401
+    HTTP2 = True
+except ImportError:
+    HTTP2 = False
+
+
+class HttpClient:
+    """Pooled async HTTP client with per-host limits, retries and upstream metrics."""
+
+    def __init__(self):
+        self.client = httpx.AsyncClient(
+            http2=HTTP2,
+            follow_redirects=True,
+            timeout=httpx.Timeout(HTTP_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_KEEPALIVE,
+            ),
+        )
+        self._host_limits = defaultdict(lambda: asyncio.Semaphore(HTTP_MAX_PER_HOST))
+
+    async def request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        """Send a request, retrying transient failures with exponential backoff."""
+        host = urlparse(url).hostname or ""
+        upstream = UPSTREAMS.get(host, host)
+
+        for attempt in range(HTTP_RETRIES + 1):
+            connected = []
+            extensions = {"trace": _connection_tracer(connected)}
+            started = time.perf_counter()
+            try:
+                async with self._host_limits[host]:
+                    response = await self.client.request(method, url, extensions=extensions, **kwargs)
+            except httpx.TransportError:
+                metrics.inc("autotube_http_errors_total", upstream=upstream)
+                if attempt == HTTP_RETRIES:
+                    raise
+                metrics.inc("autotube_http_retries_total", upstream=upstream)
+                await asyncio.sleep(_backoff(attempt))
+                continue
+            finally:
+                _record(upstream, started, connected)
+
+            if response.status_code in RETRY_STATUSES and attempt < HTTP_RETRIES:
+                metrics.inc("autotube_http_retries_total", upstream=upstream)
+                await response.aclose()
+                await asyncio.sleep(_retry_after(response) or _backoff(attempt))
+                continue
+            return response
+
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("POST", url, **kwargs)
+
+    @asynccontextmanager
+    async def stream(self, method: str, url: str, **kwargs):
+        """Open a streaming response (no retries - callers resume on failure)."""
+        host = urlparse(url).hostname or ""
+        upstream = UPSTREAMS.get(host, host)
+        connected = []
+        started = time.perf_counter()
+        try:
+            async with self._host_limits[host]:
+                async with self.client.stream(
+                    method, url, extensions={"trace": _connection_tracer(connected)}, **kwargs
+                ) as response:
+                    yield response
+        except httpx.TransportError:
+            metrics.inc("autotube_http_errors_total", upstream=upstream)
+            raise
+        finally:
+            _record(upstream, started, connected)
+
+    async def download(self, url: str, output_path: str, max_bytes: int = DOWNLOAD_MAX_BYTES,
+                       chunk_size: int = DOWNLOAD_CHUNK_SIZE, **kwargs) -> str:
+        """Stream a file to disk in fixed-size chunks, resuming partial downloads.
+
+        Bytes land in ``output_path + ".part"`` and are renamed into place only once
+        complete. A retry sends a Range header for the bytes already on disk.
+        """
+        part_path = output_path + ".part"
+        base_headers = kwargs.pop("headers", None) or {}
+        for attempt in range(HTTP_RETRIES + 1):
+            offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+            headers = dict(base_headers)
+            if offset:
+                headers["Range"] = f"bytes={offset}-"
+            try:
+                async with self.stream("GET", url, headers=headers, **kwargs) as response:
+                    if response.status_code == 416:
+                        # Server says our partial file already covers the whole resource
+                        break
+                    response.raise_for_status()
+                    if response.status_code != 206:
+                        offset = 0
+                    expected = int(response.headers.get("content-length", 0)) + offset
+                    if expected > max_bytes:
+                        raise DownloadTooLarge(f"{url} is {expected} bytes (cap {max_bytes})")
+
+                    with open(part_path, "ab" if offset else "wb") as f:
+                        written = offset
+                        async for chunk in response.aiter_bytes(chunk_size):
+                            written += len(chunk)
+                            if written > max_bytes:
+                                raise DownloadTooLarge(f"{url} exceeded {max_bytes} bytes")
+                            f.write(chunk)
+                            metrics.count_download(len(chunk))
+                break
+            except DownloadTooLarge:
+                _remove(part_path)
+                raise
+            except (httpx.TransportError, httpx.HTTPStatusError) as e:
+                status = getattr(getattr(e, "response", None), "status_code", None)
+                if attempt == HTTP_RETRIES or (status is not None and status not in RETRY_STATUSES):
+                    raise
+                await asyncio.sleep(_backoff(attempt))
+
+        os.replace(part_path, output_path)
+        return output_path
+
+    async def aclose(self):
+        await self.client.aclose()
+
+
+class DownloadTooLarge(Exception):
+    pass
+
+
+def _remove(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _connection_tracer(connected: list):
+    async def trace(event_name, info):
+        # httpcore only emits connect_tcp when it opens a fresh connection
+        if event_name == "connection.connect_tcp.complete":
+            connected.append(True)
+    return trace
+
+
+def _record(upstream: str, started: float, connected: list):
+    metrics.observe("autotube_http_request_seconds", time.perf_counter() - started, upstream=upstream)
+    metrics.inc("autotube_http_connections_total", upstream=upstream, reused=str(not connected).lower())
+
+
+def _backoff(attempt: int) -> float:
+    return HTTP_BACKOFF * (2 ** attempt) + random.uniform(0, HTTP_BACKOFF)
+
+
+def _retry_after(response: httpx.Response) -> float:
+    try:
+        return float(response.headers.get("retry-after", ""))
+    except ValueError:
+        return 0.0
+
+
+_client = None
+
+
+async def start_client() -> HttpClient:
+    """Create the application-wide client (called from the FastAPI lifespan)."""
+    global _client
+    if _client is None:
+        _client = HttpClient()
+    return _client
+
+
+async def close_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def get_client() -> HttpClient:
+    """Return the shared client, creating one lazily outside the web app (scripts, tests)."""
+    global _client
+    if _client is None:
+        _client = HttpClient()
+    return _client
@@ -1,62 +1,34 @@
+import os
+import re
+import json
+import time
 import asyncio
-import httpx
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
 from duckduckgo_search import DDGS
 
-async def research_topic(topic: str) -> dict:
-    """Research a topic using DuckDuckGo search - completely free, no API key needed."""
-    loop = asyncio.get_event_loop()
-    results = await loop.run_in_executor(None, _search, topic)
-    return results
+from agents.file_lock import file_lock
+from agents.disk_cache import evict_lru
 
-def _search(topic: str) -> dict:
-    try:
-        with DDGS() as ddgs:
-            # Text search
-            text_results = list(ddgs.text(
-                f"{topic} explained facts information",
-                max_results=8
-            ))
-            
-            # News results for recency
-            try:
-                news_results = list(ddgs.news(topic, max_results=4))
-            except Exception:
-                news_results = []
-
-        summaries = []
-        for r in text_results[:6]:
-            summaries.append({
-                "title": r.get("title", ""),
-                "snippet": r.get("body", ""),
-                "url": r.get("href", ""),
-            })
-
-        news = []
-        for r in news_results[:3]:
-            news.append({
-                "title": r.get("title", ""),
-                "snippet": r.get("body", ""),
-                "date": r.get("date", ""),
-            })
-
-        combined_text = "\n\n".join([
-            f"Source: {s['title']}\n{s['snippet']}"
-            for s in summaries
-        ])
+# Cached DuckDuckGo results; news goes stale much faster than background facts
+RESEARCH_CACHE_DIR = os.getenv("RESEARCH_CACHE_DIR", "cache/research")
+RESEARCH_TEXT_TTL = int(os.getenv("RESEARCH_TEXT_TTL", str(24 * 3600)))
+RESEARCH_NEWS_TTL = int(os.getenv("RESEARCH_NEWS_TTL", str(3600)))
+RESEARCH_CACHE_MAX_BYTES = int(os.getenv("RESEARCH_CACHE_MAX_BYTES", str(64 * 1024 ** 2)))
+RESEARCH_WORKERS = int(os.getenv("RESEARCH_WORKERS", "4"))
 
-        if news:
-            combined_text += "\n\nRecent News:\n" + "\n\n".join([
-                f"{n['title']}: {n['snippet']}"
-                for n in news
-            ])
+_search_pool = ThreadPoolExecutor(max_workers=RESEARCH_WORKERS, thread_name_prefix="research")
+_inflight = {}
 
-        return {
-            "topic": topic,
-            "summaries": summaries,
-            "news": news,
-            "combined_text": combined_text[:8000],  # Limit context size
-        }
 
+async def research_topic(topic: str) -> dict:
+    """Research a topic using DuckDuckGo search - completely free, no API key needed."""
+    try:
+        text_results, news_results = await asyncio.gather(
+            _cached_search("text", topic, RESEARCH_TEXT_TTL, _search_text),
+            _cached_search("news", topic, RESEARCH_NEWS_TTL, _search_news),
+        )
+        return _summarize(topic, text_results, news_results)
     except Exception as e:
         print(f"Research error: {e}")
         # Fallback with minimal data
@@ -66,3 +38,103 @@ def _search(topic: str) -> dict:
             "news": [],
             "combined_text": f"Topic: {topic}. Please generate an educational video about this subject.",
         }
+
+
+def normalize_topic(topic: str) -> str:
+    return re.sub(r"\s+", " ", topic.lower()).strip()
+
+
+async def _cached_search(kind: str, topic: str, ttl: int, search) -> list:
+    """Serve ``kind`` results from disk while fresh; concurrent misses share one search."""
+    key = hashlib.sha1(normalize_topic(topic).encode()).hexdigest()
+    path = os.path.join(RESEARCH_CACHE_DIR, kind, key + ".json")
+    results = _read_fresh(path, ttl)
+    if results is not None:
+        return results
+
+    inflight = _inflight.get((kind, key))
+    if inflight is None:
+        inflight = asyncio.ensure_future(_search_once(path, ttl, search, topic))
+        _inflight[(kind, key)] = inflight
+        inflight.add_done_callback(lambda _: _inflight.pop((kind, key), None))
+    return await asyncio.shield(inflight)
+
+
+async def _search_once(path: str, ttl: int, search, topic: str) -> list:
+    # Another worker process may be running the same search; wait for it and reuse its result
+    async with file_lock(path + ".lock"):
+        results = _read_fresh(path, ttl)
+        if results is not None:
+            return results
+        loop = asyncio.get_event_loop()
+        results = await loop.run_in_executor(_search_pool, search, topic)
+        if results:
+            tmp = f"{path}.{os.getpid()}.tmp"
+            with open(tmp, "w") as f:
+                json.dump(results, f)
+            os.replace(tmp, path)
+            evict_lru(RESEARCH_CACHE_DIR, RESEARCH_CACHE_MAX_BYTES, max_age=max(RESEARCH_TEXT_TTL, RESEARCH_NEWS_TTL))
+    return results
+
+
+def _read_fresh(path: str, ttl: int):
+    try:
+        if time.time() - os.path.getmtime(path) < ttl:
+            with open(path) as f:
+                return json.load(f)
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def _search_text(topic: str) -> list:
+    with DDGS() as ddgs:
+        return list(ddgs.text(
+            f"{topic} explained facts information",
+            max_results=8
+        ))
+
+
+def _search_news(topic: str) -> list:
+    # News results for recency
+    try:
+        with DDGS() as ddgs:
+            return list(ddgs.news(topic, max_results=4))
+    except Exception:
+        return []
+
+
+def _summarize(topic: str, text_results: list, news_results: list) -> dict:
+    summaries = []
+    for r in text_results[:6]:
+        summaries.append({
+            "title": r.get("title", ""),
+            "snippet": r.get("body", ""),
+            "url": r.get("href", ""),
+        })
+
+    news = []
+    for r in news_results[:3]:
+        news.append({
+            "title": r.get("title", ""),
+            "snippet": r.get("body", ""),
+            "date": r.get("date", ""),
+        })
+
+    combined_text = "\n\n".join([
+        f"Source: {s['title']}\n{s['snippet']}"
+        for s in summaries
+    ])
+
+    if news:
+        combined_text += "\n\nRecent News:\n" + "\n\n".join([
+            f"{n['title']}: {n['snippet']}"
+            for n in news
+        ])
+
+    return {
+        "topic": topic,
+        "summaries": summaries,
+        "news": news,
+        "combined_text": combined_text[:8000],  # Limit context size
+    }
@@ -1,10 +1,20 @@
 import os
+import re
 import json
-import asyncio
-import httpx
+import time
+import hashlib
+from agents.http_client import get_client
+from agents.disk_cache import evict_lru
 
 GROQ_API_KEY = os.getenv("GROQ_API_KEY", "")
 GROQ_URL = "https://api.groq.com/openai/v1/chat/completions"
+GROQ_MODEL = "llama-3.3-70b-versatile"
+
+SCRIPT_STREAMING = os.getenv("SCRIPT_STREAMING", "1") == "1"
+SCRIPT_MAX_RETRIES = int(os.getenv("SCRIPT_MAX_RETRIES", "2"))
+SCRIPT_CACHE_DIR = os.getenv("SCRIPT_CACHE_DIR", "cache/scripts")
+SCRIPT_CACHE_TTL = int(os.getenv("SCRIPT_CACHE_TTL", str(7 * 24 * 3600)))
+SCRIPT_CACHE_MAX_BYTES = int(os.getenv("SCRIPT_CACHE_MAX_BYTES", str(64 * 1024 ** 2)))
 
 SCRIPT_PROMPT = """You are an expert YouTube video scriptwriter. Based on the research data provided, create a compelling video script.
 
@@ -13,7 +23,6 @@ Return ONLY a valid JSON object with this exact structure:
   "title": "Catchy YouTube video title",
   "description": "YouTube video description (2-3 sentences)",
   "tags": ["tag1", "tag2", "tag3", "tag4", "tag5"],
-  "narration": "Full narration text that will be converted to speech. Should be 200-400 words, engaging, educational, and flow naturally when spoken. No stage directions, just the spoken words.",
   "scenes": [
     {{
       "id": 1,
@@ -21,7 +30,8 @@ Return ONLY a valid JSON object with this exact structure:
       "search_query": "pexels search query for this scene",
       "duration": 5
     }}
-  ]
+  ],
+  "narration": "Full narration text that will be converted to speech. Should be 200-400 words, engaging, educational, and flow naturally when spoken. No stage directions, just the spoken words."
 }}
 
 Create 6-8 scenes. Each scene should have a duration of 4-7 seconds.
@@ -34,7 +44,17 @@ Research Data:
 
 Remember: Return ONLY the JSON object, no other text."""
 
-async def generate_script(topic: str, research_data: dict) -> dict:
+REPAIR_PROMPT = """Your previous reply could not be used: {error}
+
+Reply again with ONLY the corrected JSON object, using the exact structure requested."""
+
+
+async def generate_script(topic: str, research_data: dict, on_scene=None, use_cache: bool = True) -> dict:
+    """Write the video script with Groq.
+
+    ``on_scene(scene)`` is called for each scene as soon as it has streamed in, so
+    footage can be fetched while the narration is still being generated.
+    """
     if not GROQ_API_KEY:
         raise ValueError("GROQ_API_KEY environment variable not set")
 
@@ -42,26 +62,146 @@ async def generate_script(topic: str, research_data: dict) -> dict:
         topic=topic,
         research=research_data.get("combined_text", "")[:4000]
     )
+    messages = [{"role": "user", "content": prompt}]
+
+    cache_path = os.path.join(SCRIPT_CACHE_DIR, hashlib.sha256(f"{GROQ_MODEL}\n{prompt}".encode()).hexdigest() + ".json")
+    if use_cache:
+        script = _read_cache(cache_path)
+        if script is not None:
+            if on_scene:
+                for scene in script["scenes"]:
+                    on_scene(scene)
+            return script
+
+    for attempt in range(SCRIPT_MAX_RETRIES + 1):
+        if on_scene and SCRIPT_STREAMING:
+            content = await _complete_streaming(messages, ScenesParser(on_scene))
+        else:
+            content = await _complete(messages)
+        try:
+            script = parse_script(content)
+            break
+        except ValueError as e:
+            if attempt == SCRIPT_MAX_RETRIES:
+                raise
+            print(f"Script JSON invalid ({e}), asking for a repair")
+            messages = messages[:1] + [
+                {"role": "assistant", "content": content},
+                {"role": "user", "content": REPAIR_PROMPT.format(error=e)},
+            ]
+
+    _write_cache(cache_path, script)
+    return script
 
-    async with httpx.AsyncClient(timeout=60.0) as client:
-        response = await client.post(
-            GROQ_URL,
-            headers={
-                "Authorization": f"Bearer {GROQ_API_KEY}",
-                "Content-Type": "application/json",
-            },
-            json={
-                "model": "llama-3.3-70b-versatile",
-                "messages": [{"role": "user", "content": prompt}],
-                "temperature": 0.7,
-                "max_tokens": 2000,
-            }
-        )
+
+def _request_body(messages: list, stream: bool = False) -> dict:
+    return {
+        "model": GROQ_MODEL,
+        "messages": messages,
+        "temperature": 0.7,
+        "max_tokens": 2000,
+        "stream": stream,
+    }
+
+
+def _headers() -> dict:
+    return {
+        "Authorization": f"Bearer {GROQ_API_KEY}",
+        "Content-Type": "application/json",
+    }
+
+
+async def _complete(messages: list) -> str:
+    client = get_client()
+    response = await client.post(GROQ_URL, headers=_headers(), json=_request_body(messages), timeout=60.0)
+    response.raise_for_status()
+    data = response.json()
+    return data["choices"][0]["message"]["content"]
+
+
+async def _complete_streaming(messages: list, parser: "ScenesParser") -> str:
+    """Stream the completion over SSE, feeding every token to ``parser``."""
+    client = get_client()
+    parts = []
+    async with client.stream("POST", GROQ_URL, headers=_headers(), json=_request_body(messages, stream=True), timeout=60.0) as response:
         response.raise_for_status()
-        data = response.json()
+        async for line in response.aiter_lines():
+            if not line.startswith("data:"):
+                continue
+            payload = line[5:].strip()
+            if payload == "[DONE]":
+                break
+            delta = json.loads(payload)["choices"][0].get("delta", {}).get("content") or ""
+            parts.append(delta)
+            parser.feed(delta)
+    return "".join(parts)
+
+
+class ScenesParser:
+    """Incrementally pulls complete objects out of the ``"scenes"`` array of a streaming JSON reply."""
+
+    def __init__(self, on_scene):
+        self.on_scene = on_scene
+        self.buffer = ""
+        self.pos = 0
+        self.in_array = False
+        self.done = False
+        self.depth = 0
+        self.in_string = False
+        self.escaped = False
+        self.start = None
+
+    def feed(self, text: str):
+        if self.done:
+            return
+        self.buffer += text
+        if not self.in_array:
+            key = self.buffer.find('"scenes"')
+            bracket = self.buffer.find("[", key) if key != -1 else -1
+            if bracket == -1:
+                return
+            self.in_array = True
+            self.pos = bracket + 1
+
+        while self.pos < len(self.buffer):
+            ch = self.buffer[self.pos]
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif ch == "\\":
+                    self.escaped = True
+                elif ch == '"':
+                    self.in_string = False
+            elif ch == '"':
+                self.in_string = True
+            elif ch == "{":
+                if self.depth == 0:
+                    self.start = self.pos
+                self.depth += 1
+            elif ch == "}":
+                self.depth -= 1
+                if self.depth == 0:
+                    self._emit(self.buffer[self.start:self.pos + 1])
+            elif ch == "]" and self.depth == 0:
+                self.done = True
+                return
+            self.pos += 1
+
+    def _emit(self, raw: str):
+        try:
+            scene = json.loads(raw)
+        except ValueError:
+            return
+        try:
+            self.on_scene(scene)
+        except Exception as e:
+            print(f"Scene callback error: {e}")
+
+
+def parse_script(content: str) -> dict:
+    """Parse and validate the model's reply, tolerating fences, chatter and trailing commas."""
+    content = content.strip()
 
-    content = data["choices"][0]["message"]["content"].strip()
-    
     # Clean up JSON if wrapped in markdown
     if content.startswith("```"):
         content = content.split("```")[1]
@@ -69,12 +209,54 @@ async def generate_script(topic: str, research_data: dict) -> dict:
             content = content[4:]
     content = content.strip()
 
-    script = json.loads(content)
-    
+    start, end = content.find("{"), content.rfind("}")
+    if start == -1 or end == -1:
+        raise ValueError("no JSON object in response")
+    content = content[start:end + 1]
+
+    try:
+        script = json.loads(content)
+    except ValueError:
+        try:
+            script = json.loads(re.sub(r",\s*([}\]])", r"\1", content))
+        except ValueError as e:
+            raise ValueError(f"invalid JSON: {e}")
+
+    return validate_script(script)
+
+
+def validate_script(script) -> dict:
+    """Check a script (the model's or a user's edit) has what the pipeline reads; raises ValueError."""
+    if not isinstance(script, dict):
+        raise ValueError("Script must be a JSON object")
+
     # Validate required fields
     required = ["title", "description", "narration", "scenes", "tags"]
     for field in required:
         if field not in script:
             raise ValueError(f"Missing field in script: {field}")
+    if not isinstance(script["narration"], str):
+        raise ValueError("Script narration must be a string")
+    if not isinstance(script["scenes"], list) or not all(isinstance(scene, dict) for scene in script["scenes"]):
+        raise ValueError("Script scenes must be a list of objects")
 
     return script
+
+
+def _read_cache(path: str):
+    try:
+        if time.time() - os.path.getmtime(path) < SCRIPT_CACHE_TTL:
+            with open(path) as f:
+                return json.load(f)
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def _write_cache(path: str, script: dict):
+    os.makedirs(SCRIPT_CACHE_DIR, exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(script, f)
+    os.replace(tmp, path)
+    evict_lru(SCRIPT_CACHE_DIR, SCRIPT_CACHE_MAX_BYTES, max_age=SCRIPT_CACHE_TTL)
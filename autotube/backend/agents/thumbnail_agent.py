@@ -0,0 +1,129 @@
+import io
+import os
+import subprocess
+import numpy as np
+from PIL import Image
+
+from agents.clip_normalizer import ffmpeg_exe
+from agents.ffmpeg_render import render_text_image
+
+# Thumbnails come straight from the scene footage, not the finished video, so they can be
+# made while the main encode runs. Candidates are keyframes only (decoded with
+# -skip_frame nokey, downscaled to a gray 160x90) scored for sharpness and exposure.
+THUMBNAIL_SIZES = [(1280, 720), (640, 360), (320, 180)]
+SCORE_WIDTH, SCORE_HEIGHT = 160, 90
+MAX_CANDIDATES_PER_SCENE = 12
+TITLE_WRAP = 22
+TITLE_FONTSIZE = 88
+BACKGROUND = (20, 20, 40)
+
+
+def create_thumbnails(sources: list, title: str, output_dir: str, sizes: list = THUMBNAIL_SIZES) -> list:
+    """Pick the best frame across the scene ``sources``, title it and save every size.
+
+    The first size is written as ``thumbnail.jpg``, the others as ``thumbnail_{w}x{h}.jpg``.
+    Returns the written paths in ``sizes`` order.
+    """
+    best = None
+    for source in sources:
+        if not source or not os.path.exists(source):
+            continue
+        try:
+            for index, score in enumerate(_score_keyframes(source)):
+                if best is None or score > best[0]:
+                    best = (score, source, index)
+        except Exception as e:
+            print(f"Thumbnail scoring failed for {source}: {e}")
+
+    width, height = sizes[0]
+    frame = None
+    if best is not None:
+        try:
+            frame = _cover(_extract_keyframe(best[1], best[2]), width, height)
+        except Exception as e:
+            print(f"Thumbnail frame extraction failed: {e}")
+    if frame is None:
+        frame = Image.new("RGB", (width, height), BACKGROUND)
+
+    _draw_title(frame, title, output_dir)
+
+    # Compose once at the largest size, then downscale for the rest
+    paths = []
+    for (w, h), name in zip(sizes, thumbnail_names(sizes)):
+        path = os.path.join(output_dir, name)
+        image = frame if (w, h) == frame.size else frame.resize((w, h), Image.LANCZOS)
+        image.save(path, quality=90)
+        paths.append(path)
+    return paths
+
+
+def thumbnail_names(sizes: list = THUMBNAIL_SIZES) -> list:
+    return ["thumbnail.jpg"] + [f"thumbnail_{w}x{h}.jpg" for w, h in sizes[1:]]
+
+
+def _score_keyframes(source: str) -> list:
+    """Score each keyframe: Laplacian variance (sharpness), damped for dark or blown-out frames."""
+    result = subprocess.run([
+        ffmpeg_exe(), "-hide_banner", "-loglevel", "error",
+        "-skip_frame", "nokey", "-i", source,
+        "-vf", f"scale={SCORE_WIDTH}:{SCORE_HEIGHT}", "-fps_mode", "passthrough",
+        "-frames:v", str(MAX_CANDIDATES_PER_SCENE),
+        "-f", "rawvideo", "-pix_fmt", "gray", "-",
+    ], capture_output=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.decode(errors="replace").strip()[-500:])
+
+    frames = np.frombuffer(result.stdout, dtype=np.uint8)
+    frames = frames[: len(frames) // (SCORE_WIDTH * SCORE_HEIGHT) * SCORE_WIDTH * SCORE_HEIGHT]
+    scores = []
+    for frame in frames.reshape(-1, SCORE_HEIGHT, SCORE_WIDTH).astype(np.float32):
+        laplacian = (
+            4 * frame[1:-1, 1:-1]
+            - frame[:-2, 1:-1] - frame[2:, 1:-1]
+            - frame[1:-1, :-2] - frame[1:-1, 2:]
+        )
+        exposure = 1 - abs(frame.mean() / 255 - 0.5) * 2
+        contrast = min(frame.std() / 64, 1)
+        scores.append(float(np.log1p(laplacian.var()) * exposure * (0.5 + contrast)))
+    return scores
+
+
+def _extract_keyframe(source: str, index: int) -> Image.Image:
+    result = subprocess.run([
+        ffmpeg_exe(), "-hide_banner", "-loglevel", "error",
+        "-skip_frame", "nokey", "-i", source,
+        "-vf", f"select=eq(n\\,{index})", "-fps_mode", "passthrough", "-frames:v", "1",
+        "-f", "image2pipe", "-vcodec", "png", "-",
+    ], capture_output=True)
+    if result.returncode != 0 or not result.stdout:
+        raise RuntimeError(result.stderr.decode(errors="replace").strip()[-500:] or "no frame decoded")
+    return Image.open(io.BytesIO(result.stdout)).convert("RGB")
+
+
+def _cover(image: Image.Image, width: int, height: int) -> Image.Image:
+    """Scale to fill ``width`` x ``height`` and center-crop the overflow."""
+    scale = max(width / image.width, height / image.height)
+    resized = image.resize((round(image.width * scale), round(image.height * scale)), Image.LANCZOS)
+    left = (resized.width - width) // 2
+    top = (resized.height - height) // 2
+    return resized.crop((left, top, left + width, top + height))
+
+
+def _draw_title(frame: Image.Image, title: str, output_dir: str):
+    """Title in the lower third over a dark gradient, scaled to the frame width."""
+    width, height = frame.size
+    gradient = Image.linear_gradient("L").resize((width, height // 2))
+    shade = Image.new("RGB", gradient.size, (0, 0, 0))
+    frame.paste(shade, (0, height - gradient.height), gradient.point(lambda v: v * 0.75))
+
+    scale = width / 1280
+    card_path = os.path.join(output_dir, "thumbnail_title.png")
+    render_text_image(title, card_path, wrap=TITLE_WRAP, fontsize=round(TITLE_FONTSIZE * scale),
+                      bold=True, stroke=max(2, round(5 * scale)))
+    with Image.open(card_path) as card:
+        card = card.convert("RGBA")
+        if card.width > width * 0.94:
+            ratio = width * 0.94 / card.width
+            card = card.resize((round(card.width * ratio), round(card.height * ratio)), Image.LANCZOS)
+        frame.paste(card, ((width - card.width) // 2, height - card.height - round(40 * scale)), card)
+    os.remove(card_path)
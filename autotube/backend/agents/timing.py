@@ -0,0 +1,87 @@
+import os
+import json
+
+# Narration timing index captured from edge-tts boundary events. Times are in seconds:
+# {"duration": 93.4, "words": [[start, end, "word"], ...], "sentences": [[start, end, "text"], ...]}
+# "sentences" are the synthesized chunks, which always break at sentence ends.
+
+SNAP_WINDOW = float(os.getenv("SCENE_SNAP_WINDOW", "2.0"))
+MIN_SCENE_SECONDS = 1.5
+CAPTION_MAX_CHARS = 42
+
+
+def timing_path(audio_path: str) -> str:
+    return os.path.splitext(audio_path)[0] + ".timing.json"
+
+
+def save_timing(audio_path: str, index: dict) -> str:
+    path = timing_path(audio_path)
+    with open(path, "w") as f:
+        json.dump(index, f, separators=(",", ":"))
+    return path
+
+
+def load_timing(audio_path: str):
+    try:
+        with open(timing_path(audio_path)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def plan_scene_cuts(weights: list, timing: dict) -> list:
+    """Scene durations that split the narration by ``weights``, with cuts moved onto pauses.
+
+    Each proportional cut point snaps to the nearest sentence end within SNAP_WINDOW,
+    else to the nearest word end, as long as every scene stays at least MIN_SCENE_SECONDS.
+    """
+    total = timing["duration"]
+    weight_sum = max(sum(weights), 1e-9)
+    sentence_ends = [s[1] for s in timing.get("sentences", [])[:-1]]
+    word_ends = [w[1] for w in timing.get("words", [])[:-1]]
+
+    cuts = []
+    elapsed = 0.0
+    previous = 0.0
+    for weight in weights[:-1]:
+        elapsed += weight / weight_sum * total
+        cut = elapsed
+        for candidates in (sentence_ends, word_ends):
+            near = [
+                t for t in candidates
+                if abs(t - elapsed) <= SNAP_WINDOW
+                and t - previous >= MIN_SCENE_SECONDS
+                and total - t >= MIN_SCENE_SECONDS
+            ]
+            if near:
+                cut = min(near, key=lambda t: abs(t - elapsed))
+                break
+        cut = max(cut, previous)
+        cuts.append(cut)
+        previous = cut
+
+    edges = [0.0] + cuts + [total]
+    return [edges[i + 1] - edges[i] for i in range(len(weights))]
+
+
+def caption_cues(timing: dict, max_chars: int = CAPTION_MAX_CHARS) -> list:
+    """Group words into caption lines: ``[[start, end, text], ...]``, never spanning sentences."""
+    sentence_ends = sorted(s[1] for s in timing.get("sentences", []))
+    cues = []
+    line, start, end = [], None, None
+    k = 0
+    for w_start, w_end, word in timing.get("words", []):
+        new_sentence = False
+        while k < len(sentence_ends) and w_start >= sentence_ends[k]:
+            k += 1
+            new_sentence = True
+        if line and (new_sentence or len(" ".join(line + [word])) > max_chars):
+            cues.append([start, end, " ".join(line)])
+            line = []
+        if not line:
+            start = w_start
+        line.append(word)
+        end = w_end
+    if line:
+        cues.append([start, end, " ".join(line)])
+    return cues
@@ -1,12 +1,20 @@
 import os
 import asyncio
-import httpx
+from agents.http_client import get_client
+from agents.footage_cache import get_cache
+from agents.clip_normalizer import normalize_clip, trim_segment, concat_segments
+from agents.ffmpeg_render import render_ffmpeg, render_segments, compare_renders, render_text_image, transcode_preview, CAPTION_WRAP, CAPTION_FONTSIZE, CAPTION_MARGIN
+from agents.encode_profiles import get_profile, draft_profile, is_landscape, encode_threads, x264_args, PREVIEW
+from agents.timing import load_timing, plan_scene_cuts, caption_cues
+from agents.thumbnail_agent import create_thumbnails
+import metrics
 from moviepy.editor import (
     VideoFileClip, AudioFileClip, concatenate_videoclips,
-    TextClip, CompositeVideoClip, ColorClip
+    TextClip, CompositeVideoClip, ColorClip, ImageClip
 )
-from moviepy.video.fx import resize
 import textwrap
+from proglog import ProgressBarLogger
+from concurrent.futures import ThreadPoolExecutor
 
 PEXELS_API_KEY = os.getenv("PEXELS_API_KEY", "")
 PEXELS_URL = "https://api.pexels.com/videos/search"
@@ -14,63 +22,181 @@ PEXELS_URL = "https://api.pexels.com/videos/search"
 VIDEO_WIDTH = 1920
 VIDEO_HEIGHT = 1080
 
+# Max scenes searched/downloaded at once, and worker threads preparing clips
+SCENE_CONCURRENCY = int(os.getenv("SCENE_CONCURRENCY", "4"))
+CLIP_WORKERS = int(os.getenv("CLIP_WORKERS", "4"))
 
-async def create_video(script: dict, audio_path: str, output_dir: str, job_id: str) -> str:
-    """Download stock footage and assemble final video."""
+# Render backend used when a job doesn't pick one ("moviepy", "ffmpeg" or "segments")
+DEFAULT_RENDER_BACKEND = os.getenv("RENDER_BACKEND", "moviepy")
+# Drafts always encode at their own size in ffmpeg ("ffmpeg" or "segments"); moviepy
+# would compose every frame at 1080p first, costing nearly a full render
+DRAFT_RENDER_BACKEND = os.getenv("DRAFT_RENDER_BACKEND", "segments")
+# Also render with moviepy and log PSNR/duration drift against it (debugging only)
+RENDER_PARITY_CHECK = os.getenv("RENDER_PARITY_CHECK", "") == "1"
+
+_clip_pool = ThreadPoolExecutor(max_workers=CLIP_WORKERS, thread_name_prefix="clip")
+_prefetch_limit = asyncio.Semaphore(SCENE_CONCURRENCY)
+
+
+async def create_video(script: dict, audio_path: str, output_dir: str, job_id: str, render_backend: str = None,
+                       checkpoints=None, audio_hash: str = None, captions: bool = False, on_progress=None, check_quota=None,
+                       profile: str = None, threads: int = None, draft: bool = False) -> str:
+    """Download stock footage and assemble final video.
+
+    ``captions`` burns in narration captions timed from the voice's timing index.
+    ``on_progress(frames_done, frames_total)`` is called from the render thread while encoding.
+    ``check_quota()`` runs once the scene clips are on disk and raises to stop before the encode.
+    ``profile`` names an encode profile (see agents.encode_profiles); renders larger than the
+    preview rendition also write ``preview.mp4`` for the approval player.
+    ``draft`` renders ``draft.mp4`` at the draft settings (framed like ``profile``) for review,
+    without thumbnails; the approved full render then reuses the same clips and audio.
+
+    With ``checkpoints`` (see checkpoints.Checkpoints), scene clips and the final render
+    are reused from a previous run when their inputs are unchanged.
+    """
     
     scenes = script.get("scenes", [])
     narration = script.get("narration", "")
     title = script.get("title", "AutoTube Video")
 
-    # Get audio duration to time scenes
-    audio_clip = AudioFileClip(audio_path)
-    total_duration = audio_clip.duration
-    audio_clip.close()
+    backend = render_backend or DEFAULT_RENDER_BACKEND
+    if backend not in RENDER_BACKENDS:
+        raise ValueError(f"Unknown render backend: {backend}")
+    profile = get_profile(profile)
+    if draft:
+        profile = draft_profile(profile)
+        backend = DRAFT_RENDER_BACKEND
+    if backend == "moviepy" and not is_landscape(profile):
+        # moviepy composes on a 16:9 canvas; portrait framing needs the ffmpeg graph
+        backend = "ffmpeg"
+    threads = threads or encode_threads()
 
-    # Redistribute scene durations proportionally
-    total_script_duration = sum(s.get("duration", 5) for s in scenes)
-    for scene in scenes:
-        ratio = scene.get("duration", 5) / max(total_script_duration, 1)
-        scene["actual_duration"] = ratio * total_duration
+    # Time scenes from the narration's timing index, cutting on sentence/word ends
+    timing = load_timing(audio_path)
+    if timing is not None:
+        durations = plan_scene_cuts([s.get("duration", 5) for s in scenes], timing)
+        for scene, duration in zip(scenes, durations):
+            scene["actual_duration"] = duration
+        cues = caption_cues(timing) if captions else None
+    else:
+        # No timing index (older audio): redistribute scene durations proportionally
+        audio_clip = AudioFileClip(audio_path)
+        total_duration = audio_clip.duration
+        audio_clip.close()
+        total_script_duration = sum(s.get("duration", 5) for s in scenes)
+        for scene in scenes:
+            ratio = scene.get("duration", 5) / max(total_script_duration, 1)
+            scene["actual_duration"] = ratio * total_duration
+        cues = None
 
-    # Download videos for each scene
+    # Download and prepare every scene concurrently
     clips_dir = f"{output_dir}/clips"
     os.makedirs(clips_dir, exist_ok=True)
 
-    video_clips = []
-    
-    for i, scene in enumerate(scenes):
-        query = scene.get("search_query", scene.get("text", "nature landscape"))
-        duration = scene.get("actual_duration", 5)
-        
-        clip_path = await download_pexels_video(query, f"{clips_dir}/scene_{i}.mp4", duration)
-        
-        if clip_path and os.path.exists(clip_path):
-            try:
-                clip = VideoFileClip(clip_path)
-                # Resize to standard size
-                clip = clip.resize((VIDEO_WIDTH, VIDEO_HEIGHT))
-                # Trim to needed duration
-                if clip.duration > duration:
-                    clip = clip.subclip(0, duration)
-                elif clip.duration < duration:
-                    # Loop if too short
-                    loops = int(duration / clip.duration) + 1
-                    from moviepy.editor import concatenate_videoclips as concat
-                    clip = concat([clip] * loops).subclip(0, duration)
-                video_clips.append(clip)
-            except Exception as e:
-                print(f"Error processing clip {i}: {e}")
-                # Fallback: colored placeholder
-                video_clips.append(create_placeholder_clip(duration, scene.get("text", "")))
-        else:
-            video_clips.append(create_placeholder_clip(duration, scene.get("text", "")))
+    download_limit = asyncio.Semaphore(SCENE_CONCURRENCY)
+    sources = await asyncio.gather(*[
+        _build_scene(i, scene, clips_dir, download_limit, checkpoints)
+        for i, scene in enumerate(scenes)
+    ])
 
-    if not video_clips:
+    if not sources:
         raise ValueError("No video clips could be created")
+    if check_quota is not None:
+        check_quota()
+
+    output_path = f"{output_dir}/{'draft' if draft else 'final_video'}.mp4"
+    preview_path = f"{output_dir}/preview.mp4" if not draft and profile["height"] > PREVIEW["height"] else None
+    render_inputs = {
+        "scenes": [
+            [source, scene.get("search_query"), scene.get("text", ""), round(scene.get("actual_duration", 5), 3)]
+            for scene, source in zip(scenes, sources)
+        ],
+        "audio": audio_hash,
+        "title": title,
+        "backend": backend,
+        "captions": cues,
+        "profile": profile,
+        "preview": preview_path is not None,
+    }
+    # Draft and full renders keep separate checkpoints, so approving a draft doesn't invalidate it
+    stage = "draft" if draft else "render"
+    if checkpoints is not None and audio_hash:
+        rendered = checkpoints.fresh(stage, render_inputs)
+        if rendered is not None:
+            print(f"[{job_id}] Reusing {stage} render")
+            script["render"] = rendered["render"]
+            return output_path
+
+    # Thumbnails are picked from the scene footage, so they're made alongside the encode
+    thumbnails = None if draft else asyncio.ensure_future(_create_thumbnails(sources, title, output_dir))
+
+    # Render with the selected backend, falling back to moviepy (or, for moviepy, to ffmpeg)
+    # Concatenation and encoding happen in one pass in both backends, so they share a span
+    loop = asyncio.get_event_loop()
+    try:
+        try:
+            with metrics.span("render", backend=backend, profile=profile["name"]):
+                await loop.run_in_executor(None, lambda: RENDER_BACKENDS[backend](
+                    scenes, sources, audio_path, title, output_dir, output_path, cues, on_progress=on_progress,
+                    profile=profile, preview_path=preview_path, threads=threads,
+                ))
+        except Exception as e:
+            fallback = "ffmpeg" if backend == "moviepy" else "moviepy" if is_landscape(profile) else None
+            if fallback is None:
+                raise
+            print(f"[{job_id}] {backend} render failed, falling back to {fallback}: {e}")
+            backend = fallback
+            with metrics.span("render", backend=backend, profile=profile["name"], fallback=True):
+                await loop.run_in_executor(None, lambda: RENDER_BACKENDS[backend](
+                    scenes, sources, audio_path, title, output_dir, output_path, cues, on_progress=on_progress,
+                    profile=profile, preview_path=preview_path, threads=threads,
+                ))
+    except BaseException:
+        if thumbnails is not None:
+            thumbnails.cancel()
+        raise
+    script["render"] = {"backend": backend, "profile": profile["name"], "preview": preview_path is not None}
+
+    if RENDER_PARITY_CHECK and not draft and backend != "moviepy" and is_landscape(profile):
+        reference_path = f"{output_dir}/reference_video.mp4"
+        await loop.run_in_executor(
+            None, lambda: _render_moviepy(scenes, sources, audio_path, title, output_dir, reference_path, cues,
+                                          profile=profile, threads=threads)
+        )
+        script["render"]["parity"] = await loop.run_in_executor(None, compare_renders, reference_path, output_path)
+        print(f"[{job_id}] render parity vs moviepy: {script['render']['parity']}")
 
-    # Concatenate all clips
-    final_video = concatenate_videoclips(video_clips, method="compose")
+    thumbnail_paths = await thumbnails if thumbnails is not None else []
+
+    if checkpoints is not None and audio_hash:
+        paths = [output_path, *thumbnail_paths] + ([preview_path] if preview_path else [])
+        checkpoints.save(stage, render_inputs, {"paths": paths, "render": script["render"]})
+
+    return output_path
+
+
+def _render_moviepy(scenes: list, sources: list, audio_path: str, title: str, output_dir: str, output_path: str,
+                    captions: list = None, on_progress=None, profile: dict = None, preview_path: str = None,
+                    threads: int = None) -> str:
+    """Compose and encode the final video frame by frame with moviepy.
+
+    Frames are composed at 1920x1080 and scaled to the (16:9) ``profile`` size by the
+    encoding ffmpeg; the preview is transcoded from the finished render.
+    """
+    profile = profile or get_profile()
+    threads = threads or encode_threads()
+    if all(scene.get("canonical") for scene in scenes):
+        # Every scene is a canonical segment: join them with stream copy
+        video_clips = [VideoFileClip(concat_segments(sources, f"{output_dir}/clips/scenes.mp4"))]
+        final_video = video_clips[0]
+    else:
+        video_clips = [
+            VideoFileClip(source) if scene.get("canonical")
+            else _prepare_clip(i, source, scene.get("actual_duration", 5), scene.get("text", ""))
+            for i, (scene, source) in enumerate(zip(scenes, sources))
+        ]
+        # Concatenate all clips
+        final_video = concatenate_videoclips(video_clips, method="compose")
 
     # Add audio
     audio = AudioFileClip(audio_path)
@@ -83,31 +209,30 @@ async def create_video(script: dict, audio_path: str, output_dir: str, job_id: s
     title_clip = create_title_overlay(title, min(3, final_video.duration))
     final_with_title = CompositeVideoClip([
         final_video,
-        title_clip
+        title_clip,
+        *create_caption_clips(captions or [], output_dir),
     ])
 
-    # Export final video
-    output_path = f"{output_dir}/final_video.mp4"
+    # Export final video; the profile's CRF and rate cap go through ffmpeg_params
+    encode = x264_args(profile, threads)
+    ffmpeg_params = encode[encode.index("-crf"):encode.index("-threads")]
+    if (profile["width"], profile["height"]) != (VIDEO_WIDTH, VIDEO_HEIGHT):
+        ffmpeg_params += ["-vf", f"scale={profile['width']}:{profile['height']}"]
     final_with_title.write_videofile(
         output_path,
-        fps=24,
+        fps=profile["fps"],
         codec="libx264",
         audio_codec="aac",
+        audio_bitrate=profile["audio_bitrate"],
         temp_audiofile=f"{output_dir}/temp_audio.m4a",
         remove_temp=True,
-        preset="ultrafast",
-        threads=4,
-        logger=None,
+        preset=profile["preset"],
+        threads=threads,
+        ffmpeg_params=ffmpeg_params,
+        logger=_FrameLogger(on_progress) if on_progress else None,
     )
-
-    # Generate thumbnail from first frame
-    thumbnail_path = f"{output_dir}/thumbnail.jpg"
-    thumbnail_frame = final_video.get_frame(1)
-    from PIL import Image
-    import numpy as np
-    img = Image.fromarray(thumbnail_frame.astype('uint8'))
-    img = img.resize((1280, 720))
-    img.save(thumbnail_path, "JPEG", quality=85)
+    if preview_path:
+        transcode_preview(output_path, preview_path, profile["fps"], threads)
 
     # Cleanup
     for clip in video_clips:
@@ -119,50 +244,153 @@ async def create_video(script: dict, audio_path: str, output_dir: str, job_id: s
     return output_path
 
 
-async def download_pexels_video(query: str, output_path: str, min_duration: float) -> str:
+class _FrameLogger(ProgressBarLogger):
+    """Forwards moviepy's frame progress bar to an ``on_progress(done, total)`` callback."""
+
+    def __init__(self, on_progress):
+        super().__init__()
+        self.on_progress = on_progress
+
+    def bars_callback(self, bar, attr, value, old_value=None):
+        if bar == "t" and attr == "index":
+            self.on_progress(value, self.bars[bar]["total"])
+
+
+RENDER_BACKENDS = {
+    "moviepy": _render_moviepy,
+    "ffmpeg": render_ffmpeg,
+    "segments": render_segments,
+}
+
+
+async def _create_thumbnails(sources: list, title: str, output_dir: str) -> list:
+    loop = asyncio.get_event_loop()
+    with metrics.span("thumbnail"):
+        return await loop.run_in_executor(None, create_thumbnails, sources, title, output_dir)
+
+
+async def _build_scene(i: int, scene: dict, clips_dir: str, download_limit: asyncio.Semaphore, checkpoints=None):
+    """Fetch footage for one scene, then prepare it on the worker pool.
+
+    Returns the scene's footage file - a canonical segment when the clip could be
+    normalized (``scene["canonical"]``), else the raw download - or None.
+    """
+    query = scene.get("search_query", scene.get("text", "nature landscape"))
+    duration = scene.get("actual_duration", 5)
+    inputs = {"query": query, "duration": round(duration, 3)}
+
+    # A reused clip is only part of the enclosing video span, so it doesn't mark that span cached
+    cached = checkpoints.fresh(f"clip_{i}", inputs, mark_cached=False) if checkpoints is not None else None
+    if cached is not None:
+        scene["canonical"] = cached["canonical"]
+        return cached["path"]
+
+    async with download_limit:
+        with metrics.span("scene.download", scene=i):
+            clip_path = await download_pexels_video(query, f"{clips_dir}/scene_{i}.mp4")
+
+    loop = asyncio.get_event_loop()
+    with metrics.span("scene.prepare", scene=i):
+        source = await loop.run_in_executor(_clip_pool, _prepare_scene, i, clip_path, duration, clips_dir)
+    scene["canonical"] = source is not None and source != clip_path
+    if checkpoints is not None and source:
+        checkpoints.save(f"clip_{i}", inputs, {"path": source, "canonical": scene["canonical"]})
+    return source
+
+
+def _prepare_scene(i: int, clip_path: str, duration: float, clips_dir: str):
+    """Trim the canonical intermediate by stream copy, or hand back the raw clip."""
+    if not clip_path or not os.path.exists(clip_path):
+        return None
+    try:
+        normalized = normalize_clip(clip_path)
+        return trim_segment(normalized, duration, f"{clips_dir}/segment_{i}.mp4")
+    except Exception as e:
+        print(f"Normalizing clip {i} failed, using raw footage: {e}")
+        return clip_path
+
+
+def _prepare_clip(i: int, clip_path: str, duration: float, text: str):
+    """Open, resize and trim/loop a downloaded clip to the scene duration."""
+    if clip_path and os.path.exists(clip_path):
+        try:
+            # Scaled to the standard size by ffmpeg as it decodes; moviepy's own resize
+            # needs PIL.Image.ANTIALIAS, which Pillow 10 removed
+            clip = VideoFileClip(clip_path, target_resolution=(VIDEO_HEIGHT, VIDEO_WIDTH))
+            # Trim to needed duration
+            if clip.duration > duration:
+                clip = clip.subclip(0, duration)
+            elif clip.duration < duration:
+                # Loop if too short
+                loops = int(duration / clip.duration) + 1
+                clip = concatenate_videoclips([clip] * loops).subclip(0, duration)
+            return clip
+        except Exception as e:
+            print(f"Error processing clip {i}: {e}")
+    # Fallback: colored placeholder
+    return create_placeholder_clip(duration, text)
+
+
+async def download_pexels_video(query: str, output_path: str) -> str:
     """Download a stock video from Pexels API."""
+    cached = await fetch_pexels_clip(query)
+    if cached is None:
+        return None
+    return get_cache().link_into(cached, output_path)
+
+
+async def fetch_pexels_clip(query: str) -> str:
+    """Search Pexels and make sure the chosen clip is in the footage cache; returns its cache path.
+
+    The choice depends only on the query, so a prefetch made before the narration
+    fixed the scene's length warms the same clip the render uses. Clips shorter than
+    their scene are looped when trimmed.
+    """
     if not PEXELS_API_KEY:
         return None
     
     try:
-        async with httpx.AsyncClient(timeout=30.0) as client:
+        client = get_client()
+        cache = get_cache()
+        params = {
+            "query": query,
+            "per_page": 5,
+            "orientation": "landscape",
+            "size": "medium",
+        }
+
+        async def search():
             response = await client.get(
                 PEXELS_URL,
                 headers={"Authorization": PEXELS_API_KEY},
-                params={
-                    "query": query,
-                    "per_page": 5,
-                    "orientation": "landscape",
-                    "size": "medium",
-                }
+                params=params,
             )
             response.raise_for_status()
-            data = response.json()
+            return response.json()
+
+        # Identical queries across scenes, jobs and batch members share one search
+        data = await cache.search(query, params, search)
 
         videos = data.get("videos", [])
         if not videos:
             return None
 
-        # Pick first video with adequate duration
+        # Pick the most relevant video with an HD file
         for video in videos:
-            if video.get("duration", 0) >= min_duration:
-                # Get HD video file
-                video_files = sorted(
-                    video.get("video_files", []),
-                    key=lambda x: x.get("width", 0),
-                    reverse=True
-                )
-                
-                for vf in video_files:
-                    if vf.get("width", 0) >= 720:
-                        download_url = vf.get("link")
-                        if download_url:
-                            async with httpx.AsyncClient(timeout=60.0, follow_redirects=True) as dl_client:
-                                dl_response = await dl_client.get(download_url)
-                                dl_response.raise_for_status()
-                                with open(output_path, "wb") as f:
-                                    f.write(dl_response.content)
-                            return output_path
+            video_files = sorted(
+                video.get("video_files", []),
+                key=lambda x: x.get("width", 0),
+                reverse=True
+            )
+
+            for vf in video_files:
+                if vf.get("width", 0) >= 720:
+                    download_url = vf.get("link")
+                    if download_url:
+                        return await cache.fetch_clip(
+                            cache.clip_path(video.get("id"), vf),
+                            lambda path: client.download(download_url, path, timeout=60.0),
+                        )
 
         return None
 
@@ -171,6 +399,19 @@ async def download_pexels_video(query: str, output_path: str, min_duration: floa
         return None
 
 
+async def prefetch_scene(scene: dict):
+    """Warm the footage and normalized clip caches for a scene before create_video needs it."""
+    query = scene.get("search_query", scene.get("text", "nature landscape"))
+    async with _prefetch_limit:
+        cached = await fetch_pexels_clip(query)
+        if cached is not None:
+            loop = asyncio.get_event_loop()
+            try:
+                await loop.run_in_executor(_clip_pool, normalize_clip, cached)
+            except Exception as e:
+                print(f"Prefetch normalize failed for '{query}': {e}")
+
+
 def create_placeholder_clip(duration: float, text: str = "") -> VideoFileClip:
     """Create a dark placeholder clip when stock footage unavailable."""
     bg = ColorClip(size=(VIDEO_WIDTH, VIDEO_HEIGHT), color=(20, 20, 40), duration=duration)
@@ -189,6 +430,17 @@ def create_placeholder_clip(duration: float, text: str = "") -> VideoFileClip:
     return bg
 
 
+def create_caption_clips(cues: list, output_dir: str) -> list:
+    """Caption overlays drawn with PIL (no ImageMagick needed), one per cue."""
+    clips = []
+    for i, (start, end, text) in enumerate(cues):
+        card = render_text_image(text, f"{output_dir}/clips/caption_{i}.png", wrap=CAPTION_WRAP,
+                                 fontsize=CAPTION_FONTSIZE, stroke=3)
+        clip = ImageClip(card).set_start(start).set_duration(end - start)
+        clips.append(clip.set_position(("center", VIDEO_HEIGHT - clip.h - CAPTION_MARGIN)))
+    return clips
+
+
 def create_title_overlay(title: str, duration: float):
     """Create a title text overlay for the beginning."""
     try:
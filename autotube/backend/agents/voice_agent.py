@@ -1,17 +1,124 @@
+import os
+import re
 import asyncio
+import json
+import hashlib
 import edge_tts
 
+from agents.timing import save_timing
+from agents.disk_cache import evict_lru
+
 # Free Microsoft Edge TTS voices - no API key needed
 VOICE = "en-US-AriaNeural"  # Natural female voice
 RATE = "+0%"
 VOLUME = "+0%"
 
+# Narration is synthesized sentence by sentence, in parallel, with each sentence cached
+TTS_CONCURRENCY = int(os.getenv("TTS_CONCURRENCY", "4"))
+TTS_CACHE_DIR = os.getenv("TTS_CACHE_DIR", "cache/tts")
+TTS_CACHE_MAX_BYTES = int(os.getenv("TTS_CACHE_MAX_BYTES", str(1024 ** 3)))
+MIN_CHUNK_CHARS = 40
+# edge-tts streams constant-bitrate audio-24khz-48kbitrate-mono-mp3, so bytes give exact duration
+TTS_BITRATE = 48000
+
+_tts_limit = asyncio.Semaphore(TTS_CONCURRENCY)
+
+
 async def generate_voice(text: str, output_path: str) -> str:
-    """Generate speech using Microsoft Edge TTS - completely free."""
-    communicate = edge_tts.Communicate(text, VOICE, rate=RATE, volume=VOLUME)
-    await communicate.save(output_path)
+    """Generate speech using Microsoft Edge TTS - completely free.
+
+    Word and sentence timings are saved next to the audio (see agents.timing).
+    """
+    chunks = split_sentences(text)
+    results = await asyncio.gather(*[_synthesize_chunk(chunk) for chunk in chunks])
+
+    # edge-tts returns bare MP3 frames (no ID3/Xing headers), so chunks join gap-free byte for byte
+    tmp_path = output_path + ".tmp"
+    index = {"duration": 0.0, "words": [], "sentences": []}
+    with open(tmp_path, "wb") as out:
+        for chunk, (path, chunk_timing) in zip(chunks, results):
+            with open(path, "rb") as f:
+                out.write(f.read())
+            offset = index["duration"]
+            index["words"].extend(
+                [round(offset + start, 3), round(offset + end, 3), word]
+                for start, end, word in chunk_timing["words"]
+            )
+            index["duration"] = round(offset + chunk_timing["duration"], 3)
+            index["sentences"].append([offset, index["duration"], chunk])
+    os.replace(tmp_path, output_path)
+    save_timing(output_path, index)
+    await asyncio.get_event_loop().run_in_executor(None, evict_lru, TTS_CACHE_DIR, TTS_CACHE_MAX_BYTES)
     return output_path
 
+
+def split_sentences(text: str) -> list:
+    """Split narration at sentence ends, folding very short sentences into the next one."""
+    sentences = [s.strip() for s in re.split(r"(?<=[.!?])\s+", text.strip()) if s.strip()]
+    chunks = []
+    pending = ""
+    for sentence in sentences:
+        pending = f"{pending} {sentence}".strip()
+        if len(pending) >= MIN_CHUNK_CHARS:
+            chunks.append(pending)
+            pending = ""
+    if pending:
+        if chunks:
+            chunks[-1] = f"{chunks[-1]} {pending}"
+        else:
+            chunks.append(pending)
+    return chunks
+
+
+async def _synthesize_chunk(text: str):
+    """Synthesize one chunk into the TTS cache, keyed by voice settings and text.
+
+    Returns the cached MP3 path and the chunk's ``{"duration", "words"}`` timing.
+    """
+    key = hashlib.sha256(f"{VOICE}|{RATE}|{VOLUME}|{text}".encode()).hexdigest()
+    path = os.path.join(TTS_CACHE_DIR, key + ".mp3")
+    timing_file = os.path.join(TTS_CACHE_DIR, key + ".json")
+    try:
+        with open(timing_file) as f:
+            chunk_timing = json.load(f)
+        # Bumps the entry's LRU position (see disk_cache)
+        os.utime(path)
+        return path, chunk_timing
+    except (OSError, ValueError):
+        pass
+
+    async with _tts_limit:
+        communicate = _communicate(text)
+        audio = bytearray()
+        words = []
+        async for message in communicate.stream():
+            if message["type"] == "audio":
+                audio.extend(message["data"])
+            elif message["type"] == "WordBoundary":
+                # Offsets arrive in 100ns ticks
+                start = message["offset"] / 1e7
+                words.append([round(start, 3), round(start + message["duration"] / 1e7, 3), message["text"]])
+
+    chunk_timing = {"duration": len(audio) * 8 / TTS_BITRATE, "words": words}
+    os.makedirs(TTS_CACHE_DIR, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(audio)
+    os.replace(tmp_path, path)
+    with open(tmp_path, "w") as f:
+        json.dump(chunk_timing, f)
+    os.replace(tmp_path, timing_file)
+    return path, chunk_timing
+
+
+def _communicate(text: str):
+    try:
+        # edge-tts 7+ only reports sentence boundaries unless asked for words
+        return edge_tts.Communicate(text, VOICE, rate=RATE, volume=VOLUME, boundary="WordBoundary")
+    except TypeError:
+        return edge_tts.Communicate(text, VOICE, rate=RATE, volume=VOLUME)
+
+
 async def get_available_voices() -> list:
     """Get list of available voices."""
     voices = await edge_tts.list_voices()
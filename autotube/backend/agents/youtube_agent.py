@@ -1,27 +1,58 @@
 import os
+import json
+import time
+import random
 import asyncio
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import httplib2
+from google_auth_httplib2 import AuthorizedHttp
 from googleapiclient.discovery import build
-from googleapiclient.http import MediaFileUpload
+from googleapiclient.errors import HttpError
+from googleapiclient.http import MediaFileUpload, build_http
 from google.oauth2.credentials import Credentials
 from google.auth.transport.requests import Request
 from google_auth_oauthlib.flow import InstalledAppFlow
-import json
 
 SCOPES = ["https://www.googleapis.com/auth/youtube.upload"]
 TOKEN_FILE = "youtube_token.json"
 CREDENTIALS_FILE = "youtube_credentials.json"
 
-
-async def upload_to_youtube(video_path: str, title: str, description: str, tags: list = []) -> dict:
-    """Upload video to YouTube using OAuth2."""
+# Uploads run on their own bounded pool so they never starve the default executor
+UPLOAD_CONCURRENCY = int(os.getenv("UPLOAD_CONCURRENCY", "2"))
+UPLOAD_RETRIES = int(os.getenv("UPLOAD_RETRIES", "8"))
+UPLOAD_BACKOFF_MAX = float(os.getenv("UPLOAD_BACKOFF_MAX", "60"))
+UPLOAD_TIMEOUT = float(os.getenv("UPLOAD_TIMEOUT", "120"))
+# Chunks are sized so each takes about UPLOAD_CHUNK_SECONDS at the measured throughput;
+# the resumable protocol requires multiples of 256 KiB
+CHUNK_QUANTUM = 256 * 1024
+UPLOAD_CHUNK_SECONDS = float(os.getenv("UPLOAD_CHUNK_SECONDS", "10"))
+MIN_CHUNK = 4 * CHUNK_QUANTUM
+MAX_CHUNK = 256 * CHUNK_QUANTUM
+INITIAL_CHUNK = 20 * CHUNK_QUANTUM
+# YouTube expires resumable sessions after about a week
+SESSION_TTL = 6 * 24 * 3600
+RETRIABLE_STATUS = {429, 500, 502, 503, 504}
+
+_upload_pool = ThreadPoolExecutor(max_workers=UPLOAD_CONCURRENCY, thread_name_prefix="upload")
+_auth_lock = threading.Lock()
+_credentials = None
+_youtube = None
+
+
+async def upload_to_youtube(video_path: str, title: str, description: str, tags: list = [], on_progress=None) -> dict:
+    """Upload video to YouTube using OAuth2.
+
+    ``on_progress(fraction)`` is called from the upload thread after each chunk.
+    """
     loop = asyncio.get_event_loop()
-    result = await loop.run_in_executor(None, _upload, video_path, title, description, tags)
+    result = await loop.run_in_executor(_upload_pool, _upload, video_path, title, description, tags, on_progress)
     return result
 
 
-def _upload(video_path: str, title: str, description: str, tags: list) -> dict:
-    creds = _get_credentials()
-    youtube = build("youtube", "v3", credentials=creds)
+def _upload(video_path: str, title: str, description: str, tags: list, on_progress=None) -> dict:
+    youtube, creds = _get_youtube()
 
     body = {
         "snippet": {
@@ -39,7 +70,7 @@ def _upload(video_path: str, title: str, description: str, tags: list) -> dict:
         video_path,
         mimetype="video/mp4",
         resumable=True,
-        chunksize=1024 * 1024 * 5,  # 5MB chunks
+        chunksize=INITIAL_CHUNK,
     )
 
     request = youtube.videos().insert(
@@ -48,12 +79,57 @@ def _upload(video_path: str, title: str, description: str, tags: list) -> dict:
         media_body=media,
     )
 
+    # The shared discovery client is not thread-safe, so each upload gets its own connection
+    # (build_http keeps 308 Resume Incomplete from being followed as a redirect)
+    raw_http = build_http()
+    raw_http.timeout = UPLOAD_TIMEOUT
+    http = AuthorizedHttp(creds, http=raw_http)
+    session_key = _session_key(video_path, body)
+    session = _load_session(video_path, session_key)
+    # Ask the server how far the previous attempt got before sending anything
+    if session and _set_internal(request, "_in_error_state", True):
+        print(f"Resuming upload of {video_path}")
+        request.resumable_uri = session
+
     response = None
+    failures = 0
     while response is None:
-        status, response = request.next_chunk()
+        sent = request.resumable_progress
+        started = time.monotonic()
+        try:
+            status, response = request.next_chunk(http=http)
+        except HttpError as e:
+            if e.resp.status in (404, 410) and request.resumable_uri:
+                # The session expired server-side; start again from byte 0
+                print(f"Upload session expired, restarting: {video_path}")
+                _clear_session(video_path)
+                request.resumable_uri = None
+                request.resumable_progress = 0
+                _set_internal(request, "_in_error_state", False)
+                continue
+            if e.resp.status not in RETRIABLE_STATUS or failures >= UPLOAD_RETRIES:
+                raise
+            failures = _backoff(failures, e)
+            continue
+        except (httplib2.HttpLib2Error, OSError) as e:
+            if failures >= UPLOAD_RETRIES:
+                raise
+            failures = _backoff(failures, e)
+            continue
+        finally:
+            if request.resumable_uri and request.resumable_uri != session:
+                session = request.resumable_uri
+                _save_session(video_path, session_key, session)
+
+        failures = 0
         if status:
-            print(f"Upload progress: {int(status.progress() * 100)}%")
+            elapsed = time.monotonic() - started
+            if status.resumable_progress > sent and elapsed > 0:
+                _set_internal(media, "_chunksize", _next_chunksize((status.resumable_progress - sent) / elapsed))
+            if on_progress:
+                on_progress(status.progress())
 
+    _clear_session(video_path)
     video_id = response["id"]
     return {
         "id": video_id,
@@ -61,6 +137,79 @@ def _upload(video_path: str, title: str, description: str, tags: list) -> dict:
     }
 
 
+def _set_internal(obj, name: str, value) -> bool:
+    """Set a private googleapiclient attribute the resume and chunk sizing logic rely on.
+
+    Returns False, changing nothing, if this client version no longer has it; the
+    upload then simply starts over or keeps its chunk size.
+    """
+    if name not in vars(obj):
+        print(f"googleapiclient {type(obj).__name__} has no {name}; skipping")
+        return False
+    setattr(obj, name, value)
+    return True
+
+
+def _next_chunksize(throughput: float) -> int:
+    size = int(throughput * UPLOAD_CHUNK_SECONDS) // CHUNK_QUANTUM * CHUNK_QUANTUM
+    return max(MIN_CHUNK, min(MAX_CHUNK, size))
+
+
+def _backoff(failures: int, error) -> int:
+    delay = min(UPLOAD_BACKOFF_MAX, 2 ** failures) * (0.5 + random.random() / 2)
+    print(f"Upload error ({error}), retrying in {delay:.1f}s")
+    time.sleep(delay)
+    return failures + 1
+
+
+def _session_path(video_path: str) -> str:
+    return video_path + ".upload.json"
+
+
+def _session_key(video_path: str, body: dict) -> str:
+    """A session is only reusable for the same file bytes and the same metadata."""
+    stat = os.stat(video_path)
+    raw = json.dumps([stat.st_size, stat.st_mtime_ns, body], sort_keys=True)
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def _load_session(video_path: str, key: str):
+    try:
+        with open(_session_path(video_path)) as f:
+            session = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if session.get("key") != key or time.time() - session.get("created", 0) > SESSION_TTL:
+        return None
+    return session.get("uri")
+
+
+def _save_session(video_path: str, key: str, uri: str):
+    tmp = _session_path(video_path) + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump({"key": key, "uri": uri, "created": time.time()}, f)
+    os.replace(tmp, _session_path(video_path))
+
+
+def _clear_session(video_path: str):
+    try:
+        os.remove(_session_path(video_path))
+    except FileNotFoundError:
+        pass
+
+
+def _get_youtube():
+    """Discovery client and credentials, built once and reused across uploads."""
+    global _credentials, _youtube
+    with _auth_lock:
+        if _credentials is None or not _credentials.valid:
+            _credentials = _get_credentials()
+            _youtube = None
+        if _youtube is None:
+            _youtube = build("youtube", "v3", credentials=_credentials, cache_discovery=False)
+        return _youtube, _credentials
+
+
 def _get_credentials():
     creds = None
 
@@ -75,6 +224,9 @@ def _get_credentials():
             f.write(creds.to_json())
         return creds
 
+    if creds and creds.valid:
+        return creds
+
     # New auth flow
     if not os.path.exists(CREDENTIALS_FILE):
         raise FileNotFoundError(
@@ -0,0 +1,291 @@
+import os
+import re
+import time
+import shutil
+import asyncio
+import mimetypes
+from email.utils import formatdate, parsedate_to_datetime
+
+from starlette.responses import Response
+
+import job_store
+from agents.file_lock import file_lock
+
+# Lifecycle of everything under outputs/{job_id}: intermediates are purged once the
+# final render is done, finished jobs expire by age and, past the global quota, in
+# least-recently-used order. Last use is the job directory's mtime, bumped on every
+# served request, so LRU order survives restarts.
+OUTPUTS_DIR = "outputs"
+JOB_MAX_BYTES = int(os.getenv("JOB_MAX_BYTES", str(2 * 1024 ** 3)))
+ARTIFACTS_MAX_BYTES = int(os.getenv("ARTIFACTS_MAX_BYTES", str(20 * 1024 ** 3)))
+ARTIFACT_MAX_AGE = float(os.getenv("ARTIFACT_MAX_AGE_DAYS", "7")) * 24 * 3600
+GC_INTERVAL = float(os.getenv("ARTIFACT_GC_INTERVAL", "600"))
+# Path prefix of an nginx `internal` location aliased to outputs/; when set, nginx
+# serves the bytes (sendfile, ranges) and the API only answers with X-Accel-Redirect
+ACCEL_REDIRECT_PREFIX = os.getenv("ARTIFACT_ACCEL_REDIRECT", "").rstrip("/")
+
+# Only needed while rendering; the final video, preview, thumbnails, narration and
+# checkpoints stay so the job can still be reviewed, uploaded or regenerated
+INTERMEDIATES = ["clips", "draft.mp4", "title.png", "thumbnail_title.png", "reference_video.mp4", "temp_audio.m4a"]
+
+# Job ids are uuid4 strings; anything with dots or separators never names a job directory
+JOB_ID_PATTERN = re.compile(r"[\w-]+")
+
+CHUNK_SIZE = 256 * 1024
+# Rendered files keep their URL across regenerations, so clients revalidate (ETag) every time
+CACHE_CONTROL = "no-cache"
+
+_last_stats = {}
+
+
+class QuotaExceeded(RuntimeError):
+    pass
+
+
+def job_dir(job_id: str) -> str:
+    return os.path.join(OUTPUTS_DIR, job_id)
+
+
+def dir_size(path: str) -> int:
+    """Bytes that deleting ``path`` would free.
+
+    Footage linked in from the footage cache (see FootageCache.link_into) is owned by
+    the cache, so hard-linked files and symlinks don't count.
+    """
+    total = 0
+    try:
+        entries = list(os.scandir(path))
+    except OSError:
+        return 0
+    for entry in entries:
+        try:
+            if entry.is_dir(follow_symlinks=False):
+                total += dir_size(entry.path)
+            elif entry.is_file(follow_symlinks=False):
+                st = entry.stat(follow_symlinks=False)
+                if st.st_nlink == 1:
+                    total += st.st_size
+        except OSError:
+            pass
+    return total
+
+
+def purge_intermediates(job_id: str) -> int:
+    """Delete a finished job's render intermediates; returns the bytes freed."""
+    freed = 0
+    for name in INTERMEDIATES:
+        path = os.path.join(job_dir(job_id), name)
+        if os.path.isdir(path):
+            freed += dir_size(path)
+            shutil.rmtree(path, ignore_errors=True)
+        elif os.path.exists(path):
+            freed += os.path.getsize(path)
+            os.remove(path)
+    return freed
+
+
+def purge_job(job_id: str) -> int:
+    """Delete everything a job wrote; returns the bytes freed."""
+    freed = dir_size(job_dir(job_id))
+    shutil.rmtree(job_dir(job_id), ignore_errors=True)
+    return freed
+
+
+def check_job_quota(job_id: str):
+    size = dir_size(job_dir(job_id))
+    if size > JOB_MAX_BYTES:
+        raise QuotaExceeded(f"Job artifacts take {size / 1024 ** 2:.0f} MiB, over the "
+                            f"{JOB_MAX_BYTES / 1024 ** 2:.0f} MiB per-job limit")
+
+
+def touch(job_id: str):
+    try:
+        os.utime(job_dir(job_id))
+    except OSError:
+        pass
+
+
+def collect() -> dict:
+    """Delete expired job directories, then least recently used ones until under the quota.
+
+    Jobs that are queued, rendering or uploading are never touched.
+    """
+    now = time.time()
+    active = job_store.active_job_ids()
+    jobs = []
+    try:
+        entries = [e for e in os.scandir(OUTPUTS_DIR) if e.is_dir(follow_symlinks=False)]
+    except OSError:
+        entries = []
+    for entry in entries:
+        try:
+            jobs.append((entry.stat().st_mtime, dir_size(entry.path), entry.name))
+        except OSError:
+            pass
+
+    total = sum(size for _, size, _ in jobs)
+    removed, freed = 0, 0
+    for last_used, size, job_id in sorted(jobs):
+        if job_id in active:
+            continue
+        if now - last_used < ARTIFACT_MAX_AGE and total <= ARTIFACTS_MAX_BYTES:
+            continue
+        shutil.rmtree(job_dir(job_id), ignore_errors=True)
+        total -= size
+        freed += size
+        removed += 1
+        if job_store.get_job(job_id) is not None:
+            job_store.update_job(job_id, artifacts_expired=True, video_url=None, preview_url=None, draft_url=None,
+                                 audio_url=None, thumbnail_url=None, thumbnail_urls=[])
+
+    _last_stats.update({
+        "jobs": len(jobs) - removed,
+        "bytes": total,
+        "max_bytes": ARTIFACTS_MAX_BYTES,
+        "job_max_bytes": JOB_MAX_BYTES,
+        "collected_at": now,
+    })
+    _last_stats["removed"] = _last_stats.get("removed", 0) + removed
+    _last_stats["bytes_freed"] = _last_stats.get("bytes_freed", 0) + freed
+    return dict(_last_stats)
+
+
+async def collect_async() -> dict:
+    # One collector at a time across web processes
+    async with file_lock(os.path.join(OUTPUTS_DIR, ".gc.lock")):
+        return await asyncio.get_event_loop().run_in_executor(None, collect)
+
+
+async def gc_loop():
+    while True:
+        try:
+            await collect_async()
+        except Exception as e:
+            print(f"Artifact GC error: {e}")
+        await asyncio.sleep(GC_INTERVAL)
+
+
+async def has_room() -> bool:
+    """Whether outputs/ is under the global quota, collecting first if it looked full."""
+    if _last_stats.get("bytes", 0) <= ARTIFACTS_MAX_BYTES:
+        return True
+    return (await collect_async())["bytes"] <= ARTIFACTS_MAX_BYTES
+
+
+def stats() -> dict:
+    return dict(_last_stats)
+
+
+# Serving
+
+def artifact_response(job_id: str, name: str, method: str, headers) -> Response:
+    """Serve ``outputs/{job_id}/{name}`` with byte ranges, ETag and Last-Modified revalidation."""
+    if not JOB_ID_PATTERN.fullmatch(job_id):
+        return Response(status_code=404)
+    root = os.path.join(os.path.realpath(OUTPUTS_DIR), job_id) + os.sep
+    path = os.path.realpath(os.path.join(root, name))
+    if not path.startswith(root) or not os.path.isfile(path):
+        return Response(status_code=404)
+    st = os.stat(path)
+    touch(job_id)
+
+    etag = f'"{st.st_size:x}-{st.st_mtime_ns:x}"'
+    last_modified = formatdate(st.st_mtime, usegmt=True)
+    base = {"etag": etag, "last-modified": last_modified, "cache-control": CACHE_CONTROL, "accept-ranges": "bytes"}
+
+    if _not_modified(headers, etag, st.st_mtime):
+        return Response(status_code=304, headers=base)
+
+    content_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+    if ACCEL_REDIRECT_PREFIX:
+        # nginx answers ranges and conditionals itself from here
+        return Response(headers={"x-accel-redirect": f"{ACCEL_REDIRECT_PREFIX}/{job_id}/{os.path.relpath(path, root)}",
+                                 "content-type": content_type, "cache-control": CACHE_CONTROL})
+
+    offset, length, status = 0, st.st_size, 200
+    byte_range = headers.get("range")
+    if_range = headers.get("if-range")
+    if byte_range and (if_range is None or if_range in (etag, last_modified)):
+        parsed = _parse_range(byte_range, st.st_size)
+        if parsed == "unsatisfiable":
+            return Response(status_code=416, headers={**base, "content-range": f"bytes */{st.st_size}"})
+        if parsed is not None:
+            offset, end = parsed
+            length = end - offset + 1
+            status = 206
+            base["content-range"] = f"bytes {offset}-{end}/{st.st_size}"
+    return FileRangeResponse(path, offset, length, status, {**base, "content-type": content_type},
+                             send_body=method != "HEAD")
+
+
+class FileRangeResponse(Response):
+    """A byte range of a file, sent zero-copy when the server supports the ASGI
+    ``http.response.zerocopysend`` extension and read off the event loop otherwise."""
+
+    def __init__(self, path: str, offset: int, length: int, status_code: int, headers: dict, send_body: bool = True):
+        super().__init__(status_code=status_code, headers={**headers, "content-length": str(length)})
+        self.path = path
+        self.offset = offset
+        self.length = length
+        self.send_body = send_body
+
+    async def __call__(self, scope, receive, send):
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if not self.send_body or self.length == 0:
+            await send({"type": "http.response.body", "body": b""})
+            return
+        with open(self.path, "rb") as f:
+            if "http.response.zerocopysend" in scope.get("extensions", {}):
+                await send({"type": "http.response.zerocopysend", "file": f.fileno(),
+                            "offset": self.offset, "count": self.length})
+                return
+            loop = asyncio.get_event_loop()
+            f.seek(self.offset)
+            remaining = self.length
+            while remaining > 0:
+                chunk = await loop.run_in_executor(None, f.read, min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+            if remaining > 0:
+                # File shrank underneath us; end the body rather than hang the client
+                await send({"type": "http.response.body", "body": b""})
+
+
+def _not_modified(headers, etag: str, mtime: float) -> bool:
+    if_none_match = headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [t.strip().removeprefix("W/") for t in if_none_match.split(",")]
+        return "*" in tags or etag in tags
+    if_modified_since = headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return int(mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            pass
+    return False
+
+
+def _parse_range(value: str, size: int):
+    """``(start, end)`` for a single ``bytes=`` range, ``"unsatisfiable"``, or None to send it all.
+
+    Multiple ranges are answered with the whole file, which RFC 9110 allows.
+    """
+    unit, _, spec = value.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    start, _, end = spec.strip().partition("-")
+    try:
+        if start:
+            start = int(start)
+            end = min(int(end), size - 1) if end else size - 1
+        elif end:
+            start, end = max(size - int(end), 0), size - 1
+        else:
+            return None
+    except ValueError:
+        return None
+    if start > end:
+        return "unsatisfiable" if start >= size else None
+    return start, end
@@ -0,0 +1,448 @@
+import os
+import sys
+import json
+import time
+import uuid
+import shutil
+import asyncio
+import argparse
+import platform
+import tempfile
+import itertools
+import subprocess
+import threading
+from urllib.parse import urlparse, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from agents.clip_normalizer import run_ffmpeg, ffmpeg_exe
+
+# Offline benchmark for the full pipeline: run_pipeline end to end against local stand-ins
+# (canned research, a fixture Groq reply, fixture narration audio and a local server with
+# Pexels-style search results and MP4s). Every sweep point runs in a fresh process with
+# cold caches, so peak RSS and cache behaviour don't leak between points.
+#
+#   python benchmark.py --scenes 4,8 --resolutions 1280x720,1920x1080 --concurrency 1,4
+#   python benchmark.py --startup
+
+TOPIC = "How volcanoes work"
+SCENE_SECONDS = 5
+CLIP_SECONDS = 8
+CLIP_FPS = 30
+# Distinct lavfi sources so scenes don't all hit the same cached clip
+CLIP_SOURCES = ["testsrc2", "smptehdbars", "mandelbrot", "life"]
+
+RESEARCH = {
+    "topic": TOPIC,
+    "summaries": [{"title": "Volcano", "snippet": "A volcano is a rupture in the crust of a planet.", "url": ""}],
+    "news": [],
+    "combined_text": "Source: Volcano\nA volcano is a rupture in the crust of a planet.",
+}
+
+
+def fixture_script(scene_count: int) -> dict:
+    # ~2.5 words per second of narration per scene, in short sentences
+    sentence = "Magma rises through cracks in the crust and erupts as lava."
+    sentences_per_scene = max(1, round(SCENE_SECONDS * 2.5 / len(sentence.split())))
+    return {
+        "title": "How Volcanoes Work",
+        "description": "A benchmark fixture script.",
+        "tags": ["volcano", "benchmark"],
+        "scenes": [
+            {"id": i + 1, "text": f"scene {i + 1}", "search_query": f"benchmark scene {i + 1}", "duration": SCENE_SECONDS}
+            for i in range(scene_count)
+        ],
+        "narration": " ".join([sentence] * sentences_per_scene * scene_count),
+    }
+
+
+# Fixtures
+
+def make_fixtures(workdir: str, resolutions: list, scene_counts: list) -> dict:
+    fixtures = {"clips": {}, "audio": {}}
+    for resolution in resolutions:
+        w, h = resolution
+        for k, source in enumerate(CLIP_SOURCES):
+            path = os.path.join(workdir, "fixtures", f"{w}x{h}", f"{k}.mp4")
+            if not os.path.exists(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                run_ffmpeg([
+                    "-f", "lavfi", "-i", f"{source}=size={w}x{h}:rate={CLIP_FPS}", "-t", str(CLIP_SECONDS),
+                    "-c:v", "libx264", "-preset", "veryfast", "-pix_fmt", "yuv420p", path,
+                ])
+            fixtures["clips"][f"{w}x{h}/{k}"] = path
+    for n in scene_counts:
+        path = os.path.join(workdir, "fixtures", f"narration_{n}.mp3")
+        if not os.path.exists(path):
+            run_ffmpeg([
+                "-f", "lavfi", "-i", f"sine=frequency=220:duration={n * SCENE_SECONDS}",
+                "-ac", "1", "-ar", "24000", "-b:a", "48k", path,
+            ])
+        fixtures["audio"][str(n)] = path
+    return fixtures
+
+
+class FixtureServer(ThreadingHTTPServer):
+    """Pexels search + MP4 downloads under ``/{WxH}/``, Groq completions under ``/{scenes}/``."""
+
+    daemon_threads = True
+
+    def __init__(self, fixtures: dict, latency: float = 0.0):
+        super().__init__(("127.0.0.1", 0), _FixtureHandler)
+        self.fixtures = fixtures
+        self.latency = latency
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+
+class _FixtureHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        time.sleep(self.server.latency)
+        url = urlparse(self.path)
+        resolution, _, rest = url.path.lstrip("/").partition("/")
+        if rest == "videos/search":
+            query = parse_qs(url.query).get("query", [""])[0]
+            # Stable query -> clip mapping, so repeated queries share footage like real Pexels
+            k = sum(query.encode()) % len(CLIP_SOURCES)
+            w, h = (int(x) for x in resolution.split("x"))
+            body = json.dumps({"videos": [{
+                "id": k,
+                "duration": CLIP_SECONDS,
+                "video_files": [{"id": f"{resolution}-{k}", "width": w, "height": h,
+                                 "link": f"{self.server.url}/{resolution}/clips/{k}.mp4"}],
+            }]}).encode()
+            return self._send(200, body, "application/json")
+        if rest.startswith("clips/"):
+            path = self.server.fixtures["clips"].get(f"{resolution}/{rest[6:-4]}")
+            if path:
+                with open(path, "rb") as f:
+                    return self._send(200, f.read(), "video/mp4")
+        self._send(404, b"", "text/plain")
+
+    def do_POST(self):
+        time.sleep(self.server.latency)
+        request = json.loads(self.rfile.read(int(self.headers.get("content-length", 0))))
+        scene_count = int(self.path.lstrip("/").split("/")[0])
+        content = json.dumps(fixture_script(scene_count), indent=2)
+        if not request.get("stream"):
+            body = json.dumps({"choices": [{"message": {"content": content}}]}).encode()
+            return self._send(200, body, "application/json")
+        # Token-ish chunks, the way Groq streams
+        events = [
+            "data: " + json.dumps({"choices": [{"delta": {"content": content[i:i + 16]}}]}) + "\n\n"
+            for i in range(0, len(content), 16)
+        ]
+        self._send(200, ("".join(events) + "data: [DONE]\n\n").encode(), "text/event-stream")
+
+    def _send(self, status: int, body: bytes, content_type: str):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+# One sweep point (runs in its own process, cwd = a fresh run directory)
+
+async def _run_point(point: dict) -> dict:
+    import job_store
+    import pipeline
+    from agents import script_agent, video_agent
+    from agents.http_client import start_client, close_client
+    from agents.voice_agent import split_sentences
+    from agents.timing import save_timing
+    from agents.ffmpeg_render import probe_duration
+
+    w, h = point["resolution"]
+    script_agent.GROQ_API_KEY = "benchmark"
+    script_agent.GROQ_URL = f"{point['server']}/{point['scenes']}/openai/v1/chat/completions"
+    video_agent.PEXELS_API_KEY = "benchmark"
+    video_agent.PEXELS_URL = f"{point['server']}/{w}x{h}/videos/search"
+
+    async def research_topic(topic):
+        return RESEARCH
+
+    async def generate_voice(text, output_path):
+        # Fixture audio, with words spread evenly across it so scene cuts and captions still run
+        shutil.copyfile(point["audio"], output_path)
+        duration = probe_duration(output_path)
+        chunks = split_sentences(text)
+        total_words = sum(len(c.split()) for c in chunks)
+        index = {"duration": duration, "words": [], "sentences": []}
+        t = 0.0
+        for chunk in chunks:
+            start = t
+            for word in chunk.split():
+                step = duration / total_words
+                index["words"].append([round(t, 3), round(t + step, 3), word])
+                t += step
+            index["sentences"].append([round(start, 3), round(t, 3), chunk])
+        save_timing(output_path, index)
+        return output_path
+
+    pipeline.research_topic = research_topic
+    pipeline.generate_voice = generate_voice
+
+    job_id = str(uuid.uuid4())
+    job_store.create_job({"id": job_id, "topic": TOPIC, "render_backend": point["backend"], "profile": point["profile"],
+                          "captions": point["captions"], "status": "starting", "progress": 0})
+    await start_client()
+    started = time.perf_counter()
+    try:
+        await pipeline.run_pipeline(job_id, TOPIC)
+    finally:
+        await close_client()
+    elapsed = time.perf_counter() - started
+
+    job = job_store.get_job(job_id)
+    timeline = job["timeline"]
+    stages = {}
+    for span in timeline["spans"]:
+        stage = stages.setdefault(span["name"], {"total": 0.0, "max": 0.0, "count": 0})
+        stage["total"] = round(stage["total"] + span["duration"], 3)
+        stage["max"] = max(stage["max"], span["duration"])
+        stage["count"] += 1
+    output_path = f"outputs/{job_id}/final_video.mp4"
+    return {
+        "total_seconds": round(elapsed, 3),
+        "render_seconds": stages.get("render", {}).get("total"),
+        "stages": stages,
+        "peak_rss_bytes": timeline["peak_rss_bytes"],
+        "download_bytes": timeline["download_bytes"],
+        "output_bytes": os.path.getsize(output_path),
+        "output_duration": round(probe_duration(output_path), 3),
+        "render_backend": job["script"].get("render", {}).get("backend"),
+    }
+
+
+def run_point(point: dict, rundir: str, timeout: float) -> dict:
+    os.makedirs(rundir, exist_ok=True)
+    result_path = os.path.join(rundir, "result.json")
+    env = {
+        **os.environ,
+        "SCENE_CONCURRENCY": str(point["concurrency"]),
+        "CLIP_WORKERS": str(point["concurrency"]),
+        "RENDER_BACKEND": point["backend"],
+        "JOB_DB_PATH": os.path.join(rundir, "jobs.db"),
+        "PYTHONPATH": os.pathsep.join(filter(None, [os.path.dirname(os.path.abspath(__file__)), os.getenv("PYTHONPATH")])),
+    }
+    proc = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--run-point", json.dumps(point), "--result-file", result_path],
+        cwd=rundir, env=env, capture_output=True, text=True, timeout=timeout,
+    )
+    if proc.returncode != 0 or not os.path.exists(result_path):
+        return {"error": (proc.stderr or proc.stdout)[-2000:]}
+    with open(result_path) as f:
+        return json.load(f)
+
+
+# API startup check (--startup): import time, first response and RSS of a fresh API
+# process, which must come up without the media stack
+
+STARTUP_FORBIDDEN_MODULES = ["moviepy", "numpy", "PIL", "imageio", "googleapiclient", "duckduckgo_search", "edge_tts"]
+
+STARTUP_PROBE = """
+import json, sys, time, resource
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+loaded = [m for m in json.loads(sys.argv[1]) if m in sys.modules]
+from fastapi.testclient import TestClient
+ready = time.perf_counter()
+with TestClient(main.app) as client:
+    client.get("/").raise_for_status()
+    answered = time.perf_counter()
+print(json.dumps({"import_seconds": imported - started, "first_response_seconds": answered - ready,
+                  "rss_bytes": rss, "heavy_modules": loaded}))
+"""
+
+
+def run_startup(workdir: str) -> dict:
+    """Start one fresh API process (no embedded workers) and measure it."""
+    env = {
+        **os.environ,
+        "EMBEDDED_WORKERS": "0",
+        "JOB_DB_PATH": os.path.join(workdir, "jobs.db"),
+        "PYTHONPATH": os.pathsep.join(filter(None, [os.path.dirname(os.path.abspath(__file__)), os.getenv("PYTHONPATH")])),
+    }
+    proc = subprocess.run(
+        [sys.executable, "-c", STARTUP_PROBE, json.dumps(STARTUP_FORBIDDEN_MODULES)],
+        cwd=workdir, env=env, capture_output=True, text=True, timeout=120,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip()[-2000:])
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def startup_check(args, env: dict) -> bool:
+    workdir = args.workdir or tempfile.mkdtemp(prefix="autotube-startup-")
+    try:
+        runs = [run_startup(workdir) for _ in range(max(args.repeat, 3))]
+    finally:
+        if not args.keep and not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+    # Medians, so one slow cold start (disk cache) doesn't fail the check
+    result = {
+        key: sorted(run[key] for run in runs)[len(runs) // 2]
+        for key in ("import_seconds", "first_response_seconds", "rss_bytes")
+    }
+    result["heavy_modules"] = sorted({m for run in runs for m in run["heavy_modules"]})
+    budgets = {"import_seconds": args.import_budget, "rss_bytes": args.rss_budget * 1024 ** 2}
+    failures = []
+    if result["import_seconds"] > args.import_budget:
+        failures.append(f"import {result['import_seconds']:.3f}s over the {args.import_budget}s budget")
+    if result["rss_bytes"] > budgets["rss_bytes"]:
+        failures.append(f"RSS {result['rss_bytes'] / 1024 ** 2:.0f} MiB over the {args.rss_budget} MiB budget")
+    if result["heavy_modules"]:
+        failures.append(f"imports {', '.join(result['heavy_modules'])}")
+
+    record = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "environment": env,
+        "benchmark": "startup",
+        "runs": len(runs),
+        "budgets": budgets,
+        **result,
+        "failures": failures,
+    }
+    with open(args.out, "a") as f:
+        f.write(json.dumps(record) + "\n")
+
+    print(f"import {result['import_seconds']:.3f}s (budget {args.import_budget}s), "
+          f"first response {result['first_response_seconds']:.3f}s, "
+          f"RSS {result['rss_bytes'] / 1024 ** 2:.0f} MiB (budget {args.rss_budget} MiB)")
+    for failure in failures:
+        print(f"  FAIL: {failure}")
+    return not failures
+
+
+def environment() -> dict:
+    def output(cmd):
+        try:
+            return subprocess.run(cmd, capture_output=True, text=True, timeout=10).stdout.strip()
+        except (OSError, subprocess.SubprocessError):
+            return None
+    ffmpeg_version = output([ffmpeg_exe(), "-version"])
+    return {
+        "commit": output(["git", "-C", os.path.dirname(os.path.abspath(__file__)), "rev-parse", "--short", "HEAD"]),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "ffmpeg": ffmpeg_version.splitlines()[0] if ffmpeg_version else None,
+    }
+
+
+def _csv(value: str, cast=str) -> list:
+    return [cast(v) for v in value.split(",") if v]
+
+
+def _resolution(value: str) -> tuple:
+    w, h = value.lower().split("x")
+    return int(w), int(h)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline end-to-end pipeline benchmark.")
+    parser.add_argument("--scenes", default="4,8", help="comma-separated scene counts")
+    parser.add_argument("--resolutions", default="1280x720,1920x1080",
+                        help="comma-separated clip resolutions (the footage picker skips clips under 720px wide)")
+    parser.add_argument("--concurrency", default="1,4", help="comma-separated scene/clip worker counts")
+    parser.add_argument("--backends", default="ffmpeg", help="comma-separated render backends")
+    parser.add_argument("--profiles", default="final", help="comma-separated encode profiles")
+    parser.add_argument("--captions", action="store_true", help="burn in captions")
+    parser.add_argument("--repeat", type=int, default=1, help="runs per sweep point")
+    parser.add_argument("--latency", type=float, default=0.0, help="simulated upstream latency in seconds")
+    parser.add_argument("--timeout", type=float, default=1800, help="per-run timeout in seconds")
+    parser.add_argument("--workdir", help="fixture/run directory (default: a temporary one)")
+    parser.add_argument("--keep", action="store_true", help="keep the workdir afterwards")
+    parser.add_argument("--out", default="benchmark_results.jsonl", help="JSON lines file results are appended to")
+    parser.add_argument("--startup", action="store_true",
+                        help="check API startup against the import-time and RSS budgets instead")
+    parser.add_argument("--import-budget", type=float, default=1.0, help="API import-time budget in seconds")
+    parser.add_argument("--rss-budget", type=float, default=80, help="API startup RSS budget in MiB")
+    parser.add_argument("--run-point", help=argparse.SUPPRESS)
+    parser.add_argument("--result-file", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_point:
+        result = asyncio.run(_run_point(json.loads(args.run_point)))
+        with open(args.result_file, "w") as f:
+            json.dump(result, f)
+        return
+
+    if args.startup:
+        sys.exit(0 if startup_check(args, environment()) else 1)
+
+    scene_counts = _csv(args.scenes, int)
+    resolutions = _csv(args.resolutions, _resolution)
+    workdir = args.workdir or tempfile.mkdtemp(prefix="autotube-bench-")
+    print(f"Generating fixtures in {workdir}")
+    fixtures = make_fixtures(workdir, resolutions, scene_counts)
+
+    server = FixtureServer(fixtures, latency=args.latency)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    env = environment()
+    sweep = list(itertools.product(
+        scene_counts, resolutions, _csv(args.concurrency, int), _csv(args.backends), _csv(args.profiles)
+    ))
+    results = []
+    try:
+        for (scenes, resolution, concurrency, backend, profile), run in itertools.product(sweep, range(args.repeat)):
+            point = {
+                "scenes": scenes,
+                "resolution": resolution,
+                "concurrency": concurrency,
+                "backend": backend,
+                "profile": profile,
+                "captions": args.captions,
+                "latency": args.latency,
+                "server": server.url,
+                "audio": fixtures["audio"][str(scenes)],
+            }
+            label = f"scenes={scenes} res={resolution[0]}x{resolution[1]} concurrency={concurrency} {backend}/{profile}"
+            print(f"Running {label} (run {run + 1}/{args.repeat})", flush=True)
+            rundir = os.path.join(workdir, "runs", uuid.uuid4().hex[:8])
+            result = run_point(point, rundir, args.timeout)
+
+            record = {
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+                "environment": env,
+                "params": {k: v for k, v in point.items() if k not in ("server", "audio")},
+                "run": run,
+                **result,
+            }
+            with open(args.out, "a") as f:
+                f.write(json.dumps(record) + "\n")
+            results.append((label, result))
+            if "error" in result:
+                print(f"  failed: {result['error'].strip().splitlines()[-1] if result['error'].strip() else 'unknown error'}")
+            else:
+                print(f"  total {result['total_seconds']:.2f}s, render {result['render_seconds'] or 0:.2f}s, "
+                      f"peak RSS {result['peak_rss_bytes'] / 1024 ** 2:.0f} MiB, output {result['output_bytes'] / 1024 ** 2:.1f} MiB")
+    finally:
+        server.shutdown()
+        if not args.keep and not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"\nResults appended to {args.out}")
+    stage_names = ["research", "script", "voice", "scene.download", "scene.prepare", "render", "thumbnail"]
+    print(f"{'point':<58} {'total':>7} " + " ".join(f"{s:>14}" for s in stage_names))
+    for label, result in results:
+        if "error" in result:
+            print(f"{label:<58} {'failed':>7}")
+            continue
+        stages = result["stages"]
+        print(f"{label:<58} {result['total_seconds']:>7.2f} "
+              + " ".join(f"{stages.get(s, {}).get('total', 0):>14.2f}" for s in stage_names))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+import os
+import json
+import hashlib
+
+import metrics
+
+# Per-job stage artifacts keyed by a hash of each stage's inputs, so a regenerate
+# only recomputes the stages whose inputs actually changed.
+
+
+def content_hash(value) -> str:
+    return hashlib.sha256(json.dumps(value, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def file_hash(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class Checkpoints:
+    """Stage name -> {"hash", "artifact"} stored in ``outputs/{job_id}/checkpoints.json``."""
+
+    def __init__(self, output_dir: str):
+        self.path = os.path.join(output_dir, "checkpoints.json")
+        try:
+            with open(self.path) as f:
+                self._stages = json.load(f)
+        except (OSError, ValueError):
+            self._stages = {}
+
+    def fresh(self, name: str, inputs, mark_cached: bool = True):
+        """Return the stored artifact if it was produced from these exact inputs, else None.
+
+        Artifacts that name files (``path`` / ``paths``) are only fresh while the files exist.
+        A hit marks the enclosing metrics span as cached unless ``mark_cached`` is False.
+        """
+        entry = self._stages.get(name)
+        if not entry or entry["hash"] != content_hash(inputs):
+            return None
+        artifact = entry["artifact"]
+        if isinstance(artifact, dict):
+            paths = artifact.get("paths", []) + ([artifact["path"]] if artifact.get("path") else [])
+            if not all(os.path.exists(p) for p in paths):
+                return None
+        if mark_cached:
+            metrics.annotate(cached=True)
+        return artifact
+
+    def save(self, name: str, inputs, artifact):
+        self._stages[name] = {"hash": content_hash(inputs), "artifact": artifact}
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self._stages, f)
+        os.replace(tmp, self.path)
+
+    async def stage(self, name: str, inputs, compute):
+        """Reuse the artifact for ``inputs`` or ``await compute()`` and persist the result."""
+        artifact = self.fresh(name, inputs)
+        if artifact is None:
+            artifact = await compute()
+            self.save(name, inputs, artifact)
+        else:
+            print(f"Reusing {name} checkpoint from {self.path}")
+        return artifact
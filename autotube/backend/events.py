@@ -0,0 +1,84 @@
+import os
+import json
+import asyncio
+from collections import defaultdict
+
+import job_store
+
+# Fans job diffs out to Server-Sent Events subscribers. One poller per web process
+# reads the shared change feed, however many clients are connected.
+EVENT_POLL_INTERVAL = float(os.getenv("EVENT_POLL_INTERVAL", "0.25"))
+EVENT_RETENTION = int(os.getenv("EVENT_RETENTION", "3600"))
+KEEPALIVE_SECONDS = 15
+# Most diffs replayed to one reconnecting client
+REPLAY_LIMIT = 10000
+
+
+class Broadcaster:
+    def __init__(self):
+        self._subscribers = defaultdict(set)
+        self._task = None
+        self.seq = 0
+
+    def start(self):
+        self.seq = job_store.last_event_seq()
+        self._task = asyncio.create_task(self._poll())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+
+    async def _poll(self):
+        loop = asyncio.get_event_loop()
+        polls = 0
+        while True:
+            try:
+                events = await loop.run_in_executor(None, job_store.events_since, self.seq)
+                for seq, job_id, diff in events:
+                    self.seq = seq
+                    for queue in self._subscribers.get(job_id, ()):
+                        queue.put_nowait((seq, diff))
+                polls += 1
+                if polls % 1000 == 0:
+                    await loop.run_in_executor(None, job_store.prune_events, EVENT_RETENTION)
+            except Exception as e:
+                print(f"Event poll error: {e}")
+            await asyncio.sleep(EVENT_POLL_INTERVAL)
+
+    async def stream(self, job_id: str, last_seq: int = None):
+        """SSE body: a ``snapshot`` of the job, then one ``update`` per diff.
+
+        A reconnecting client (Last-Event-ID) gets the diffs it missed instead of a snapshot,
+        as long as they are still in the feed.
+        """
+        loop = asyncio.get_event_loop()
+        queue = asyncio.Queue()
+        # Subscribe first so nothing falls between the replay/snapshot and the live feed
+        self._subscribers[job_id].add(queue)
+        try:
+            if last_seq is not None:
+                missed = await loop.run_in_executor(None, lambda: job_store.events_since(last_seq, REPLAY_LIMIT, job_id))
+                for seq, _, diff in missed:
+                    last_seq = seq
+                    yield _format("update", diff, seq)
+            else:
+                job = await loop.run_in_executor(None, job_store.get_job, job_id)
+                yield _format("snapshot", job, self.seq)
+            while True:
+                try:
+                    seq, diff = await asyncio.wait_for(queue.get(), KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                # Already sent by the replay
+                if last_seq is not None and seq <= last_seq:
+                    continue
+                yield _format("update", diff, seq)
+        finally:
+            self._subscribers[job_id].discard(queue)
+            if not self._subscribers[job_id]:
+                del self._subscribers[job_id]
+
+
+def _format(event: str, data, seq: int) -> str:
+    return f"id: {seq}\nevent: {event}\ndata: {json.dumps(data)}\n\n"
@@ -0,0 +1,313 @@
+import os
+import json
+import time
+import sqlite3
+from contextlib import contextmanager
+
+# Durable job records + work queue shared by the API process and render workers
+JOB_DB_PATH = os.getenv("JOB_DB_PATH", "jobs.db")
+LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", "60"))
+MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    data TEXT NOT NULL,
+    task TEXT,
+    queue_state TEXT NOT NULL DEFAULT 'idle',
+    priority INTEGER NOT NULL DEFAULT 0,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    lease_owner TEXT,
+    lease_expires REAL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_queue ON jobs (queue_state, priority DESC, created_at);
+CREATE TABLE IF NOT EXISTS job_events (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_id TEXT NOT NULL,
+    diff TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS job_events_job ON job_events (job_id, seq);
+CREATE TABLE IF NOT EXISTS metrics (
+    name TEXT NOT NULL,
+    labels TEXT NOT NULL,
+    bucket TEXT NOT NULL,
+    value REAL NOT NULL,
+    PRIMARY KEY (name, labels, bucket)
+);
+CREATE TABLE IF NOT EXISTS batches (
+    id TEXT PRIMARY KEY,
+    data TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+"""
+
+# Job statuses that mean the video itself is finished
+DONE_STATUSES = {"ready", "uploading", "uploaded", "upload_failed"}
+
+_initialized = set()
+
+
+@contextmanager
+def _connect():
+    conn = sqlite3.connect(JOB_DB_PATH, timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    try:
+        if JOB_DB_PATH not in _initialized:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            _initialized.add(JOB_DB_PATH)
+        yield conn
+    finally:
+        conn.close()
+
+
+@contextmanager
+def _transaction():
+    """Write transaction - BEGIN IMMEDIATE serializes writers across processes."""
+    with _connect() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+
+def create_job(job: dict):
+    now = time.time()
+    with _transaction() as conn:
+        conn.execute(
+            "INSERT INTO jobs (id, data, created_at, updated_at) VALUES (?, ?, ?, ?)",
+            (job["id"], json.dumps(job), now, now),
+        )
+
+
+def get_job(job_id: str):
+    with _connect() as conn:
+        row = conn.execute("SELECT data FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    return json.loads(row["data"]) if row else None
+
+
+def update_job(job_id: str, **fields) -> dict:
+    """Merge ``fields`` into the job record and return the updated record."""
+    with _transaction() as conn:
+        return _merge(conn, job_id, fields)
+
+
+def _merge(conn, job_id: str, fields: dict) -> dict:
+    row = conn.execute("SELECT data FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    if row is None:
+        raise KeyError(job_id)
+    job = json.loads(row["data"])
+    job.update(fields)
+    now = time.time()
+    conn.execute(
+        "UPDATE jobs SET data = ?, updated_at = ? WHERE id = ?",
+        (json.dumps(job), now, job_id),
+    )
+    # Change feed for push clients (see events.py)
+    conn.execute(
+        "INSERT INTO job_events (job_id, diff, created_at) VALUES (?, ?, ?)",
+        (job_id, json.dumps(fields), now),
+    )
+    return job
+
+
+def enqueue(job_id: str, task: dict, priority: int = 0):
+    """Queue ``task`` for the job; higher priority is claimed first, then oldest first."""
+    with _transaction() as conn:
+        _enqueue(conn, job_id, task, priority)
+
+
+def requeue(job_id: str, task: dict, priority: int = 0, **fields) -> bool:
+    """Merge ``fields`` and queue ``task`` in one step, unless a worker is running the job.
+
+    Returns False (changing nothing) while it runs: a second run would share its outputs.
+    """
+    with _transaction() as conn:
+        row = conn.execute("SELECT queue_state, lease_expires FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            raise KeyError(job_id)
+        if row["queue_state"] == "running" and row["lease_expires"] >= time.time():
+            return False
+        _merge(conn, job_id, fields)
+        _enqueue(conn, job_id, task, priority)
+    return True
+
+
+def _enqueue(conn, job_id: str, task: dict, priority: int):
+    conn.execute(
+        "UPDATE jobs SET task = ?, queue_state = 'queued', priority = ?, attempts = 0, "
+        "lease_owner = NULL, lease_expires = NULL, updated_at = ? WHERE id = ?",
+        (json.dumps(task), priority, time.time(), job_id),
+    )
+
+
+def claim(worker_id: str):
+    """Lease the next runnable job, including ones whose worker stopped heartbeating.
+
+    Returns ``(job_id, task)`` or None when the queue is empty.
+    """
+    now = time.time()
+    with _transaction() as conn:
+        # Jobs abandoned by crashed workers too many times are failed, not retried
+        abandoned = conn.execute(
+            "SELECT id, data FROM jobs WHERE queue_state = 'running' AND lease_expires < ? AND attempts >= ?",
+            (now, MAX_ATTEMPTS),
+        ).fetchall()
+        for row in abandoned:
+            diff = {"status": "error", "step": "❌ Error: worker crashed", "error": "worker crashed"}
+            job = {**json.loads(row["data"]), **diff}
+            conn.execute(
+                "UPDATE jobs SET data = ?, queue_state = 'failed', lease_owner = NULL, updated_at = ? WHERE id = ?",
+                (json.dumps(job), now, row["id"]),
+            )
+            conn.execute(
+                "INSERT INTO job_events (job_id, diff, created_at) VALUES (?, ?, ?)",
+                (row["id"], json.dumps(diff), now),
+            )
+
+        row = conn.execute(
+            "SELECT id, task FROM jobs "
+            "WHERE queue_state = 'queued' OR (queue_state = 'running' AND lease_expires < ?) "
+            "ORDER BY priority DESC, created_at LIMIT 1",
+            (now,),
+        ).fetchone()
+        if row is None:
+            return None
+        conn.execute(
+            "UPDATE jobs SET queue_state = 'running', lease_owner = ?, lease_expires = ?, "
+            "attempts = attempts + 1, updated_at = ? WHERE id = ?",
+            (worker_id, now + LEASE_SECONDS, now, row["id"]),
+        )
+    return row["id"], json.loads(row["task"])
+
+
+def heartbeat(job_id: str, worker_id: str) -> bool:
+    """Extend the lease; False means another worker has taken the job over."""
+    with _transaction() as conn:
+        cur = conn.execute(
+            "UPDATE jobs SET lease_expires = ? WHERE id = ? AND lease_owner = ? AND queue_state = 'running'",
+            (time.time() + LEASE_SECONDS, job_id, worker_id),
+        )
+    return cur.rowcount == 1
+
+
+def finish(job_id: str, worker_id: str, failed: bool = False):
+    with _transaction() as conn:
+        conn.execute(
+            "UPDATE jobs SET queue_state = ?, lease_owner = NULL, lease_expires = NULL, updated_at = ? "
+            "WHERE id = ? AND lease_owner = ?",
+            ("failed" if failed else "done", time.time(), job_id, worker_id),
+        )
+
+
+def queue_stats() -> dict:
+    with _connect() as conn:
+        rows = conn.execute("SELECT queue_state, COUNT(*) AS n FROM jobs GROUP BY queue_state").fetchall()
+    return {row["queue_state"]: row["n"] for row in rows}
+
+
+def active_job_ids() -> set:
+    """Jobs whose files are in use: queued, being worked on, or uploading."""
+    with _connect() as conn:
+        rows = conn.execute(
+            "SELECT id FROM jobs WHERE queue_state IN ('queued', 'running') "
+            "OR json_extract(data, '$.status') = 'uploading'"
+        ).fetchall()
+    return {row["id"] for row in rows}
+
+
+def events_since(seq: int, limit: int = 500, job_id: str = None) -> list:
+    """Job diffs recorded after ``seq`` (for one job, if given), oldest first, as ``(seq, job_id, diff)``."""
+    with _connect() as conn:
+        if job_id is None:
+            rows = conn.execute(
+                "SELECT seq, job_id, diff FROM job_events WHERE seq > ? ORDER BY seq LIMIT ?",
+                (seq, limit),
+            ).fetchall()
+        else:
+            rows = conn.execute(
+                "SELECT seq, job_id, diff FROM job_events WHERE job_id = ? AND seq > ? ORDER BY seq LIMIT ?",
+                (job_id, seq, limit),
+            ).fetchall()
+    return [(row["seq"], row["job_id"], json.loads(row["diff"])) for row in rows]
+
+
+def last_event_seq() -> int:
+    with _connect() as conn:
+        row = conn.execute("SELECT MAX(seq) AS seq FROM job_events").fetchone()
+    return row["seq"] or 0
+
+
+def prune_events(max_age: float):
+    with _transaction() as conn:
+        conn.execute("DELETE FROM job_events WHERE created_at < ?", (time.time() - max_age,))
+
+
+def record_metrics(rows: list):
+    """Add ``(name, labels, bucket, delta)`` rows onto the cumulative histogram totals."""
+    with _transaction() as conn:
+        conn.executemany(
+            "INSERT INTO metrics (name, labels, bucket, value) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (name, labels, bucket) DO UPDATE SET value = value + excluded.value",
+            rows,
+        )
+
+
+def metric_rows() -> list:
+    with _connect() as conn:
+        rows = conn.execute("SELECT name, labels, bucket, value FROM metrics").fetchall()
+    return [tuple(row) for row in rows]
+
+
+def create_batch(batch: dict):
+    with _transaction() as conn:
+        conn.execute(
+            "INSERT INTO batches (id, data, created_at) VALUES (?, ?, ?)",
+            (batch["id"], json.dumps(batch), time.time()),
+        )
+
+
+def batch_progress(batch_id: str):
+    """Aggregate status of a batch's jobs, with throughput in finished videos per hour."""
+    with _connect() as conn:
+        row = conn.execute("SELECT data, created_at FROM batches WHERE id = ?", (batch_id,)).fetchone()
+        if row is None:
+            return None
+        batch = json.loads(row["data"])
+        placeholders = ",".join("?" * len(batch["job_ids"]))
+        rows = conn.execute(
+            f"SELECT data, updated_at FROM jobs WHERE id IN ({placeholders})", batch["job_ids"]
+        ).fetchall()
+
+    jobs = [(json.loads(r["data"]), r["updated_at"]) for r in rows]
+    statuses = {}
+    for job, _ in jobs:
+        statuses[job["status"]] = statuses.get(job["status"], 0) + 1
+    done = [updated for job, updated in jobs if job["status"] in DONE_STATUSES]
+    failed = statuses.get("error", 0)
+    finished = len(done) + failed == len(jobs)
+
+    # Once everything has finished, the clock stops at the last job's completion
+    end = max([updated for _, updated in jobs], default=row["created_at"]) if finished else time.time()
+    hours = max(end - row["created_at"], 1e-6) / 3600
+    return {
+        "id": batch_id,
+        "total": len(jobs),
+        "completed": len(done),
+        "failed": failed,
+        "finished": finished,
+        "statuses": statuses,
+        "progress": round(sum(100 if job["status"] == "error" else job.get("progress", 0) for job, _ in jobs) / max(len(jobs), 1), 1),
+        "elapsed": round(end - row["created_at"], 1),
+        "videos_per_hour": round(len(done) / hours, 2),
+        "jobs": [
+            {"id": job["id"], "topic": job["topic"], "status": job["status"], "progress": job.get("progress", 0)}
+            for job, _ in sorted(jobs, key=lambda j: batch["job_ids"].index(j[0]["id"]))
+        ],
+    }
@@ -1,30 +1,75 @@
-from fastapi import FastAPI, BackgroundTasks, HTTPException
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import StreamingResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
-import os, uuid
+from contextlib import asynccontextmanager
+import os, uuid, asyncio
 
-from agents.research_agent import research_topic
-from agents.script_agent import generate_script
-from agents.voice_agent import generate_voice
-from agents.video_agent import create_video
-from agents.youtube_agent import upload_to_youtube
+import job_store
+import metrics
+import artifacts
+from events import Broadcaster
+from worker import WorkerPool
+# Keep these imports light: the agents that need moviepy, the Google client, search
+# or TTS are loaded by the render workers (see worker.py), not the API process
+from agents.encode_profiles import PROFILES, RENDER_BACKEND_NAMES
+from agents.http_client import start_client, close_client
+from agents.script_agent import validate_script
 
-app = FastAPI(title="AutoTube AI Agent")
-app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"])
+BATCH_MAX_TOPICS = int(os.getenv("BATCH_MAX_TOPICS", "100"))
+# Render a low-res draft for review first and the full-quality video only once approved
+DRAFT_FIRST = os.getenv("DRAFT_FIRST", "1") == "1"
+
+# Run the worker pool inside the web service (single-dyno deploys); set to 0 when
+# render workers run separately via `python worker.py`
+EMBEDDED_WORKERS = os.getenv("EMBEDDED_WORKERS", "1") == "1"
+
+broadcaster = Broadcaster()
 
-os.makedirs("outputs", exist_ok=True)
-app.mount("/outputs", StaticFiles(directory="outputs"), name="outputs")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await start_client()
+    broadcaster.start()
+    gc = asyncio.create_task(artifacts.gc_loop())
+    pool = WorkerPool() if EMBEDDED_WORKERS else None
+    if pool:
+        pool.start()
+        supervisor = asyncio.create_task(pool.supervise_loop())
+    yield
+    if pool:
+        supervisor.cancel()
+        pool.stop()
+    gc.cancel()
+    await broadcaster.stop()
+    await close_client()
 
-jobs = {}
+app = FastAPI(title="AutoTube AI Agent", lifespan=lifespan)
+app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"])
+
+os.makedirs(artifacts.OUTPUTS_DIR, exist_ok=True)
 
 class TopicRequest(BaseModel):
     topic: str
+    render_backend: str | None = None
+    profile: str | None = None  # encode profile: draft, final or shorts
+    draft: bool | None = None  # review a draft before the full render; defaults to DRAFT_FIRST
+    captions: bool = False
+    priority: int = 0
+
+class BatchRequest(BaseModel):
+    topics: list[str]
+    render_backend: str | None = None
+    profile: str | None = None
+    draft: bool = False  # batches usually skip review, so they render in full by default
+    captions: bool = False
+    priority: int = 0
 
 class ApprovalRequest(BaseModel):
     job_id: str
     approved: bool
     feedback: str = ""
+    priority: int = 0
+    script: dict | None = None  # edited script; skips research and scripting
 
 class YouTubeRequest(BaseModel):
     job_id: str
@@ -36,68 +81,152 @@ class YouTubeRequest(BaseModel):
 def root():
     return {"status": "AutoTube AI Agent running"}
 
+@app.get("/api/stats/artifacts")
+def artifact_stats():
+    return artifacts.stats()
+
+@app.get("/api/stats/queue")
+def queue_stats():
+    return job_store.queue_stats()
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    return PlainTextResponse(metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
+
+@app.api_route("/outputs/{job_id}/{name:path}", methods=["GET", "HEAD"])
+def get_artifact(job_id: str, name: str, request: Request):
+    """Job files, with byte ranges so the review player can seek without re-downloading."""
+    return artifacts.artifact_response(job_id, name, request.method, request.headers)
+
 @app.post("/api/generate")
-async def generate_video(request: TopicRequest, background_tasks: BackgroundTasks):
-    job_id = str(uuid.uuid4())
-    jobs[job_id] = {"id": job_id, "topic": request.topic, "status": "starting", "step": "Initializing...", "progress": 0, "script": None, "video_url": None, "audio_url": None, "thumbnail_url": None, "error": None}
-    background_tasks.add_task(run_pipeline, job_id, request.topic)
+async def generate_video(request: TopicRequest):
+    _validate_render_options(request.render_backend, request.profile)
+    await _check_storage()
+    draft = DRAFT_FIRST if request.draft is None else request.draft
+    job_id = _submit(request.topic, request.render_backend, request.profile, request.captions, request.priority, draft=draft)
     return {"job_id": job_id}
 
+@app.post("/api/batch")
+async def generate_batch(request: BatchRequest):
+    """Queue one video per topic; research and footage searches are shared through the caches."""
+    topics = [t.strip() for t in request.topics if t.strip()]
+    if not topics:
+        raise HTTPException(status_code=400, detail="No topics given")
+    if len(topics) > BATCH_MAX_TOPICS:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_MAX_TOPICS} topics per batch")
+    _validate_render_options(request.render_backend, request.profile)
+    await _check_storage()
+    batch_id = str(uuid.uuid4())
+    job_ids = [str(uuid.uuid4()) for _ in topics]
+    job_store.create_batch({"id": batch_id, "topics": topics, "job_ids": job_ids})
+    for job_id, topic in zip(job_ids, topics):
+        _submit(topic, request.render_backend, request.profile, request.captions, request.priority,
+                draft=request.draft, job_id=job_id, batch_id=batch_id)
+    return {"batch_id": batch_id, "job_ids": job_ids}
+
+@app.get("/api/batch/{batch_id}")
+def get_batch(batch_id: str):
+    progress = job_store.batch_progress(batch_id)
+    if progress is None:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    return progress
+
+def _validate_render_options(render_backend: str | None, profile: str | None):
+    if render_backend and render_backend not in RENDER_BACKEND_NAMES:
+        raise HTTPException(status_code=400, detail=f"Unknown render backend: {render_backend}")
+    if profile and profile not in PROFILES:
+        raise HTTPException(status_code=400, detail=f"Unknown encode profile: {profile}")
+
+async def _check_storage():
+    if not await artifacts.has_room():
+        raise HTTPException(status_code=507, detail="Output storage is full; try again once jobs finish")
+
+def _submit(topic: str, render_backend: str | None, profile: str | None, captions: bool, priority: int, draft: bool = False, job_id: str = None, batch_id: str = None) -> str:
+    job_id = job_id or str(uuid.uuid4())
+    # A draft-profile job is already as cheap as its draft would be
+    draft = draft and profile != "draft"
+    job_store.create_job({"id": job_id, "topic": topic, "batch_id": batch_id, "render_backend": render_backend, "profile": profile, "draft": draft, "approved": False, "captions": captions, "status": "starting", "step": "Initializing...", "progress": 0, "script": None, "video_url": None, "audio_url": None, "thumbnail_url": None, "error": None})
+    job_store.enqueue(job_id, {"kind": "pipeline", "topic": topic}, priority=priority)
+    return job_id
+
 @app.get("/api/status/{job_id}")
 def get_status(job_id: str):
-    if job_id not in jobs:
+    job = job_store.get_job(job_id)
+    if job is None:
         raise HTTPException(status_code=404, detail="Job not found")
-    return jobs[job_id]
+    return job
+
+@app.get("/api/events/{job_id}")
+async def job_events(job_id: str, request: Request):
+    """Server-Sent Events stream of job changes; /api/status polling still works."""
+    if job_store.get_job(job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    last_id = request.headers.get("last-event-id")
+    return StreamingResponse(
+        broadcaster.stream(job_id, int(last_id) if last_id and last_id.isdigit() else None),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 @app.post("/api/upload")
 async def upload_video(request: YouTubeRequest):
-    if request.job_id not in jobs:
+    # The Google API client is only loaded once something is actually uploaded
+    from agents.youtube_agent import upload_to_youtube
+
+    if job_store.get_job(request.job_id) is None:
         raise HTTPException(status_code=404, detail="Job not found")
     video_path = f"outputs/{request.job_id}/final_video.mp4"
     if not os.path.exists(video_path):
+        if job_store.get_job(request.job_id).get("approved"):
+            raise HTTPException(status_code=409, detail="Final render still in progress")
         raise HTTPException(status_code=400, detail="Video not found")
-    jobs[request.job_id]["status"] = "uploading"
-    jobs[request.job_id]["step"] = "Uploading to YouTube..."
+    # ``progress`` stays at 100 (the video is done); the upload reports its own fraction
+    job_store.update_job(request.job_id, status="uploading", step="Uploading to YouTube...", upload_progress=0)
     try:
-        result = await upload_to_youtube(video_path=video_path, title=request.title, description=request.description, tags=request.tags)
-        jobs[request.job_id]["status"] = "uploaded"
-        jobs[request.job_id]["youtube_url"] = result["url"]
+        def on_progress(fraction):
+            job_store.update_job(request.job_id, upload_progress=round(fraction, 3))
+        result = await upload_to_youtube(video_path=video_path, title=request.title, description=request.description, tags=request.tags, on_progress=on_progress)
+        job_store.update_job(request.job_id, status="uploaded", youtube_url=result["url"])
         return {"success": True, "youtube_url": result["url"]}
     except Exception as e:
-        jobs[request.job_id]["status"] = "upload_failed"
-        jobs[request.job_id]["error"] = str(e)
+        job_store.update_job(request.job_id, status="upload_failed", error=str(e))
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/regenerate")
-async def regenerate(request: ApprovalRequest, background_tasks: BackgroundTasks):
-    if request.job_id not in jobs:
+async def regenerate(request: ApprovalRequest):
+    job = job_store.get_job(request.job_id)
+    if job is None:
         raise HTTPException(status_code=404, detail="Job not found")
-    topic = jobs[request.job_id]["topic"]
-    enhanced_topic = f"{topic}. Feedback: {request.feedback}" if request.feedback else topic
-    jobs[request.job_id].update({"status": "starting", "step": "Regenerating...", "progress": 0, "video_url": None, "error": None})
-    background_tasks.add_task(run_pipeline, request.job_id, enhanced_topic)
+    if request.script is not None:
+        try:
+            validate_script(request.script)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    revision = job.get("revision", 0) + 1
+    # Stages whose inputs didn't change are reused from the job's checkpoints
+    task = {"kind": "pipeline", "topic": job["topic"], "feedback": request.feedback, "script": request.script, "revision": revision}
+    if not job_store.requeue(request.job_id, task, priority=request.priority, status="starting", step="Regenerating...",
+                             progress=0, video_url=None, preview_url=None, draft_url=None, error=None, approved=False,
+                             artifacts_expired=False, revision=revision):
+        raise HTTPException(status_code=409, detail="Job is still running")
     return {"job_id": request.job_id}
 
-async def run_pipeline(job_id: str, topic: str):
-    try:
-        output_dir = f"outputs/{job_id}"
-        os.makedirs(output_dir, exist_ok=True)
-        update_job(job_id, "researching", "🔍 Researching topic on the web...", 10)
-        research_data = await research_topic(topic)
-        update_job(job_id, "scripting", "✍️ Writing video script with AI...", 30)
-        script = await generate_script(topic, research_data)
-        jobs[job_id]["script"] = script
-        update_job(job_id, "voicing", "🎙️ Generating voiceover...", 50)
-        audio_path = await generate_voice(script["narration"], f"{output_dir}/narration.mp3")
-        jobs[job_id]["audio_url"] = f"/outputs/{job_id}/narration.mp3"
-        update_job(job_id, "creating_video", "🎬 Assembling video with stock footage...", 70)
-        await create_video(script=script, audio_path=audio_path, output_dir=output_dir, job_id=job_id)
-        jobs[job_id]["video_url"] = f"/outputs/{job_id}/final_video.mp4"
-        jobs[job_id]["thumbnail_url"] = f"/outputs/{job_id}/thumbnail.jpg"
-        update_job(job_id, "ready", "✅ Video ready for review!", 100)
-    except Exception as e:
-        import traceback; traceback.print_exc()
-        jobs[job_id].update({"status": "error", "step": f"❌ Error: {str(e)}", "error": str(e)})
-
-def update_job(job_id, status, step, progress):
-    jobs[job_id].update({"status": status, "step": step, "progress": progress})
+@app.post("/api/approve")
+async def approve(request: ApprovalRequest):
+    """Approve the reviewed video; for a draft this queues the full-quality render."""
+    if not request.approved:
+        return await regenerate(request)
+    job = job_store.get_job(request.job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job["status"] != "ready" or job.get("approved"):
+        raise HTTPException(status_code=409, detail="Job is not awaiting approval")
+    if not job.get("draft"):
+        job_store.update_job(request.job_id, approved=True)
+        return {"job_id": request.job_id}
+    # The approved script is passed through, so only the render stage runs again
+    task = {"kind": "pipeline", "topic": job["topic"], "script": job["script"], "revision": job.get("revision", 0)}
+    if not job_store.requeue(request.job_id, task, priority=request.priority, status="starting",
+                             step="Rendering final video...", progress=0, approved=True, artifacts_expired=False):
+        raise HTTPException(status_code=409, detail="Job is still running")
+    return {"job_id": request.job_id}
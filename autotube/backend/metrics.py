@@ -0,0 +1,277 @@
+import os
+import json
+import time
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+import job_store
+
+# Timing spans for each job, plus histograms and counters shared by the API and worker
+# processes. Workers aggregate observations locally and flush them into the job database
+# when a job finishes; /metrics renders the totals in the Prometheus text format.
+
+SECONDS_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+BYTES_BUCKETS = tuple(2 ** n * 1024 ** 2 for n in range(0, 14))  # 1 MiB .. 8 GiB
+RSS_SAMPLE_INTERVAL = float(os.getenv("RSS_SAMPLE_INTERVAL", "0.25"))
+
+HISTOGRAMS = {
+    "autotube_stage_seconds": ("Duration of pipeline stages and render steps.", SECONDS_BUCKETS),
+    "autotube_job_seconds": ("End-to-end pipeline duration per job.", SECONDS_BUCKETS),
+    "autotube_job_download_bytes": ("Bytes downloaded per job.", BYTES_BUCKETS),
+    "autotube_job_peak_rss_bytes": ("Peak RSS of the worker or its largest ffmpeg child, per job.", BYTES_BUCKETS),
+    "autotube_http_request_seconds": ("Upstream HTTP request latency, including streamed bodies.", SECONDS_BUCKETS),
+}
+
+COUNTERS = {
+    "autotube_http_errors_total": "Upstream HTTP transport errors.",
+    "autotube_http_retries_total": "Upstream HTTP requests retried.",
+    "autotube_http_connections_total": "Upstream HTTP requests by whether they opened a connection.",
+    "autotube_footage_cache_lookups_total": "Footage cache lookups by kind and result.",
+    "autotube_footage_bytes_total": "Footage bytes served from the cache or downloaded.",
+    "autotube_footage_evictions_total": "Clips evicted from the footage cache.",
+}
+
+_timeline = ContextVar("timeline", default=None)
+_current_span = ContextVar("current_span", default=None)
+# Counts and histograms not yet written to the job store; clip-pool threads add to
+# them while a flush may be running, so every access holds the lock
+_pending = {}
+_pending_lock = threading.Lock()
+
+
+class Timeline:
+    """Spans recorded while running one job; attached to its status record as ``timeline``."""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.spans = []
+        self.download_bytes = 0
+        self.peak_rss_bytes = 0
+        self._stop = threading.Event()
+        self._sampler = None
+
+    def start(self):
+        if _read_rss(os.getpid()) is not None:
+            self._sampler = threading.Thread(target=self._sample, name="rss-sampler", daemon=True)
+            self._sampler.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._sampler is not None:
+            self._sampler.join()
+        else:
+            # No /proc: the best available is the process's lifetime high-water mark
+            self.peak_rss_bytes = max(self.peak_rss_bytes, lifetime_peak_rss())
+
+    def _sample(self):
+        while True:
+            self.peak_rss_bytes = max(self.peak_rss_bytes, sample_rss())
+            if self._stop.wait(RSS_SAMPLE_INTERVAL):
+                return
+
+    def summary(self) -> dict:
+        return {
+            "total": round(time.monotonic() - self.started, 3),
+            "download_bytes": self.download_bytes,
+            "peak_rss_bytes": self.peak_rss_bytes,
+            "spans": self.spans,
+        }
+
+
+def start_timeline() -> Timeline:
+    """Collect spans from the current task (and tasks it spawns) into a new timeline."""
+    timeline = Timeline()
+    timeline.start()
+    _timeline.set(timeline)
+    return timeline
+
+
+@contextmanager
+def span(name: str, **attrs):
+    """Time the enclosed block as stage ``name``.
+
+    Spans marked ``cached`` (see :func:`annotate`) stay on the timeline but are
+    left out of the histograms, so checkpoint reuse doesn't skew stage timings.
+    """
+    attrs = dict(attrs)
+    token = _current_span.set(attrs)
+    started = time.monotonic()
+    error = None
+    try:
+        yield attrs
+    except BaseException as e:
+        error = type(e).__name__
+        raise
+    finally:
+        _current_span.reset(token)
+        duration = time.monotonic() - started
+        timeline = _timeline.get()
+        if timeline is not None:
+            entry = {"name": name, "start": round(started - timeline.started, 3), "duration": round(duration, 3)}
+            entry.update(attrs)
+            if error:
+                entry["error"] = error
+            timeline.spans.append(entry)
+        if not attrs.get("cached"):
+            observe("autotube_stage_seconds", duration, stage=name)
+
+
+def annotate(**attrs):
+    """Add attributes to the innermost open span, if any."""
+    current = _current_span.get()
+    if current is not None:
+        current.update(attrs)
+
+
+def count_download(nbytes: int):
+    timeline = _timeline.get()
+    if timeline is not None:
+        timeline.download_bytes += nbytes
+
+
+def sample_rss() -> int:
+    """Current RSS of this process or of its largest live child (ffmpeg), whichever is bigger.
+
+    Children's ru_maxrss (wait4, RUSAGE_CHILDREN) would include the parent's pages
+    shared before exec, so they are sampled like the worker itself.
+    """
+    peak = _read_rss(os.getpid()) or 0
+    for pid in _child_pids():
+        peak = max(peak, _read_rss(pid) or 0)
+    return peak
+
+
+def lifetime_peak_rss() -> int:
+    if resource is None:
+        return 0
+    # ru_maxrss is in KiB on Linux
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return max(own, children) * 1024
+
+
+def _read_rss(pid: int):
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def _child_pids() -> list:
+    pids = []
+    try:
+        tids = os.listdir("/proc/self/task")
+    except OSError:
+        return pids
+    for tid in tids:
+        try:
+            with open(f"/proc/self/task/{tid}/children") as f:
+                pids.extend(int(pid) for pid in f.read().split())
+        except (OSError, ValueError):
+            pass
+    return pids
+
+
+def observe(name: str, value: float, **labels):
+    _, buckets = HISTOGRAMS[name]
+    key = (name, json.dumps(labels, sort_keys=True))
+    with _pending_lock:
+        entry = _pending.setdefault(key, {"buckets": [0] * len(buckets), "sum": 0.0, "count": 0})
+        for i, bound in enumerate(buckets):
+            if value <= bound:
+                entry["buckets"][i] += 1
+        entry["sum"] += value
+        entry["count"] += 1
+
+
+def inc(name: str, value: float = 1, **labels):
+    key = (name, json.dumps(labels, sort_keys=True))
+    with _pending_lock:
+        _pending[key] = _pending.get(key, 0) + value
+
+
+def finish_timeline(timeline: Timeline) -> dict:
+    """Record the job-level histograms, flush everything pending and return the summary."""
+    timeline.stop()
+    summary = timeline.summary()
+    observe("autotube_job_seconds", summary["total"])
+    observe("autotube_job_download_bytes", summary["download_bytes"])
+    observe("autotube_job_peak_rss_bytes", summary["peak_rss_bytes"])
+    flush()
+    return summary
+
+
+def flush():
+    global _pending
+    with _pending_lock:
+        pending, _pending = _pending, {}
+    rows = []
+    for (name, labels), entry in pending.items():
+        if name in COUNTERS:
+            rows.append((name, labels, "total", entry))
+            continue
+        _, buckets = HISTOGRAMS[name]
+        rows.extend((name, labels, _format_bound(b), n) for b, n in zip(buckets, entry["buckets"]))
+        rows.append((name, labels, "+Inf", entry["count"]))
+        rows.append((name, labels, "sum", entry["sum"]))
+    if rows:
+        job_store.record_metrics(rows)
+
+
+def render_prometheus() -> str:
+    """All histograms, counters and gauges in the Prometheus text exposition format."""
+    # Include this process's own observations, e.g. upstream calls made by the API
+    flush()
+    series = {}
+    for name, labels, bucket, value in job_store.metric_rows():
+        series.setdefault(name, {}).setdefault(labels, {})[bucket] = value
+
+    lines = []
+    for name, (help_text, buckets) in HISTOGRAMS.items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} histogram")
+        for labels, values in sorted(series.get(name, {}).items()):
+            label_pairs = [f'{k}="{v}"' for k, v in json.loads(labels).items()]
+            for bound in [_format_bound(b) for b in buckets] + ["+Inf"]:
+                bucket_labels = ",".join(label_pairs + ['le="%s"' % bound])
+                lines.append(f"{name}_bucket{{{bucket_labels}}} {_format_value(values.get(bound, 0))}")
+            suffix = "{" + ",".join(label_pairs) + "}" if label_pairs else ""
+            lines.append(f"{name}_sum{suffix} {_format_value(values.get('sum', 0))}")
+            lines.append(f"{name}_count{suffix} {_format_value(values.get('+Inf', 0))}")
+
+    for name, help_text in COUNTERS.items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} counter")
+        for labels, values in sorted(series.get(name, {}).items()):
+            label_pairs = ",".join(f'{k}="{v}"' for k, v in json.loads(labels).items())
+            suffix = "{" + label_pairs + "}" if label_pairs else ""
+            lines.append(f"{name}{suffix} {_format_value(values.get('total', 0))}")
+
+    lines.append("# HELP autotube_footage_cache_bytes Bytes of clips in the footage cache.")
+    lines.append("# TYPE autotube_footage_cache_bytes gauge")
+    from agents.footage_cache import get_cache
+    lines.append(f"autotube_footage_cache_bytes {get_cache().size()}")
+
+    lines.append("# HELP autotube_jobs Jobs by queue state.")
+    lines.append("# TYPE autotube_jobs gauge")
+    for state, n in sorted(job_store.queue_stats().items()):
+        lines.append(f'autotube_jobs{{state="{state}"}} {n}')
+    return "\n".join(lines) + "\n"
+
+
+def _format_bound(bound) -> str:
+    return repr(float(bound)) if isinstance(bound, float) else str(bound)
+
+
+def _format_value(value) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(value)
@@ -0,0 +1,141 @@
+import os
+import time
+import asyncio
+
+import job_store
+import metrics
+import artifacts
+from checkpoints import Checkpoints, content_hash, file_hash
+from agents.research_agent import research_topic
+from agents.script_agent import generate_script
+from agents.voice_agent import generate_voice, VOICE, RATE, VOLUME
+from agents.video_agent import create_video, prefetch_scene
+from agents.timing import timing_path
+from agents.thumbnail_agent import thumbnail_names
+from agents.encode_profiles import encode_threads
+
+PROGRESS_INTERVAL = float(os.getenv("PROGRESS_INTERVAL", "1.0"))
+
+
+async def run_pipeline(job_id: str, topic: str, feedback: str = "", script_override: dict = None, revision: int = 0):
+    timeline = metrics.start_timeline()
+    try:
+        output_dir = f"outputs/{job_id}"
+        os.makedirs(output_dir, exist_ok=True)
+        checkpoints = Checkpoints(output_dir)
+        job = job_store.get_job(job_id)
+        # Draft jobs get a cheap review render first; approval re-runs with the same
+        # script, so the clips, audio and timings all come back from the checkpoints
+        draft = job.get("draft", False) and not job.get("approved", False)
+
+        if script_override:
+            script = script_override
+        else:
+            update_job(job_id, "researching", "🔍 Researching topic on the web...", 10)
+            with metrics.span("research"):
+                research_data = await checkpoints.stage("research", {"topic": topic}, lambda: research_topic(topic))
+            update_job(job_id, "scripting", "✍️ Writing video script with AI...", 30)
+            script_topic = f"{topic}. Feedback: {feedback}" if feedback else topic
+            # Scenes stream in before the narration; start fetching their footage right away
+            prefetches = set()
+            def on_scene(scene):
+                task = asyncio.create_task(prefetch_scene(scene))
+                prefetches.add(task)
+                task.add_done_callback(prefetches.discard)
+            # A plain "regenerate" (no feedback) asks for a new take, so skip the response cache
+            with metrics.span("script"):
+                script = await checkpoints.stage(
+                    "script",
+                    {"topic": script_topic, "research": content_hash(research_data), "revision": revision},
+                    lambda: generate_script(script_topic, research_data, on_scene=on_scene,
+                                            use_cache=not (revision and not feedback)),
+                )
+        job_store.update_job(job_id, script=script)
+
+        update_job(job_id, "voicing", "🎙️ Generating voiceover...", 50)
+        audio_path = f"{output_dir}/narration.mp3"
+        with metrics.span("voice"):
+            voice = await checkpoints.stage(
+                "voice",
+                {"narration": script["narration"], "voice": [VOICE, RATE, VOLUME]},
+                lambda: _voice_artifact(script["narration"], audio_path),
+            )
+        artifacts.check_job_quota(job_id)
+        job_store.update_job(job_id, audio_url=f"/outputs/{job_id}/narration.mp3")
+
+        if draft:
+            update_job(job_id, "creating_video", "🎬 Assembling draft video with stock footage...", 70)
+        elif job.get("approved"):
+            update_job(job_id, "creating_video", "🎬 Rendering final video...", 70)
+        else:
+            update_job(job_id, "creating_video", "🎬 Assembling video with stock footage...", 70)
+        # Share the cores with the other renders running right now (this one included)
+        threads = encode_threads(job_store.queue_stats().get("running", 1))
+        with metrics.span("video"):
+            await create_video(script=script, audio_path=audio_path, output_dir=output_dir, job_id=job_id,
+                               render_backend=job.get("render_backend"), checkpoints=checkpoints, audio_hash=voice["hash"],
+                               captions=job.get("captions", False), on_progress=_render_progress(job_id),
+                               check_quota=lambda: artifacts.check_job_quota(job_id),
+                               profile=job.get("profile"), threads=threads, draft=draft)
+        if draft:
+            # Clips stay for the approved render; only the size limit applies yet
+            artifacts.check_job_quota(job_id)
+            draft_url = f"/outputs/{job_id}/draft.mp4"
+            job_store.update_job(job_id, script=script, draft_url=draft_url, preview_url=draft_url)
+            update_job(job_id, "ready", "✅ Draft ready for review!", 100)
+            return
+        # Scene clips, caption cards and the draft are only render inputs; a later
+        # regenerate re-trims clips from the footage cache
+        artifacts.purge_intermediates(job_id)
+        artifacts.check_job_quota(job_id)
+        preview_url = f"/outputs/{job_id}/preview.mp4" if script["render"].get("preview") else None
+        job_store.update_job(job_id, script=script, draft_url=None, video_url=f"/outputs/{job_id}/final_video.mp4", thumbnail_url=f"/outputs/{job_id}/thumbnail.jpg",
+                             thumbnail_urls=[f"/outputs/{job_id}/{name}" for name in thumbnail_names()], preview_url=preview_url)
+        update_job(job_id, "ready", "✅ Video ready for review!", 100)
+    except Exception as e:
+        import traceback; traceback.print_exc()
+        cleared = {}
+        if isinstance(e, artifacts.QuotaExceeded):
+            # Keep nothing of an over-budget job, so retrying it can't pile up more
+            freed = artifacts.purge_job(job_id)
+            print(f"[{job_id}] over quota, purged {freed / 1024 ** 2:.0f} MiB")
+            cleared = dict(video_url=None, preview_url=None, draft_url=None, audio_url=None,
+                           thumbnail_url=None, thumbnail_urls=[])
+        job_store.update_job(job_id, status="error", step=f"❌ Error: {str(e)}", error=str(e), **cleared)
+        raise
+    finally:
+        job_store.update_job(job_id, timeline=metrics.finish_timeline(timeline))
+
+
+def _render_progress(job_id: str):
+    """Throttled frame-progress callback that maps encoding onto the 70-99% band."""
+    last = [0.0]
+
+    def report(done: int, total: int):
+        now = time.monotonic()
+        if now - last[0] < PROGRESS_INTERVAL and done < total:
+            return
+        last[0] = now
+        job_store.update_job(
+            job_id,
+            render_progress={"frames": done, "total": total},
+            progress=70 + int(29 * done / max(total, 1)),
+        )
+    return report
+
+
+async def _voice_artifact(narration: str, audio_path: str) -> dict:
+    await generate_voice(narration, audio_path)
+    return {"paths": [audio_path, timing_path(audio_path)], "hash": file_hash(audio_path)}
+
+
+def update_job(job_id, status, step, progress):
+    job_store.update_job(job_id, status=status, step=step, progress=progress)
+
+
+# Work the queue knows how to run, keyed by task["kind"]
+TASKS = {
+    "pipeline": lambda job_id, task: run_pipeline(
+        job_id, task["topic"], task.get("feedback", ""), task.get("script"), task.get("revision", 0)
+    ),
+}
@@ -0,0 +1,12 @@
+import os
+import tempfile
+
+# Tests run from a scratch directory with their own job database, so they never see a
+# real outputs/, jobs.db or credentials. Set up before any backend module is imported;
+# spawned child processes inherit the same directory through the environment.
+WORKDIR = os.environ.get("AUTOTUBE_TEST_DIR") or tempfile.mkdtemp(prefix="autotube-tests-")
+os.environ["AUTOTUBE_TEST_DIR"] = WORKDIR
+os.environ["JOB_DB_PATH"] = os.path.join(WORKDIR, "jobs.db")
+os.environ["FOOTAGE_CACHE_DIR"] = os.path.join(WORKDIR, "cache", "footage")
+os.environ["EMBEDDED_WORKERS"] = "0"
+os.chdir(WORKDIR)
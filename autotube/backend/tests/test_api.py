@@ -0,0 +1,36 @@
+import uuid
+import unittest
+
+from fastapi.testclient import TestClient
+
+import job_store
+import main
+
+SCRIPT = {"title": "t", "description": "d", "narration": "n", "scenes": [{"text": "s"}], "tags": []}
+
+
+class RegenerateTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.client = TestClient(main.app)
+
+    def setUp(self):
+        self.job_id = str(uuid.uuid4())
+        job_store.create_job({"id": self.job_id, "topic": "waves", "status": "ready"})
+
+    def regenerate(self, script):
+        return self.client.post("/api/regenerate", json={"job_id": self.job_id, "approved": False, "script": script})
+
+    def test_edited_script_is_validated(self):
+        for script in [{"title": "only a title"}, {**SCRIPT, "scenes": "one"}, {**SCRIPT, "narration": ["n"]}]:
+            r = self.regenerate(script)
+            self.assertEqual(r.status_code, 400)
+            self.assertEqual(job_store.get_job(self.job_id)["status"], "ready")
+
+        r = self.regenerate(SCRIPT)
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(job_store.get_job(self.job_id)["status"], "starting")
+
+
+if __name__ == "__main__":
+    unittest.main()
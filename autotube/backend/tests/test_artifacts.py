@@ -0,0 +1,73 @@
+import os
+import uuid
+import unittest
+
+from fastapi.testclient import TestClient
+
+import main
+from tests import WORKDIR
+
+
+class ArtifactServingTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.job_id = str(uuid.uuid4())
+        cls.data = os.urandom(64 * 1024 + 7)
+        os.makedirs(f"outputs/{cls.job_id}", exist_ok=True)
+        with open(f"outputs/{cls.job_id}/final_video.mp4", "wb") as f:
+            f.write(cls.data)
+        # Files next to outputs/ that must never be reachable
+        with open(os.path.join(WORKDIR, "youtube_token.json"), "w") as f:
+            f.write("secret")
+        cls.client = TestClient(main.app)
+
+    def get(self, path, **headers):
+        return self.client.get(path, headers=headers)
+
+    def test_full_and_ranged(self):
+        url = f"/outputs/{self.job_id}/final_video.mp4"
+        r = self.get(url)
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r.content, self.data)
+        self.assertEqual(r.headers["accept-ranges"], "bytes")
+
+        r = self.get(url, range="bytes=100-199")
+        self.assertEqual(r.status_code, 206)
+        self.assertEqual(r.content, self.data[100:200])
+        self.assertEqual(r.headers["content-range"], f"bytes 100-199/{len(self.data)}")
+
+        r = self.get(url, range="bytes=-10")
+        self.assertEqual(r.content, self.data[-10:])
+
+        r = self.get(url, range=f"bytes={len(self.data)}-")
+        self.assertEqual(r.status_code, 416)
+
+    def test_revalidation(self):
+        url = f"/outputs/{self.job_id}/final_video.mp4"
+        etag = self.get(url).headers["etag"]
+        self.assertEqual(self.get(url, **{"if-none-match": etag}).status_code, 304)
+        # A stale If-Range gets the whole (changed) file instead of a range
+        r = self.get(url, range="bytes=0-9", **{"if-range": '"stale"'})
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(len(r.content), len(self.data))
+
+    def test_traversal(self):
+        for path in [
+            "/outputs/%2E%2E/youtube_token.json",
+            "/outputs/..%2Fyoutube_token.json/x",
+            f"/outputs/{self.job_id}/..%2F..%2Fyoutube_token.json",
+            f"/outputs/{self.job_id}/%2E%2E/%2E%2E/youtube_token.json",
+            "/outputs/%2E%2E/jobs.db",
+        ]:
+            with self.subTest(path=path):
+                r = self.get(path)
+                self.assertEqual(r.status_code, 404)
+                self.assertNotIn(b"secret", r.content)
+
+    def test_job_id_pattern(self):
+        self.assertEqual(self.get("/outputs/.gc.lock/x").status_code, 404)
+        self.assertEqual(self.get(f"/outputs/{self.job_id}/missing.mp4").status_code, 404)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,64 @@
+import os
+import uuid
+import shutil
+import asyncio
+import unittest
+
+from checkpoints import Checkpoints
+
+
+class CheckpointsTest(unittest.TestCase):
+    def setUp(self):
+        self.output_dir = os.path.join("outputs", str(uuid.uuid4()))
+        os.makedirs(self.output_dir)
+        self.addCleanup(shutil.rmtree, self.output_dir, True)
+        self.calls = []
+
+    def stage(self, name: str, inputs, result="artifact", checkpoints=None):
+        async def compute():
+            self.calls.append(name)
+            return result
+        return asyncio.run((checkpoints or Checkpoints(self.output_dir)).stage(name, inputs, compute))
+
+    def test_reused_for_the_same_inputs(self):
+        self.assertEqual(self.stage("script", {"topic": "volcanoes", "revision": 0}), "artifact")
+        # A new instance reads checkpoints.json back, as a regenerate in another worker would
+        self.assertEqual(self.stage("script", {"revision": 0, "topic": "volcanoes"}, "other"), "artifact")
+        self.assertEqual(self.calls, ["script"])
+
+    def test_changed_inputs_invalidate_the_stage(self):
+        self.stage("script", {"topic": "volcanoes", "revision": 0}, "take 1")
+        self.assertEqual(self.stage("script", {"topic": "volcanoes", "revision": 1}, "take 2"), "take 2")
+        # Only the latest inputs are kept, so going back recomputes too
+        self.assertEqual(self.stage("script", {"topic": "volcanoes", "revision": 0}, "take 3"), "take 3")
+        self.assertEqual(self.calls, ["script"] * 3)
+
+    def test_other_stages_survive(self):
+        self.stage("research", {"topic": "volcanoes"}, "facts")
+        self.stage("script", {"research": "h1"}, "take 1")
+        self.stage("script", {"research": "h2"}, "take 2")
+        self.assertEqual(self.stage("research", {"topic": "volcanoes"}), "facts")
+        self.assertEqual(self.calls, ["research", "script", "script"])
+
+    def test_missing_files_invalidate_the_stage(self):
+        audio = os.path.join(self.output_dir, "narration.mp3")
+        with open(audio, "wb") as f:
+            f.write(b"mp3")
+        checkpoints = Checkpoints(self.output_dir)
+        checkpoints.save("voice", {"narration": "n"}, {"paths": [audio], "hash": "h"})
+        self.assertEqual(checkpoints.fresh("voice", {"narration": "n"}), {"paths": [audio], "hash": "h"})
+        os.remove(audio)
+        self.assertIsNone(checkpoints.fresh("voice", {"narration": "n"}))
+
+        checkpoints.save("clip_0", {"query": "q"}, {"path": audio, "canonical": True})
+        self.assertIsNone(checkpoints.fresh("clip_0", {"query": "q"}))
+
+    def test_unreadable_file_starts_empty(self):
+        with open(os.path.join(self.output_dir, "checkpoints.json"), "w") as f:
+            f.write("{not json")
+        self.assertEqual(self.stage("research", {"topic": "volcanoes"}), "artifact")
+        self.assertEqual(self.calls, ["research"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,30 @@
+import os
+import multiprocessing
+import unittest
+
+from tests import WORKDIR
+from agents.clip_normalizer import normalize_clip, run_ffmpeg
+from agents.ffmpeg_render import probe_duration
+
+
+def _normalize(path):
+    return normalize_clip(path)
+
+
+class NormalizeClipTest(unittest.TestCase):
+    def test_concurrent_processes_share_one_transcode(self):
+        source = os.path.join(WORKDIR, "source.mp4")
+        run_ffmpeg(["-f", "lavfi", "-i", "testsrc2=size=320x240:rate=30", "-t", "1",
+                    "-c:v", "libx264", "-preset", "ultrafast", "-pix_fmt", "yuv420p", source])
+
+        with multiprocessing.get_context("spawn").Pool(3) as pool:
+            paths = pool.map(_normalize, [source] * 3)
+
+        self.assertEqual(len(set(paths)), 1)
+        self.assertAlmostEqual(probe_duration(paths[0]), 1.0, delta=0.1)
+        leftovers = [n for n in os.listdir(os.path.dirname(paths[0])) if ".tmp" in n]
+        self.assertEqual(leftovers, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
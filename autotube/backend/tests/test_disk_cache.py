@@ -0,0 +1,43 @@
+import os
+import time
+import shutil
+import unittest
+
+from agents.disk_cache import evict_lru
+
+
+class EvictLruTest(unittest.TestCase):
+    def setUp(self):
+        self.root = "cache/evict_test"
+        shutil.rmtree(self.root, ignore_errors=True)
+        os.makedirs(os.path.join(self.root, "news"))
+        self.addCleanup(shutil.rmtree, self.root, True)
+
+    def write(self, name, size, age):
+        path = os.path.join(self.root, name)
+        with open(path, "wb") as f:
+            f.write(b"x" * size)
+        mtime = time.time() - age
+        os.utime(path, (mtime, mtime))
+        return path
+
+    def test_oldest_entries_go_first(self):
+        old = [self.write("a.mp3", 600, 30), self.write("a.json", 100, 30)]
+        mid = self.write("news/b.json", 600, 20)
+        new = [self.write("c.mp3", 600, 10), self.write("c.json", 100, 10)]
+        lock = self.write("d.json.lock", 0, 40)
+        freed = evict_lru(self.root, 1500)
+        self.assertEqual(freed, 700)
+        self.assertFalse(any(os.path.exists(p) for p in old))
+        self.assertTrue(all(os.path.exists(p) for p in [mid, *new, lock]))
+
+    def test_expired_entries_go_regardless_of_size(self):
+        stale = self.write("news/old.json", 10, 3600)
+        fresh = self.write("news/new.json", 10, 60)
+        evict_lru(self.root, 10 ** 9, max_age=600)
+        self.assertFalse(os.path.exists(stale))
+        self.assertTrue(os.path.exists(fresh))
+
+
+if __name__ == "__main__":
+    unittest.main()
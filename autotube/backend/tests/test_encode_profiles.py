@@ -0,0 +1,26 @@
+import unittest
+
+from agents.encode_profiles import PROFILES, get_profile, draft_profile, is_landscape
+
+
+class EncodeProfileTest(unittest.TestCase):
+    def test_landscape(self):
+        # 854x480 is 16:9 rounded to an even width; it must keep the moviepy backend
+        self.assertTrue(is_landscape(get_profile("draft")))
+        self.assertTrue(is_landscape(get_profile("final")))
+        self.assertFalse(is_landscape(get_profile("shorts")))
+        self.assertFalse(is_landscape({"width": 1440, "height": 1080}))
+
+    def test_draft_follows_orientation(self):
+        self.assertTrue(is_landscape(draft_profile(get_profile("final"))))
+        shorts_draft = draft_profile(get_profile("shorts"))
+        self.assertGreater(shorts_draft["height"], shorts_draft["width"])
+
+    def test_unknown_profile(self):
+        with self.assertRaises(ValueError):
+            get_profile("nope")
+        self.assertIn("final", PROFILES)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,48 @@
+import asyncio
+import json
+import unittest
+import uuid
+
+import job_store
+from events import Broadcaster
+
+
+def _seq(chunk: str) -> int:
+    return int(chunk.split("\n")[0].removeprefix("id: "))
+
+
+class ReconnectTest(unittest.TestCase):
+    def test_replayed_diffs_are_not_sent_twice(self):
+        job_id = str(uuid.uuid4())
+        job_store.create_job({"id": job_id, "status": "starting"})
+        for progress in (10, 20, 30):
+            job_store.update_job(job_id, progress=progress)
+            job_store.update_job(job_id, step=f"at {progress}")
+        events = job_store.events_since(0, job_id=job_id)
+        self.assertTrue(all(event_job == job_id for _, event_job, _ in events))
+        last_seen = events[1][0]
+
+        async def reconnect():
+            broadcaster = Broadcaster()
+            stream = broadcaster.stream(job_id, last_seen)
+            sent = [await stream.__anext__()]
+            # The poller catches up on the same diffs while the replay is still going
+            job_store.update_job(job_id, progress=40)
+            for seq, _, diff in job_store.events_since(last_seen, job_id=job_id):
+                for queue in broadcaster._subscribers[job_id]:
+                    queue.put_nowait((seq, diff))
+            while True:
+                try:
+                    sent.append(await asyncio.wait_for(stream.__anext__(), 0.5))
+                except asyncio.TimeoutError:
+                    return sent
+
+        sent = asyncio.run(reconnect())
+        seqs = [_seq(chunk) for chunk in sent]
+        self.assertEqual(seqs, sorted(set(seqs)))
+        self.assertEqual(seqs[0], last_seen + 1)
+        self.assertEqual(json.loads(sent[-1].split("data: ")[1]), {"progress": 40})
+
+
+if __name__ == "__main__":
+    unittest.main()
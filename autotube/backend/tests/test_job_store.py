@@ -0,0 +1,110 @@
+import asyncio
+import sqlite3
+import threading
+import unittest
+import uuid
+from unittest import mock
+
+import job_store
+import worker
+
+
+def _new_job() -> str:
+    job_id = str(uuid.uuid4())
+    job_store.create_job({"id": job_id, "status": "ready"})
+    return job_id
+
+
+class RequeueTest(unittest.TestCase):
+    def test_refused_while_running(self):
+        job_id = _new_job()
+        job_store.enqueue(job_id, {"kind": "pipeline"}, priority=100)
+        self.assertEqual(job_store.claim("w1")[0], job_id)
+        self.assertFalse(job_store.requeue(job_id, {"kind": "pipeline"}, status="starting"))
+        self.assertEqual(job_store.get_job(job_id)["status"], "ready")
+        self.assertTrue(job_store.heartbeat(job_id, "w1"))
+
+        job_store.finish(job_id, "w1")
+        self.assertTrue(job_store.requeue(job_id, {"kind": "pipeline"}, status="starting"))
+        self.assertEqual(job_store.get_job(job_id)["status"], "starting")
+
+
+class LeaseLossTest(unittest.TestCase):
+    def test_run_cancelled_when_lease_is_lost(self):
+        job_id = _new_job()
+        cancelled = []
+
+        async def task(job_id, task):
+            try:
+                await asyncio.sleep(30)
+            except asyncio.CancelledError:
+                cancelled.append(job_id)
+                raise
+
+        with mock.patch.dict("pipeline.TASKS", {"test": task}), \
+                mock.patch.object(job_store, "LEASE_SECONDS", 0.3), \
+                mock.patch.object(job_store, "heartbeat", return_value=False):
+            asyncio.run(asyncio.wait_for(worker._run(job_id, {"kind": "test"}, "w1"), 5))
+        self.assertEqual(cancelled, [job_id])
+
+    def test_run_cancelled_when_heartbeat_dies(self):
+        job_id = _new_job()
+        cancelled = []
+
+        async def task(job_id, task):
+            try:
+                await asyncio.sleep(30)
+            except asyncio.CancelledError:
+                cancelled.append(job_id)
+                raise
+
+        with mock.patch.dict("pipeline.TASKS", {"test": task}), \
+                mock.patch.object(job_store, "LEASE_SECONDS", 0.3), \
+                mock.patch.object(job_store, "heartbeat", side_effect=RuntimeError("boom")):
+            asyncio.run(asyncio.wait_for(worker._run(job_id, {"kind": "test"}, "w1"), 5))
+        self.assertEqual(cancelled, [job_id])
+        self.assertEqual(job_store.get_job(job_id)["status"], "error")
+
+
+class WorkerLoopTest(unittest.TestCase):
+    def test_unknown_kind_fails_the_job(self):
+        job_id = _new_job()
+        job_store.enqueue(job_id, {"kind": "nonexistent"}, priority=100)
+        claimed = job_store.claim("w1")
+        self.assertEqual(claimed[0], job_id)
+        asyncio.run(worker._run(job_id, claimed[1], "w1"))
+        self.assertEqual(job_store.get_job(job_id)["status"], "error")
+        self.assertEqual(job_store.queue_stats().get("running", 0), 0)
+
+    def test_survives_queue_errors(self):
+        stop = threading.Event()
+        calls = []
+
+        def claim(worker_id):
+            calls.append(worker_id)
+            if len(calls) == 1:
+                raise sqlite3.OperationalError("database is locked")
+            stop.set()
+            return None
+
+        with mock.patch.object(job_store, "claim", claim), \
+                mock.patch.object(worker, "POLL_INTERVAL", 0.01):
+            asyncio.run(asyncio.wait_for(worker._worker_loop("w1", stop), 5))
+        self.assertEqual(len(calls), 2)
+
+
+class WorkerPoolTest(unittest.TestCase):
+    def test_dead_workers_are_respawned(self):
+        pool = worker.WorkerPool(size=2)
+        alive = mock.Mock(is_alive=mock.Mock(return_value=True))
+        dead = mock.Mock(is_alive=mock.Mock(return_value=False), pid=1234, exitcode=-9)
+        pool._procs = [alive, dead]
+        replacement = mock.Mock()
+        with mock.patch.object(pool, "_spawn", return_value=replacement) as spawn:
+            self.assertEqual(pool.supervise(), 1)
+        spawn.assert_called_once_with(1)
+        self.assertEqual(pool._procs, [alive, replacement])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,58 @@
+import threading
+import unittest
+
+import metrics
+
+
+class CounterTest(unittest.TestCase):
+    def test_counters_are_persisted_and_rendered(self):
+        metrics.inc("autotube_footage_cache_lookups_total", kind="clip", result="hit")
+        metrics.inc("autotube_footage_cache_lookups_total", kind="clip", result="hit")
+        metrics.inc("autotube_footage_bytes_total", 1024, source="download")
+        metrics.flush()
+        # Another process's flush lands on the same totals
+        metrics.inc("autotube_footage_bytes_total", 1024, source="download")
+        text = metrics.render_prometheus()
+        self.assertIn("# TYPE autotube_footage_cache_lookups_total counter", text)
+        self.assertIn('autotube_footage_cache_lookups_total{kind="clip",result="hit"} 2', text)
+        self.assertIn('autotube_footage_bytes_total{source="download"} 2048', text)
+        self.assertRegex(text, r"\nautotube_footage_cache_bytes \d+\n")
+
+    def test_http_latency_histogram(self):
+        metrics.observe("autotube_http_request_seconds", 0.2, upstream="pexels")
+        text = metrics.render_prometheus()
+        self.assertIn('autotube_http_request_seconds_bucket{upstream="pexels",le="0.25"} 1', text)
+        self.assertIn('autotube_http_request_seconds_count{upstream="pexels"} 1', text)
+
+    def test_flush_while_threads_count(self):
+        def count():
+            for _ in range(2000):
+                metrics.inc("autotube_footage_evictions_total", source="flush-race")
+
+        threads = [threading.Thread(target=count) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        while any(thread.is_alive() for thread in threads):
+            metrics.flush()
+        for thread in threads:
+            thread.join()
+        text = metrics.render_prometheus()
+        self.assertIn('autotube_footage_evictions_total{source="flush-race"} 8000', text)
+
+
+
+class PeakRssTest(unittest.TestCase):
+    def test_peak_is_per_job(self):
+        # An earlier allocation raises the process's lifetime peak, not the next job's
+        ballast = bytearray(256 * 1024 ** 2)
+        for i in range(0, len(ballast), 4096):
+            ballast[i] = 1
+        del ballast
+        timeline = metrics.start_timeline()
+        summary = metrics.finish_timeline(timeline)
+        self.assertGreater(summary["peak_rss_bytes"], 0)
+        self.assertLess(summary["peak_rss_bytes"], 192 * 1024 ** 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
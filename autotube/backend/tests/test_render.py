@@ -0,0 +1,223 @@
+import os
+import re
+import uuid
+import shutil
+import asyncio
+import unittest
+import subprocess
+from unittest import mock
+
+from fastapi.testclient import TestClient
+
+import artifacts
+import job_store
+import main
+import pipeline
+from tests import WORKDIR
+from agents import video_agent
+from agents.clip_normalizer import run_ffmpeg, ffmpeg_exe
+from agents import ffmpeg_render
+from agents.encode_profiles import get_profile
+from agents.ffmpeg_render import probe_duration, compare_renders
+from agents.timing import save_timing
+
+FIXTURES = os.path.join(WORKDIR, "fixtures")
+SCENE_SECONDS = 1.5
+
+
+def fixture_clip(source: str = "testsrc2", size: str = "640x360", seconds: float = 2) -> str:
+    path = os.path.join(FIXTURES, f"{source}_{size}_{seconds}.mp4")
+    if not os.path.exists(path):
+        os.makedirs(FIXTURES, exist_ok=True)
+        run_ffmpeg(["-f", "lavfi", "-i", f"{source}=size={size}:rate=24", "-t", str(seconds),
+                    "-c:v", "libx264", "-preset", "ultrafast", "-pix_fmt", "yuv420p", path])
+    return path
+
+
+def fixture_narration(output_dir: str, scenes: int) -> str:
+    """Narration audio with an evenly spaced timing index, like voice_agent writes."""
+    path = os.path.join(output_dir, "narration.mp3")
+    duration = scenes * SCENE_SECONDS
+    run_ffmpeg(["-f", "lavfi", "-i", f"sine=frequency=220:duration={duration}",
+                "-ac", "1", "-ar", "24000", "-b:a", "48k", path])
+    words = [[round(i * 0.5, 3), round(i * 0.5 + 0.4, 3), f"word{i}."] for i in range(int(duration / 0.5))]
+    save_timing(path, {"duration": duration, "words": words,
+                       "sentences": [[w[0], w[1], w[2]] for w in words]})
+    return path
+
+
+def fixture_script(scenes: int) -> dict:
+    return {
+        "title": "Render Test",
+        "scenes": [{"text": f"scene {i}", "search_query": f"render test {i}", "duration": SCENE_SECONDS}
+                   for i in range(scenes)],
+        "narration": "",
+    }
+
+
+def probe_size(path: str) -> tuple:
+    result = subprocess.run([ffmpeg_exe(), "-hide_banner", "-i", path], capture_output=True, text=True)
+    w, h = re.search(r"Video: .*?, (\d{2,5})x(\d{2,5})", result.stderr).groups()
+    return int(w), int(h)
+
+
+async def _fake_download(query, output_path):
+    shutil.copyfile(fixture_clip(), output_path)
+    return output_path
+
+
+async def _fake_script(topic, research, on_scene=None, use_cache=True):
+    return dict(fixture_script(2), description="d", tags=[])
+
+
+async def _fake_voice(narration, audio_path):
+    fixture_narration(os.path.dirname(audio_path), 2)
+
+
+def fake_stages(test: unittest.TestCase):
+    """Stand in fixtures for research, scripting, voice and footage for the rest of ``test``."""
+    for patch in [
+        mock.patch.object(pipeline, "research_topic", mock.AsyncMock(return_value={})),
+        mock.patch.object(pipeline, "generate_script", _fake_script),
+        mock.patch.object(pipeline, "generate_voice", _fake_voice),
+        mock.patch.object(video_agent, "download_pexels_video", _fake_download),
+    ]:
+        patch.start()
+        test.addCleanup(patch.stop)
+
+
+class RenderTestCase(unittest.TestCase):
+    scenes = 2
+
+    def setUp(self):
+        self.job_id = str(uuid.uuid4())
+        self.output_dir = os.path.join("outputs", self.job_id)
+        os.makedirs(self.output_dir)
+        self.addCleanup(shutil.rmtree, self.output_dir, True)
+        self.audio = fixture_narration(self.output_dir, self.scenes)
+        patch = mock.patch.object(video_agent, "download_pexels_video", _fake_download)
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def render(self, **kwargs) -> tuple:
+        script = fixture_script(self.scenes)
+        path = asyncio.run(video_agent.create_video(script, self.audio, self.output_dir, self.job_id, **kwargs))
+        return path, script["render"]
+
+
+class DraftRenderTest(RenderTestCase):
+    def test_draft_through_default_backend(self):
+        path, render = self.render(draft=True)
+        self.assertEqual(probe_size(path), (854, 480))
+        self.assertAlmostEqual(probe_duration(path), self.scenes * SCENE_SECONDS, delta=0.2)
+        self.assertEqual(render["profile"], "draft")
+        self.assertEqual(render["backend"], video_agent.DRAFT_RENDER_BACKEND)
+
+    def test_draft_ignores_requested_backend(self):
+        path, render = self.render(render_backend="moviepy", draft=True)
+        self.assertEqual(render["backend"], video_agent.DRAFT_RENDER_BACKEND)
+        self.assertEqual(probe_size(path), (854, 480))
+
+    def test_raw_clips_are_scaled_by_ffmpeg(self):
+        # Clips that can't be normalized go through moviepy's own clip preparation
+        with mock.patch.object(video_agent, "normalize_clip", side_effect=RuntimeError("no canonical clip")):
+            path, render = self.render(render_backend="moviepy", profile="draft")
+        self.assertEqual(render["backend"], "moviepy")
+        self.assertEqual(probe_size(path), (854, 480))
+
+    def test_moviepy_failure_falls_back_to_ffmpeg(self):
+        failing = mock.Mock(side_effect=AttributeError("module 'PIL.Image' has no attribute 'ANTIALIAS'"))
+        with mock.patch.dict(video_agent.RENDER_BACKENDS, {"moviepy": failing}):
+            path, render = self.render(render_backend="moviepy", profile="draft")
+        failing.assert_called_once()
+        self.assertEqual(render["backend"], "ffmpeg")
+        self.assertEqual(probe_size(path), (854, 480))
+
+
+
+class SegmentParityTest(RenderTestCase):
+    scenes = 3
+
+    def render_with(self, backend, name: str) -> str:
+        scenes = [{"text": f"scene {i}", "actual_duration": d} for i, d in enumerate([1.3, 1.537, 1.6])]
+        sources = [fixture_clip(), None, fixture_clip("smptehdbars")]
+        cues = [[0.2, 1.1, "first cue"], [1.2, 2.0, "across the cut"], [3.0, 4.3, "last cue"]]
+        os.makedirs(os.path.join(self.output_dir, "clips"), exist_ok=True)
+        output_path = os.path.join(self.output_dir, f"{name}.mp4")
+        preview_path = os.path.join(self.output_dir, f"{name}_preview.mp4")
+        backend(scenes, sources, self.audio, "Parity", self.output_dir, output_path, cues,
+                profile=get_profile("draft"), preview_path=preview_path, threads=2)
+        self.assertAlmostEqual(probe_duration(preview_path), probe_duration(output_path), delta=0.1)
+        return output_path
+
+    def test_segments_match_the_filter_graph(self):
+        # Two graphs (scenes 0-1 and 2), so the title and a caption both cross a join
+        with mock.patch.object(ffmpeg_render, "FFMPEG_MAX_INPUTS", 2):
+            graph = self.render_with(ffmpeg_render.render_ffmpeg, "graph")
+        segments = self.render_with(ffmpeg_render.render_segments, "segments")
+        parity = compare_renders(graph, segments)
+        self.assertLess(parity["duration_delta"], 1 / 24)
+        self.assertGreater(parity["psnr"], 35)
+
+    def test_parity_detects_different_frames(self):
+        graph = self.render_with(ffmpeg_render.render_ffmpeg, "graph")
+        with mock.patch.object(ffmpeg_render, "TITLE_DURATION", 0):
+            untitled = self.render_with(ffmpeg_render.render_segments, "untitled")
+        self.assertLess(compare_renders(graph, untitled)["psnr"], compare_renders(graph, graph)["psnr"])
+
+
+class GenerateDraftTest(unittest.TestCase):
+    def test_default_generate_renders_a_draft(self):
+        fake_stages(self)
+        r = TestClient(main.app).post("/api/generate", json={"topic": "render test"})
+        self.assertEqual(r.status_code, 200)
+        job_id = r.json()["job_id"]
+        self.addCleanup(shutil.rmtree, os.path.join("outputs", job_id), True)
+        self.assertTrue(job_store.get_job(job_id)["draft"])
+
+        asyncio.run(pipeline.run_pipeline(job_id, "render test"))
+
+        job = job_store.get_job(job_id)
+        self.assertEqual(job["status"], "ready")
+        self.assertEqual(job["draft_url"], f"/outputs/{job_id}/draft.mp4")
+        self.assertNotEqual(job["script"]["render"]["backend"], "moviepy")
+        self.assertEqual(probe_size(os.path.join("outputs", job_id, "draft.mp4")), (854, 480))
+
+
+
+class JobQuotaTest(unittest.TestCase):
+    def setUp(self):
+        fake_stages(self)
+        self.job_id = str(uuid.uuid4())
+        job_store.create_job({"id": self.job_id, "status": "starting", "draft": True})
+        self.addCleanup(shutil.rmtree, artifacts.job_dir(self.job_id), True)
+        self.backends = {name: mock.Mock() for name in video_agent.RENDER_BACKENDS}
+        patch = mock.patch.dict(video_agent.RENDER_BACKENDS, self.backends)
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def run_over_quota(self):
+        with self.assertRaises(artifacts.QuotaExceeded):
+            asyncio.run(pipeline.run_pipeline(self.job_id, "quota test"))
+        job = job_store.get_job(self.job_id)
+        self.assertEqual(job["status"], "error")
+        self.assertIsNone(job["audio_url"])
+        self.assertFalse(os.path.exists(artifacts.job_dir(self.job_id)))
+        for backend in self.backends.values():
+            backend.assert_not_called()
+
+    def test_aborts_after_the_voice(self):
+        with mock.patch.object(artifacts, "JOB_MAX_BYTES", 1):
+            self.run_over_quota()
+
+    def test_aborts_before_the_render(self):
+        # Room for the narration, but not for the scene clips on top of it
+        narration_dir = os.path.join(WORKDIR, "fixtures", "narration")
+        os.makedirs(narration_dir, exist_ok=True)
+        fixture_narration(narration_dir, 2)
+        with mock.patch.object(artifacts, "JOB_MAX_BYTES", artifacts.dir_size(narration_dir) + 4096):
+            self.run_over_quota()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+import json
+import unittest
+
+from agents.script_agent import ScenesParser, parse_script
+
+SCENES = [
+    {"id": 1, "text": "Lava {flows}", "search_query": "lava \"flow\" [night]", "duration": 5},
+    {"id": 2, "text": "Ash cloud", "search_query": "ash\\cloud", "duration": 4, "meta": {"mood": "dark"}},
+    {"id": 3, "text": "Cooling rock", "search_query": "basalt", "duration": 6},
+]
+REPLY = json.dumps({
+    "title": "Volcanoes {explained}",
+    "description": "d",
+    "tags": ["volcano"],
+    "scenes": SCENES,
+    "narration": "Magma rises. [pause] It erupts.",
+})
+
+
+class ScenesParserTest(unittest.TestCase):
+    def parse(self, chunks: list) -> list:
+        scenes = []
+        parser = ScenesParser(scenes.append)
+        for chunk in chunks:
+            parser.feed(chunk)
+        return scenes
+
+    def test_whole_reply(self):
+        self.assertEqual(self.parse([REPLY]), SCENES)
+
+    def test_one_character_at_a_time(self):
+        # Keys, brackets, braces, quotes and escapes all get split across chunks
+        self.assertEqual(self.parse(list(REPLY)), SCENES)
+
+    def test_scenes_arrive_as_they_close(self):
+        scenes = []
+        parser = ScenesParser(scenes.append)
+        first_end = REPLY.index(', {"id": 2')
+        parser.feed(REPLY[:first_end - 1])
+        self.assertEqual(scenes, [])
+        parser.feed(REPLY[first_end - 1:first_end])
+        self.assertEqual(scenes, SCENES[:1])
+        parser.feed(REPLY[first_end:])
+        self.assertEqual(scenes, SCENES)
+
+    def test_stops_at_end_of_array(self):
+        # Objects after the scenes array are not scenes
+        reply = REPLY[:-1] + ', "extra": [{"id": 99}]}'
+        self.assertEqual(self.parse([reply]), SCENES)
+
+    def test_malformed_scene_is_skipped(self):
+        reply = '{"scenes": [{"id": 1,}, {"id": 2}]}'
+        self.assertEqual(self.parse([reply]), [{"id": 2}])
+
+    def test_callback_errors_dont_stop_parsing(self):
+        seen = []
+
+        def on_scene(scene):
+            seen.append(scene)
+            raise RuntimeError("prefetch failed")
+
+        parser = ScenesParser(on_scene)
+        parser.feed(REPLY)
+        self.assertEqual(seen, SCENES)
+
+
+class ParseScriptTest(unittest.TestCase):
+    def test_fenced_reply_with_trailing_commas(self):
+        content = "Sure! Here it is:\n```json\n" + REPLY.replace('"volcano"]', '"volcano",]') + "\n```"
+        self.assertEqual(parse_script(content)["scenes"], SCENES)
+
+    def test_missing_field(self):
+        with self.assertRaises(ValueError):
+            parse_script('{"title": "t", "scenes": []}')
+
+
+if __name__ == "__main__":
+    unittest.main()
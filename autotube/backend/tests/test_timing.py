@@ -0,0 +1,91 @@
+import unittest
+
+from agents import timing
+from agents.timing import plan_scene_cuts, caption_cues
+
+
+def make_timing(sentences: list) -> dict:
+    """Timing index for ``sentences`` (lists of words), one word every 0.5s, each lasting 0.4s."""
+    words, spans = [], []
+    t = 0.0
+    for sentence in sentences:
+        start = t
+        for word in sentence:
+            words.append([t, round(t + 0.4, 3), word])
+            t = round(t + 0.5, 3)
+        spans.append([start, words[-1][1], " ".join(sentence)])
+    return {"duration": words[-1][1], "words": words, "sentences": spans}
+
+
+def cuts(durations: list) -> list:
+    edges, elapsed = [], 0.0
+    for duration in durations[:-1]:
+        elapsed += duration
+        edges.append(round(elapsed, 3))
+    return edges
+
+
+class PlanSceneCutsTest(unittest.TestCase):
+    def test_durations_cover_the_narration(self):
+        index = make_timing([["w"] * 7, ["w"] * 9, ["w"] * 5])
+        durations = plan_scene_cuts([5, 3, 2], index)
+        self.assertEqual(len(durations), 3)
+        self.assertAlmostEqual(sum(durations), index["duration"])
+
+    def test_single_scene_takes_everything(self):
+        index = make_timing([["w"] * 4])
+        self.assertEqual(plan_scene_cuts([5], index), [index["duration"]])
+
+    def test_snaps_to_sentence_end_over_nearer_word_end(self):
+        # Sentence ends at 3.4 and 7.9; the proportional cut (4.95) is right by a word end
+        index = make_timing([["w"] * 7, ["w"] * 9, ["w"] * 4])
+        self.assertEqual(cuts(plan_scene_cuts([1, 1], index)), [3.4])
+
+    def test_falls_back_to_word_end_outside_the_window(self):
+        # The only sentence end (14.9) is far from the proportional cut at 9.95
+        index = make_timing([["w"] * 30, ["w"] * 10])
+        self.assertEqual(cuts(plan_scene_cuts([1, 1], index)), [9.9])
+
+    def test_scenes_keep_the_minimum_length(self):
+        # Sentence ends at 0.9 and 1.4 are closest to the cut at 1.48, but would make a too-short
+        # first scene; the next word end after the minimum length wins
+        index = make_timing([["w"] * 2, ["w"], ["w"] * 12])
+        self.assertEqual(cuts(plan_scene_cuts([1, 4], index)), [1.9])
+
+    def test_final_pause_is_never_a_cut(self):
+        # The last sentence end is the narration's end; cutting there would leave an empty scene
+        index = make_timing([["w"] * 10])
+        durations = plan_scene_cuts([100, 1], index)
+        self.assertGreaterEqual(durations[-1], timing.MIN_SCENE_SECONDS)
+
+    def test_cuts_never_go_backwards(self):
+        index = make_timing([["w"] * 6, ["w"] * 6])
+        durations = plan_scene_cuts([1, 0, 0, 1], index)
+        self.assertTrue(all(d >= 0 for d in durations))
+        self.assertAlmostEqual(sum(durations), index["duration"])
+
+
+class CaptionCuesTest(unittest.TestCase):
+    def test_never_spans_sentences(self):
+        index = make_timing([["One", "two."], ["Three", "four."]])
+        self.assertEqual(caption_cues(index), [[0.0, 0.9, "One two."], [1.0, 1.9, "Three four."]])
+
+    def test_breaks_long_lines(self):
+        index = make_timing([["abcd"] * 5])
+        cues = caption_cues(index, max_chars=10)
+        self.assertEqual([cue[2] for cue in cues], ["abcd abcd", "abcd abcd", "abcd"])
+        self.assertTrue(all(len(cue[2]) <= 10 for cue in cues))
+        # Cues follow each other and start/end on their words
+        self.assertEqual([cue[:2] for cue in cues], [[0.0, 0.9], [1.0, 1.9], [2.0, 2.4]])
+
+    def test_word_starting_at_sentence_end_opens_a_cue(self):
+        index = {"duration": 2.0, "words": [[0.0, 1.0, "Hi."], [1.0, 2.0, "Bye."]],
+                 "sentences": [[0.0, 1.0, "Hi."], [1.0, 2.0, "Bye."]]}
+        self.assertEqual([cue[2] for cue in caption_cues(index)], ["Hi.", "Bye."])
+
+    def test_no_words(self):
+        self.assertEqual(caption_cues({"duration": 1.0, "words": [], "sentences": []}), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,42 @@
+import asyncio
+import unittest
+from unittest import mock
+
+from agents import video_agent
+
+SEARCH = {"videos": [
+    {"id": 1, "duration": 3, "video_files": [{"id": 10, "width": 1280, "link": "https://videos.example/1.mp4"}]},
+    {"id": 2, "duration": 30, "video_files": [{"id": 20, "width": 1920, "link": "https://videos.example/2.mp4"}]},
+]}
+
+
+class FakeCache:
+    def __init__(self):
+        self.fetched = []
+
+    async def search(self, query, params, fetch):
+        return SEARCH
+
+    def clip_path(self, video_id, video_file):
+        return f"clips/{video_id}_{video_file['id']}.mp4"
+
+    async def fetch_clip(self, cache_path, download):
+        self.fetched.append(cache_path)
+        return cache_path
+
+
+class ClipChoiceTest(unittest.TestCase):
+    def test_prefetch_warms_the_clip_the_render_uses(self):
+        # The script's guessed duration and the narration-timed one differ; both pick the same clip
+        cache = FakeCache()
+        with mock.patch.object(video_agent, "PEXELS_API_KEY", "key"), \
+                mock.patch.object(video_agent, "get_cache", return_value=cache), \
+                mock.patch.object(video_agent, "get_client"), \
+                mock.patch.object(video_agent, "normalize_clip"):
+            asyncio.run(video_agent.prefetch_scene({"search_query": "waves", "duration": 2}))
+            asyncio.run(video_agent.fetch_pexels_clip("waves"))
+        self.assertEqual(cache.fetched, ["clips/1_10.mp4", "clips/1_10.mp4"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,189 @@
+import os
+import re
+import json
+import asyncio
+import uuid
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+from googleapiclient.discovery import build_from_document
+from googleapiclient.discovery_cache import get_static_doc
+from google.oauth2.credentials import Credentials
+from fastapi.testclient import TestClient
+
+import job_store
+import main
+from agents import youtube_agent
+
+QUANTUM = youtube_agent.CHUNK_QUANTUM
+
+
+class FakeYouTube(BaseHTTPRequestHandler):
+    """Just enough of the resumable upload protocol: start a session, take chunks, report offsets."""
+
+    received = bytearray()
+    sessions = 0
+    status_queries = 0
+    fail_chunks = []  # HTTP status to answer the Nth chunk PUT with, in order
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        type(self).sessions += 1
+        self.rfile.read(int(self.headers.get("content-length", 0)))
+        self.send_response(200)
+        self.send_header("Location", f"http://{self.headers['host']}/session")
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_PUT(self):
+        cls = type(self)
+        body = self.rfile.read(int(self.headers.get("content-length", 0)))
+        content_range = self.headers["content-range"]
+        total = int(content_range.rsplit("/", 1)[1])
+        if content_range.startswith("bytes */"):
+            cls.status_queries += 1
+            return self._incomplete()
+        if cls.fail_chunks:
+            self.send_response(cls.fail_chunks.pop(0))
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        start = int(re.match(r"bytes (\d+)-", content_range).group(1))
+        del cls.received[start:]
+        cls.received += body
+        if len(cls.received) < total:
+            return self._incomplete()
+        payload = json.dumps({"id": "fake-video"}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _incomplete(self):
+        self.send_response(308)
+        if self.received:
+            self.send_header("Range", f"bytes=0-{len(self.received) - 1}")
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+
+class ResumableUploadTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), FakeYouTube)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        # The bundled discovery document, pointed at the fake (api_endpoint would keep https)
+        doc = json.loads(get_static_doc("youtube", "v3"))
+        doc["rootUrl"] = f"http://127.0.0.1:{cls.server.server_port}/"
+        cls.creds = Credentials(token="test-token")
+        cls.youtube = build_from_document(doc, credentials=cls.creds)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+
+    def setUp(self):
+        FakeYouTube.received = bytearray()
+        FakeYouTube.sessions = 0
+        FakeYouTube.status_queries = 0
+        FakeYouTube.fail_chunks = []
+        self.data = os.urandom(5 * QUANTUM + 123)
+        self.path = f"upload_test_{self._testMethodName}.mp4"
+        with open(self.path, "wb") as f:
+            f.write(self.data)
+        patches = [
+            mock.patch.object(youtube_agent, "_get_youtube", return_value=(self.youtube, self.creds)),
+            mock.patch.object(youtube_agent, "INITIAL_CHUNK", QUANTUM),
+            mock.patch.object(youtube_agent, "MIN_CHUNK", QUANTUM),
+            mock.patch.object(youtube_agent, "MAX_CHUNK", QUANTUM),
+            mock.patch.object(youtube_agent, "UPLOAD_BACKOFF_MAX", 0.01),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def upload(self, progress=None):
+        return asyncio.run(youtube_agent.upload_to_youtube(self.path, "title", "description", ["tag"],
+                                                           on_progress=progress.append if progress is not None else None))
+
+    def test_retries_transient_errors(self):
+        FakeYouTube.fail_chunks = [503]
+        progress = []
+        result = self.upload(progress)
+        self.assertEqual(result["id"], "fake-video")
+        self.assertEqual(bytes(FakeYouTube.received), self.data)
+        self.assertEqual(progress, sorted(progress))
+        self.assertFalse(os.path.exists(youtube_agent._session_path(self.path)))
+
+    def test_resumes_an_interrupted_upload(self):
+        # A permanent error mid-upload leaves the session on disk, as a crash would
+        calls = {"n": 0}
+        original = FakeYouTube.do_PUT
+
+        def crash_after_two_chunks(handler):
+            calls["n"] += 1
+            if calls["n"] == 3:
+                handler.rfile.read(int(handler.headers.get("content-length", 0)))
+                handler.send_response(403)
+                handler.send_header("Content-Length", "0")
+                handler.end_headers()
+                return
+            original(handler)
+
+        with mock.patch.object(FakeYouTube, "do_PUT", crash_after_two_chunks):
+            with self.assertRaises(Exception):
+                self.upload()
+        self.assertEqual(len(FakeYouTube.received), 2 * QUANTUM)
+        self.assertTrue(os.path.exists(youtube_agent._session_path(self.path)))
+
+        result = self.upload()
+        self.assertEqual(result["id"], "fake-video")
+        self.assertEqual(FakeYouTube.sessions, 1)
+        self.assertEqual(FakeYouTube.status_queries, 1)
+        self.assertEqual(bytes(FakeYouTube.received), self.data)
+
+    def test_missing_internals_are_skipped(self):
+        class Request:
+            def __init__(self):
+                self._in_error_state = False
+
+        request = Request()
+        self.assertTrue(youtube_agent._set_internal(request, "_in_error_state", True))
+        self.assertTrue(request._in_error_state)
+        self.assertFalse(youtube_agent._set_internal(request, "_chunksize", 1))
+        self.assertFalse(hasattr(request, "_chunksize"))
+
+
+class UploadEndpointTest(unittest.TestCase):
+    def test_progress_never_goes_backwards(self):
+        job_id = str(uuid.uuid4())
+        job_store.create_job({"id": job_id, "status": "ready", "progress": 100})
+        os.makedirs(f"outputs/{job_id}", exist_ok=True)
+        with open(f"outputs/{job_id}/final_video.mp4", "wb") as f:
+            f.write(b"video")
+        seen = []
+
+        async def fake_upload(video_path, title, description, tags, on_progress):
+            for fraction in (0.25, 0.5, 1.0):
+                on_progress(fraction)
+                seen.append(job_store.get_job(job_id))
+            return {"id": "fake-video", "url": "https://www.youtube.com/watch?v=fake-video"}
+
+        with mock.patch.object(youtube_agent, "upload_to_youtube", fake_upload):
+            r = TestClient(main.app).post("/api/upload", json={"job_id": job_id, "title": "t", "description": "d"})
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual([job["progress"] for job in seen], [100, 100, 100])
+        self.assertEqual([job["upload_progress"] for job in seen], [0.25, 0.5, 1.0])
+        self.assertEqual(job_store.get_job(job_id)["status"], "uploaded")
+
+
+if __name__ == "__main__":
+    unittest.main()
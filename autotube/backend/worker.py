@@ -0,0 +1,158 @@
+import os
+import time
+import signal
+import sqlite3
+import asyncio
+import multiprocessing
+
+import job_store
+
+# Render workers: separate processes that lease jobs from the SQLite queue
+WORKER_CONCURRENCY = int(os.getenv("WORKER_CONCURRENCY", "2"))
+POLL_INTERVAL = float(os.getenv("WORKER_POLL_INTERVAL", "1.0"))
+# Longest wait between retries when the queue itself keeps failing (e.g. "database is locked")
+MAX_BACKOFF = float(os.getenv("WORKER_MAX_BACKOFF", "30"))
+# How often the parent checks for dead workers (OOM kills, segfaults) and respawns them
+SUPERVISE_INTERVAL = float(os.getenv("WORKER_SUPERVISE_INTERVAL", "5"))
+
+
+async def _heartbeat(job_id: str, worker_id: str, work: asyncio.Task):
+    while True:
+        await asyncio.sleep(job_store.LEASE_SECONDS / 3)
+        try:
+            renewed = job_store.heartbeat(job_id, worker_id)
+        except sqlite3.Error as e:
+            # Try again next beat; a lease that expires meanwhile shows up as lost
+            print(f"[{worker_id}] heartbeat for {job_id} failed: {e}")
+            continue
+        if not renewed:
+            # The job was requeued or taken over; stop before we overwrite the new run's outputs
+            print(f"[{worker_id}] lost lease on {job_id}, abandoning it")
+            work.cancel()
+            return
+
+
+async def _run(job_id: str, task: dict, worker_id: str):
+    from pipeline import TASKS
+
+    run = TASKS.get(task.get("kind"))
+    if run is None:
+        print(f"[{worker_id}] job {job_id} has unknown task kind {task.get('kind')!r}")
+        error = f"unknown task kind: {task.get('kind')}"
+        job_store.update_job(job_id, status="error", step=f"❌ Error: {error}", error=error)
+        job_store.finish(job_id, worker_id, failed=True)
+        return
+
+    work = asyncio.create_task(run(job_id, task))
+    beat = asyncio.create_task(_heartbeat(job_id, worker_id, work))
+    # Nothing renews the lease once the heartbeat dies, so the work must not outlive it
+    beat.add_done_callback(lambda _: work.cancel())
+    failed = False
+    try:
+        await work
+    except asyncio.CancelledError:
+        if not (beat.done() and not beat.cancelled()):
+            raise
+        if beat.exception() is not None:
+            print(f"[{worker_id}] heartbeat for {job_id} died: {beat.exception()}")
+            error = "lost contact with the job queue"
+            job_store.update_job(job_id, status="error", step=f"❌ Error: {error}", error=error)
+            failed = True
+    except Exception as e:
+        print(f"[{worker_id}] job {job_id} failed: {e}")
+        failed = True
+    finally:
+        beat.cancel()
+        job_store.finish(job_id, worker_id, failed=failed)
+
+
+async def _worker_loop(worker_id: str, stop):
+    from agents.http_client import start_client, close_client
+
+    await start_client()
+    failures = 0
+    try:
+        while not stop.is_set():
+            try:
+                claimed = job_store.claim(worker_id)
+                if claimed is None:
+                    await asyncio.sleep(POLL_INTERVAL)
+                    continue
+                job_id, task = claimed
+                await _run(job_id, task, worker_id)
+                failures = 0
+            except Exception as e:
+                # An unfinished job's lease runs out and another worker picks it up
+                failures += 1
+                delay = min(POLL_INTERVAL * 2 ** failures, MAX_BACKOFF)
+                print(f"[{worker_id}] queue error, retrying in {delay:.1f}s: {e}")
+                await asyncio.sleep(delay)
+    finally:
+        await close_client()
+
+
+def worker_main(index: int, stop):
+    # The parent owns shutdown; children finish their current job when stop is set
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    worker_id = f"{os.uname().nodename}:{os.getpid()}:{index}"
+    # The media stack (moviepy, TTS, search, ...) loads here rather than in the API process
+    import pipeline  # noqa: F401
+    asyncio.run(_worker_loop(worker_id, stop))
+
+
+class WorkerPool:
+    """Fixed-size pool of worker processes; its size is the render concurrency cap."""
+
+    def __init__(self, size: int = WORKER_CONCURRENCY):
+        self.size = size
+        self._ctx = multiprocessing.get_context("spawn")
+        self._stop = self._ctx.Event()
+        self._procs = []
+
+    def start(self):
+        self._procs = [self._spawn(i) for i in range(self.size)]
+
+    def _spawn(self, index: int):
+        proc = self._ctx.Process(target=worker_main, args=(index, self._stop))
+        proc.start()
+        return proc
+
+    def supervise(self) -> int:
+        """Respawn workers that died without being asked to; returns how many."""
+        if self._stop.is_set():
+            return 0
+        respawned = 0
+        for i, proc in enumerate(self._procs):
+            if proc.is_alive():
+                continue
+            print(f"Worker {i} (pid {proc.pid}) exited with code {proc.exitcode}, respawning")
+            self._procs[i] = self._spawn(i)
+            respawned += 1
+        return respawned
+
+    async def supervise_loop(self):
+        while True:
+            await asyncio.sleep(SUPERVISE_INTERVAL)
+            self.supervise()
+
+    def stop(self, timeout: float = 10):
+        self._stop.set()
+        deadline = time.time() + timeout
+        for proc in self._procs:
+            proc.join(max(deadline - time.time(), 0))
+            if proc.is_alive():
+                proc.terminate()
+        self._procs = []
+
+
+if __name__ == "__main__":
+    pool = WorkerPool()
+    pool.start()
+    print(f"Started {pool.size} workers on {job_store.JOB_DB_PATH}")
+    signals = {signal.SIGINT, signal.SIGTERM}
+    signal.pthread_sigmask(signal.SIG_BLOCK, signals)
+    try:
+        while signal.sigtimedwait(signals, SUPERVISE_INTERVAL) is None:
+            pool.supervise()
+    finally:
+        pool.stop()
@@ -26,31 +26,68 @@ export default function App() {
   const [showScript, setShowScript] = useState(false);
   const [error, setError] = useState('');
   const pollRef = useRef(null);
+  const streamRef = useRef(null);
+
+  const stopPolling = () => {
+    clearInterval(pollRef.current);
+    if (streamRef.current) streamRef.current.close();
+    streamRef.current = null;
+  };
+
+  // Returns true once the job reached a state that needs no further updates
+  const handleStatus = (data) => {
+    setJobStatus(data);
+    if (data.status === 'ready') {
+      // An approved draft comes back ready once the full-quality render is done
+      setPage(data.approved ? 'upload' : 'review');
+    } else if (data.status === 'error') {
+      setError(data.error || 'Something went wrong');
+    } else if (data.status === 'uploaded') {
+      setPage('done');
+    } else {
+      return false;
+    }
+    return true;
+  };
 
   const startPolling = (id) => {
-    if (pollRef.current) clearInterval(pollRef.current);
+    stopPolling();
+    // Prefer the push stream; fall back to polling where EventSource is missing or fails
+    if (window.EventSource) {
+      let job = null;
+      const stream = new EventSource(`${API_BASE}/api/events/${id}`);
+      const onEvent = (e) => {
+        job = { ...(job || {}), ...JSON.parse(e.data) };
+        if (handleStatus(job)) stopPolling();
+      };
+      stream.addEventListener('snapshot', onEvent);
+      stream.addEventListener('update', onEvent);
+      stream.onerror = () => {
+        if (stream.readyState === EventSource.CLOSED) {
+          streamRef.current = null;
+          startStatusPolling(id);
+        }
+      };
+      streamRef.current = stream;
+    } else {
+      startStatusPolling(id);
+    }
+  };
+
+  const startStatusPolling = (id) => {
+    clearInterval(pollRef.current);
     pollRef.current = setInterval(async () => {
       try {
         const res = await fetch(`${API_BASE}/api/status/${id}`);
         const data = await res.json();
-        setJobStatus(data);
-        if (data.status === 'ready') {
-          clearInterval(pollRef.current);
-          setPage('review');
-        } else if (data.status === 'error') {
-          clearInterval(pollRef.current);
-          setError(data.error || 'Something went wrong');
-        } else if (data.status === 'uploaded') {
-          clearInterval(pollRef.current);
-          setPage('done');
-        }
+        if (handleStatus(data)) clearInterval(pollRef.current);
       } catch (e) {
         // silent retry
       }
     }, 2000);
   };
 
-  useEffect(() => () => clearInterval(pollRef.current), []);
+  useEffect(() => () => stopPolling(), []);
 
   const handleGenerate = async () => {
     if (!topic.trim()) return;
@@ -78,34 +115,33 @@ export default function App() {
       headers: { 'Content-Type': 'application/json' },
       body: JSON.stringify({ job_id: jobId, approved: true })
     });
-    setPage('upload');
+    if (jobStatus?.draft) {
+      setPage('generating');
+      setJobStatus({ ...jobStatus, status: 'starting', step: 'Rendering final video...', progress: 0, approved: true });
+      startPolling(jobId);
+    } else {
+      setPage('upload');
+    }
   };
 
   const handleReject = async () => {
+    // Rejecting regenerates the same job, reusing whatever the feedback didn't change
     await fetch(`${API_BASE}/api/approve`, {
       method: 'POST',
       headers: { 'Content-Type': 'application/json' },
       body: JSON.stringify({ job_id: jobId, approved: false, feedback })
     });
-    // Regenerate
     setFeedback('');
     setPage('generating');
-    const res = await fetch(`${API_BASE}/api/generate`, {
-      method: 'POST',
-      headers: { 'Content-Type': 'application/json' },
-      body: JSON.stringify({ topic: jobStatus?.topic || topic, style, duration })
-    });
-    const data = await res.json();
-    setJobId(data.job_id);
     setJobStatus({ status: 'queued', step: 'Regenerating...', progress: 0, topic });
-    startPolling(data.job_id);
+    startPolling(jobId);
   };
 
   const handleUpload = async () => {
     if (!accessToken.trim()) { setError('Please paste your YouTube access token'); return; }
     setError('');
     setPage('generating');
-    setJobStatus({ status: 'uploading', step: 'Uploading to YouTube...', progress: 90, topic });
+    setJobStatus({ status: 'uploading', step: 'Uploading to YouTube...', progress: 100, upload_progress: 0, topic });
     try {
       const res = await fetch(`${API_BASE}/api/upload`, {
         method: 'POST',
@@ -127,6 +163,10 @@ export default function App() {
   };
 
   const currentStepIdx = STEPS.findIndex(s => s.key === jobStatus?.status);
+  // While uploading, the bar tracks the upload rather than the (finished) render
+  const shownProgress = jobStatus?.status === 'uploading'
+    ? Math.round((jobStatus?.upload_progress || 0) * 100)
+    : (jobStatus?.progress || 0);
 
   return (
     <div className="app">
@@ -135,7 +175,7 @@ export default function App() {
 
       {/* Header */}
       <header className="header">
-        <div className="logo" onClick={() => { setPage('home'); clearInterval(pollRef.current); }}>
+        <div className="logo" onClick={() => { setPage('home'); stopPolling(); }}>
           <span className="logo-icon">▶</span>
           <span className="logo-text">AutoTube</span>
           <span className="logo-badge">AI</span>
@@ -221,9 +261,9 @@ export default function App() {
             <h2 className="gen-title">Your video is being created</h2>
 
             <div className="progress-track">
-              <div className="progress-bar" style={{ width: `${jobStatus?.progress || 0}%` }} />
+              <div className="progress-bar" style={{ width: `${shownProgress}%` }} />
             </div>
-            <div className="progress-label">{jobStatus?.step || 'Starting...'} — {jobStatus?.progress || 0}%</div>
+            <div className="progress-label">{jobStatus?.step || 'Starting...'} — {shownProgress}%</div>
 
             <div className="steps-list">
               {STEPS.map((s, i) => {
@@ -247,14 +287,16 @@ export default function App() {
         <main className="review">
           <div className="review-header">
             <h2>Review Your Video</h2>
-            <p>Watch the preview below. Approve to proceed to upload, or request changes.</p>
+            <p>{jobStatus.draft
+              ? 'Watch the draft below. Approve to render the full-quality video for upload, or request changes.'
+              : 'Watch the preview below. Approve to proceed to upload, or request changes.'}</p>
           </div>
 
           <div className="review-grid">
             <div className="video-panel">
               <video
                 className="video-preview"
-                src={`${API_BASE}${jobStatus.video_url}`}
+                src={`${API_BASE}${jobStatus.preview_url || jobStatus.video_url}`}
                 controls
                 autoPlay={false}
               />